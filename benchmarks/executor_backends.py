@@ -0,0 +1,60 @@
+"""Compare the thread and process backends of array_meta_multi across formats and worker counts.
+
+Usage: python benchmarks/executor_backends.py [--frames 64] [--height 1080] [--width 1920]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import immetaio
+
+FORMATS = {
+    "png u8": (".png", np.uint8),
+    "exr f32": (".exr", np.float32),
+    "npy f64": (".npy", np.float64),
+}
+
+
+def make_frame(height, width, dtype):
+    if np.issubdtype(dtype, np.integer):
+        return np.random.randint(0, 255, (height, width, 3), dtype=dtype)
+    return np.random.rand(height, width, 3).astype(dtype)
+
+
+def worker_counts():
+    counts = [1, 2, 4, 8, 16, 32, 64]
+    return [n for n in counts if n <= (os.cpu_count() or 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=64)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--width", type=int, default=1920)
+    args = parser.parse_args()
+
+    print(f"{'format':>8} | {'backend':>7} | {'workers':>7} | {'save [frames/s]':>15} | {'load [frames/s]':>15}")
+    for name, (ext, dtype) in FORMATS.items():
+        frame = make_frame(args.height, args.width, dtype)
+        arrs = [frame] * args.frames
+        for backend in ["thread", "process"]:
+            for max_workers in worker_counts():
+                with tempfile.TemporaryDirectory() as tmpdir:
+                    filenames = [Path(tmpdir) / f"{i}{ext}" for i in range(args.frames)]
+
+                    t0 = time.perf_counter()
+                    immetaio.array_meta_multi.save(filenames, arrs, max_workers=max_workers, executor=backend)
+                    t_save = time.perf_counter() - t0
+
+                    t0 = time.perf_counter()
+                    immetaio.array_meta_multi.load(filenames, max_workers=max_workers, executor=backend)
+                    t_load = time.perf_counter() - t0
+
+                print(f"{name:>8} | {backend:>7} | {max_workers:>7} | {args.frames / t_save:>15.1f} | {args.frames / t_load:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
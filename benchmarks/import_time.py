@@ -0,0 +1,67 @@
+"""Measure the startup cost of `import immetaio` and check that OpenCV stays unloaded where it is not needed.
+
+Each scenario runs in a fresh interpreter; the reported time is the median over repeats.
+Exits with status 1 if a scenario exceeds --max-ms or loads OpenCV unexpectedly, so it can guard against regressions in CI.
+
+Usage: python benchmarks/import_time.py [--repeats 10] [--max-ms 0]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# name -> (code to time, whether cv2 may be imported afterwards)
+SCENARIOS = {
+    "import": ("import immetaio", False),
+    "import + meta": ("import immetaio, tempfile, os; immetaio.meta.save(os.path.join(tempfile.mkdtemp(), 'a.json'), x=1)", False),
+    "import + npy": (
+        "import immetaio, numpy, tempfile, os; f = os.path.join(tempfile.mkdtemp(), 'a.npy'); immetaio.save(f, numpy.zeros(4)); immetaio.load(f)",
+        False,
+    ),
+    "import + png": (
+        "import immetaio, numpy, tempfile, os; f = os.path.join(tempfile.mkdtemp(), 'a.png'); immetaio.save(f, numpy.zeros((4, 4), numpy.uint8))",
+        True,
+    ),
+}
+
+RUNNER = """
+import sys, time, json
+t0 = time.perf_counter()
+exec({code!r})
+print(json.dumps({{"ms": (time.perf_counter() - t0) * 1e3, "cv2": "cv2" in sys.modules}}))
+"""
+
+
+def run(code):
+    out = subprocess.run([sys.executable, "-c", RUNNER.format(code=code)], check=True, capture_output=True, text=True).stdout
+    return json.loads(out.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=0.0, help="fail if the plain import takes longer (0 disables the check)")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'scenario':>14} | {'median [ms]':>11} | {'min [ms]':>8} | {'cv2 loaded':>10}")
+    for name, (code, allow_cv2) in SCENARIOS.items():
+        results = [run(code) for _ in range(args.repeats)]
+        times = [r["ms"] for r in results]
+        cv2_loaded = any(r["cv2"] for r in results)
+        print(f"{name:>14} | {statistics.median(times):>11.1f} | {min(times):>8.1f} | {str(cv2_loaded):>10}")
+
+        if cv2_loaded and not allow_cv2:
+            print(f"  FAIL: '{name}' imported OpenCV")
+            failed = True
+        if name == "import" and args.max_ms > 0 and statistics.median(times) > args.max_ms:
+            print(f"  FAIL: 'import immetaio' took longer than {args.max_ms} ms")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
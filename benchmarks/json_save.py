@@ -0,0 +1,55 @@
+"""Per-file latency of immetaio.json.save for metadata of increasing size.
+
+The legacy column reproduces the former dump -> reload -> format_json -> rewrite sequence.
+"""
+
+import json
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import immetaio
+from immetaio.json import NdarrayEncoder, format_json
+
+
+def legacy_save(filename_json, **data):
+    with open(filename_json, "w") as f:
+        json.dump(data, f, cls=NdarrayEncoder, indent=4)
+    with open(filename_json, "r") as f:
+        data = json.load(f)
+    with open(filename_json, "w") as f:
+        f.write(format_json(data, indent=4) + "\n")
+
+
+def make_metadata(n):
+    return {
+        "exposure_time": 0.01,
+        "timestamp": "2025-06-25T12:00:00",
+        "camera_matrix": np.eye(3),
+        "samples": np.random.rand(n),
+    }
+
+
+def measure(func, filename, metadata, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(filename, **metadata)
+        times.append(time.perf_counter() - t0)
+    return np.median(times)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = Path(tmpdir) / "meta.json"
+        print(f"{'array size':>10} | {'legacy [ms]':>11} | {'single-pass [ms]':>16} | {'speedup':>7}")
+        for n in [0, 10, 100, 1000, 10000, 100000]:
+            metadata = make_metadata(n)
+            repeat = 200 if n <= 1000 else 10
+            t_legacy = measure(legacy_save, filename, metadata, repeat)
+            t_new = measure(immetaio.json.save, filename, metadata, repeat)
+            print(f"{n:>10} | {t_legacy * 1e3:>11.3f} | {t_new * 1e3:>16.3f} | {t_legacy / t_new:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
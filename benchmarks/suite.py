@@ -0,0 +1,318 @@
+"""Throughput and latency of every save/load path on synthetic data and the local disk.
+
+Each case runs in a fresh interpreter so that its peak RSS is measured in isolation. Results are
+printed as a table and can be written as JSON (--output) and compared against an earlier run
+(--compare) to spot regressions between commits. Throughput is in MB/s with MB = 10^6 bytes, the
+unit of `SequenceWriter.stats` and `params.benchmark_profiles`; peak RSS is in MiB. Batch cases
+(multi, dir) time whole calls, so they report no latency percentiles ("-", null in JSON).
+
+Usage:
+    python benchmarks/suite.py [--quick] [--only array,json,multi,dir,nonblock] [--dir /path/on/disk]
+                               [--output results.json] [--compare baseline.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import immetaio
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+FORMATS = {
+    "png u8": (".png", np.uint8),
+    "png u16": (".png", np.uint16),
+    "exr f32": (".exr", np.float32),
+    "npy f64": (".npy", np.float64),
+}
+
+JSON_SIZES = [0, 100, 10000, 1000000]
+
+GROUPS = ["array", "json", "multi", "dir", "nonblock"]
+
+
+def make_frame(height, width, dtype, seed=0):
+    # Smooth gradient plus noise so that the compressed formats do real work
+    rng = np.random.default_rng(seed)
+    ramp = np.linspace(0, 1, width, dtype=np.float32)[None, :, None] * np.linspace(0, 1, height, dtype=np.float32)[:, None, None]
+    frame = np.clip(ramp + 0.05 * rng.standard_normal((height, width, 3), dtype=np.float32), 0, 1)
+    if np.issubdtype(dtype, np.integer):
+        return (frame * np.iinfo(dtype).max).astype(dtype)
+    return frame.astype(dtype)
+
+
+def make_metadata(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        "exposure_time": 0.01,
+        "timestamp": "2025-06-25T12:00:00",
+        "camera_matrix": np.eye(3),
+        "samples": rng.random(n),
+    }
+
+
+def worker_counts(quick):
+    counts = [1, 4] if quick else [1, 2, 4, 8, 16, 32]
+    return [n for n in counts if n <= (os.cpu_count() or 1)]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024**2 if sys.platform == "darwin" else rss / 1024  # bytes on macOS, KiB on Linux
+
+
+def summarize(latencies, total_time, nbytes, frames=None):
+    """Summarize per-frame latencies [s] and the wall time of the whole run.
+
+    Batch calls have no per-frame latency: pass `latencies=None` and the number of `frames`, and
+    the percentiles are None. Throughput is in MB/s with MB = 10^6 bytes, like
+    `SequenceWriter.stats` and `params.benchmark_profiles`.
+    """
+    frames = len(latencies) if latencies is not None else frames
+    latencies = np.asarray(latencies) * 1e3 if latencies is not None else None
+    return {
+        "frames": frames,
+        "frames_per_s": frames / total_time,
+        "mb_per_s": nbytes / total_time / 1e6,
+        "p50_ms": float(np.percentile(latencies, 50)) if latencies is not None else None,
+        "p99_ms": float(np.percentile(latencies, 99)) if latencies is not None else None,
+    }
+
+
+def _ms(value):
+    return f"{value:>8.2f}" if value is not None else f"{'-':>8}"
+
+
+def timed(func, items):
+    """Call `func` on each item and return the per-call latencies and the total time."""
+    latencies = []
+    t_start = time.perf_counter()
+    for item in items:
+        t0 = time.perf_counter()
+        func(item)
+        latencies.append(time.perf_counter() - t0)
+    return latencies, time.perf_counter() - t_start
+
+
+# Each case takes (workdir, args, **params) and returns {op: metrics}
+
+
+def case_array(workdir, args, fmt):
+    ext, dtype = FORMATS[fmt]
+    frame = make_frame(args.height, args.width, dtype)
+    filenames = [workdir / f"{i:06d}{ext}" for i in range(args.frames)]
+    nbytes = frame.nbytes * args.frames
+
+    lat_save, t_save = timed(lambda f: immetaio.array.save(f, frame), filenames)
+    lat_load, t_load = timed(immetaio.array.load, filenames)
+    return {"save": summarize(lat_save, t_save, nbytes), "load": summarize(lat_load, t_load, nbytes)}
+
+
+def case_json(workdir, args, size):
+    metadata = make_metadata(size)
+    repeat = max(1, min(200, 10**6 // max(size, 1)))
+    filenames = [workdir / f"{i:06d}.json" for i in range(repeat)]
+
+    lat_save, t_save = timed(lambda f: immetaio.json.save(f, **metadata), filenames)
+    nbytes = sum(os.path.getsize(f) for f in filenames)
+    lat_load, t_load = timed(immetaio.json.load, filenames)
+    return {"save": summarize(lat_save, t_save, nbytes), "load": summarize(lat_load, t_load, nbytes)}
+
+
+def _batch(save, load, target, args, fmt, max_workers):
+    ext, dtype = FORMATS[fmt]
+    arrs = [make_frame(args.height, args.width, dtype)] * args.frames
+    nbytes = arrs[0].nbytes * args.frames
+
+    t0 = time.perf_counter()
+    save(target(ext), arrs, max_workers=max_workers, frame=list(range(args.frames)))
+    t_save = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    load(target(ext), max_workers=max_workers)
+    t_load = time.perf_counter() - t0
+
+    # Batch calls have no per-frame latency
+    return {
+        "save": summarize(None, t_save, nbytes, frames=args.frames),
+        "load": summarize(None, t_load, nbytes, frames=args.frames),
+    }
+
+
+def case_multi(workdir, args, fmt, max_workers):
+    def target(ext):
+        return [workdir / f"{i:06d}{ext}" for i in range(args.frames)]
+
+    return _batch(immetaio.array_meta_multi.save, immetaio.array_meta_multi.load, target, args, fmt, max_workers)
+
+
+def case_dir(workdir, args, fmt, max_workers):
+    # Frame names carry no extension; the directory saver picks it from the dtype (which FORMATS matches)
+    return _batch(immetaio.array_meta_dir.save, immetaio.array_meta_dir.load, lambda ext: workdir / "seq", args, fmt, max_workers)
+
+
+def case_nonblock(workdir, args, fmt, fps):
+    """Simulate a camera delivering frames at `fps` (0: as fast as possible) and time the save calls."""
+    ext, dtype = FORMATS[fmt]
+    frames = [make_frame(args.height, args.width, dtype, seed=i) for i in range(4)]
+    period = 1 / fps if fps > 0 else 0
+    nbytes = frames[0].nbytes * args.frames
+
+    latencies = []
+    t_start = time.perf_counter()
+    for i in range(args.frames):
+        t_due = t_start + i * period
+        while time.perf_counter() < t_due:
+            pass  # Busy wait for a precise frame clock
+        t0 = time.perf_counter()
+        immetaio.array_meta_nonblock.save(workdir / f"{i:06d}{ext}", frames[i % len(frames)], frame=i)
+        latencies.append(time.perf_counter() - t0)
+    t_submitted = time.perf_counter() - t_start
+    immetaio.wait_saves()
+    t_total = time.perf_counter() - t_start
+
+    submit = summarize(latencies, t_total, nbytes)
+    submit["submit_s"] = t_submitted
+    submit["dropped"] = immetaio.array_nonblock.stats().dropped
+    submit["jitter_ms"] = float(np.std(np.asarray(latencies) * 1e3))
+    return {"save": submit}
+
+
+CASES = {
+    "array": case_array,
+    "json": case_json,
+    "multi": case_multi,
+    "dir": case_dir,
+    "nonblock": case_nonblock,
+}
+
+
+def list_cases(args):
+    """Return (group, params) for every case selected on the command line."""
+    formats = ["png u8", "npy f64"] if args.quick else list(FORMATS)
+    cases = []
+    for group in args.only:
+        if group == "array":
+            cases += [(group, {"fmt": fmt}) for fmt in formats]
+        elif group == "json":
+            cases += [(group, {"size": size}) for size in (JSON_SIZES[:3] if args.quick else JSON_SIZES)]
+        elif group in ("multi", "dir"):
+            cases += [(group, {"fmt": fmt, "max_workers": n}) for fmt in formats for n in worker_counts(args.quick)]
+        elif group == "nonblock":
+            cases += [(group, {"fmt": fmt, "fps": fps}) for fmt in formats for fps in (30, 0)]
+    return cases
+
+
+def run_case(args, group, params):
+    """Run one case in this process and print its result as JSON (used by the child interpreters)."""
+    workdir = Path(tempfile.mkdtemp(dir=args.dir))
+    try:
+        results = CASES[group](workdir, args, **params)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(json.dumps({"results": results, "peak_rss_mb": peak_rss_mb()}))
+
+
+def spawn_case(args, group, params):
+    cmd = [sys.executable, os.path.abspath(__file__), "--case", json.dumps([group, params])]
+    cmd += ["--frames", str(args.frames), "--height", str(args.height), "--width", str(args.width)]
+    if args.dir is not None:
+        cmd += ["--dir", args.dir]
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.splitlines()[-1])
+
+
+def case_name(group, params):
+    return " ".join([group] + [f"{k}={v}" for k, v in params.items()])
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": immetaio.opencv.cv2.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(records, filename):
+    """Print the change in frames/s against an earlier --output file."""
+    with open(filename) as f:
+        baseline = {(r["name"], op): m for r in json.load(f)["cases"] for op, m in r["results"].items()}
+
+    print(f"\n{'case':>40} | {'op':>4} | {'before [frames/s]':>17} | {'after [frames/s]':>16} | {'change':>7}")
+    for r in records:
+        for op, m in r["results"].items():
+            before = baseline.get((r["name"], op))
+            if before is None:
+                continue
+            change = m["frames_per_s"] / before["frames_per_s"] - 1
+            print(f"{r['name']:>40} | {op:>4} | {before['frames_per_s']:>17.1f} | {m['frames_per_s']:>16.1f} | {change:>+7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=64)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--quick", action="store_true", help="fewer formats, sizes and worker counts")
+    parser.add_argument("--only", type=lambda s: s.split(","), default=GROUPS, help=f"comma-separated subset of {','.join(GROUPS)}")
+    parser.add_argument("--dir", default=None, help="directory to benchmark in (default: system temp dir)")
+    parser.add_argument("--output", default=None, help="write the results as JSON")
+    parser.add_argument("--compare", default=None, help="JSON file of an earlier run to compare against")
+    parser.add_argument("--case", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case is not None:
+        group, params = json.loads(args.case)
+        run_case(args, group, params)
+        return
+
+    for group in args.only:
+        if group not in GROUPS:
+            parser.error(f"unknown group '{group}' (choose from {','.join(GROUPS)})")
+    if args.quick and "--frames" not in sys.argv:
+        args.frames = 16
+
+    records = []
+    print(f"{'case':>40} | {'op':>4} | {'frames/s':>9} | {'MB/s':>8} | {'p50 [ms]':>8} | {'p99 [ms]':>8} | {'peak RSS [MiB]':>14}")
+    for group, params in list_cases(args):
+        name = case_name(group, params)
+        record = spawn_case(args, group, params)
+        record = {"name": name, "group": group, "params": params, **record}
+        records.append(record)
+        rss = record["peak_rss_mb"]
+        for op, m in record["results"].items():
+            rss_str = f"{rss:>14.0f}" if rss is not None else f"{'n/a':>14}"
+            print(f"{name:>40} | {op:>4} | {m['frames_per_s']:>9.1f} | {m['mb_per_s']:>8.1f} | {_ms(m['p50_ms'])} | {_ms(m['p99_ms'])} | {rss_str}")
+
+    if args.output is not None:
+        config = {"frames": args.frames, "height": args.height, "width": args.width}
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(), "config": config, "cases": records}, f, indent=2)
+            f.write("\n")
+
+    if args.compare is not None:
+        compare(records, args.compare)
+
+
+if __name__ == "__main__":
+    main()
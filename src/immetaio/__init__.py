@@ -4,14 +4,71 @@
 **immetaio** (**im**age + **meta**data + **io**) is a Python library that provides saving and loading image arrays and their associated metadata. It is built for computer vision, graphics, and computational imaging workloads where every image paired with user-defined metadata.
 """
 
-from . import meta
-from . import json
-from . import array
-from . import array_nonblock
-from . import array_meta
-from . import array_meta_nonblock
-from . import array_meta_dir
-from . import array_meta_multi
-from . import params
-from .master import save, load
-from .array_nonblock import wait_saves
+import importlib
+from typing import TYPE_CHECKING, Any, List
+
+# Submodules and top-level functions are imported on first access (PEP 562),
+# so `import immetaio` stays fast and OpenCV is only loaded when an image is encoded or decoded.
+_submodules = [
+    "meta",
+    "json",
+    "array",
+    "array_nonblock",
+    "array_meta",
+    "array_meta_nonblock",
+    "array_meta_dir",
+    "array_meta_multi",
+    "array_meta_stream",
+    "array_meta_async",
+    "array_meta_pack",
+    "params",
+    "executor",
+    "index",
+    "cache",
+    "atomic",
+    "opencv",
+    "profiling",
+    "frame_pool",
+    "array_chunked",
+    "master",
+    "typing",
+]
+
+_attributes = {
+    "save": ("master", "save"),
+    "load": ("master", "load"),
+    "asave": ("master", "asave"),
+    "aload": ("master", "aload"),
+    "wait_saves": ("array_nonblock", "wait_saves"),
+    "iter_load": ("array_meta_stream", "iter_load"),
+    "SequenceWriter": ("array_meta_stream", "SequenceWriter"),
+    "aiter_load": ("array_meta_async", "iter_load"),
+    "FramePool": ("frame_pool", "FramePool"),
+}
+
+__all__ = _submodules + list(_attributes)
+
+
+def __getattr__(name: str) -> Any:
+    if name in _submodules:
+        return importlib.import_module(f".{name}", __name__)
+    if name in _attributes:
+        module_name, attr = _attributes[name]
+        value = getattr(importlib.import_module(f".{module_name}", __name__), attr)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
+
+
+if TYPE_CHECKING:
+    from . import meta, json, array, array_nonblock, array_meta, array_meta_nonblock, array_meta_dir, array_meta_multi
+    from . import array_meta_stream, array_meta_async, array_meta_pack, params, executor, index, cache, atomic, opencv, profiling, frame_pool, array_chunked, master, typing
+    from .master import save, load, asave, aload
+    from .array_nonblock import wait_saves
+    from .array_meta_stream import iter_load, SequenceWriter
+    from .array_meta_async import iter_load as aiter_load
+    from .frame_pool import FramePool
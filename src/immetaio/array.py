@@ -1,22 +1,30 @@
 from pathlib import Path
+from typing import Optional, Tuple, Union
+import functools
+import io
 import os
+import struct
 import numpy as np
-
-os.environ["OPENCV_IO_ENABLE_OPENEXR"] = "1"
-import cv2
-
+from .opencv import cv2
 from .typing import PathLike
 from . import params
+from . import cache
+from . import atomic
+from . import profiling
+
+# Region of interest (y0, y1, x0, x1)
+ROI = Tuple[Optional[int], Optional[int], Optional[int], Optional[int]]
 
 
-def get_filename(filename: PathLike, arr: np.ndarray) -> Path:
+def get_filename(filename: PathLike, arr: np.ndarray, profile: Optional[str] = None) -> Path:
     """Resolve the appropriate file extension for saving an array based on its shape and dtype.
 
     If `filename` already has an extension, it is returned as-is.
     Otherwise, the extension is chosen according to these rules:
       - '.png' for 2D or 3-channel/4-channel uint8 or uint16 images.
       - '.exr' for 2D or 3-channel float32 images.
-      - '.npy' for all other array types.
+      - '.npy' for all other array types ('.npz' if the compression profile uses npz),
+        or '.chunks' if the array is larger than `array_chunked.set_threshold`.
     """
     filename = Path(filename)
     if filename.suffix != "":  # If the extension is already specified, return the filename as is
@@ -29,41 +37,450 @@ def get_filename(filename: PathLike, arr: np.ndarray) -> Path:
             # exr (float32 image)
             ext = ".exr"
         else:
-            # npy (any array)
-            ext = ".npy"
+            from . import array_chunked  # array_chunked depends on this module via executor
+
+            # npy (any array), chunked if large
+            threshold = array_chunked.get_threshold()
+            if threshold is not None and arr.nbytes > threshold:
+                ext = array_chunked.EXT
+            else:
+                ext = ".npz" if params.use_npz(profile) else ".npy"
         return filename.with_suffix(ext)
 
 
-def save(filename: PathLike, arr: np.ndarray) -> Path:
-    """Save an array to a file."""
+def save(filename: PathLike, arr: np.ndarray, mkdir: bool = True, profile: Optional[str] = None) -> Path:
+    """Save an array to a file.
+
+    If `mkdir` is False, the parent directory is assumed to exist.
+    `profile` selects the compression profile (see `params.profiles`); the global one is used if None.
+    The file is written to a temporary file first and renamed when complete (see `atomic`).
+    """
     filename = Path(filename)
-    filename_array = get_filename(filename, arr)
+    filename_array = get_filename(filename, arr, profile)
 
-    filename_array.parent.mkdir(parents=True, exist_ok=True)
+    if mkdir:
+        with profiling.span("array.mkdir"):
+            filename_array.parent.mkdir(parents=True, exist_ok=True)
     if filename_array.suffix == ".npy":
-        np.save(filename_array, arr)
+        with atomic.replace_on_success(filename_array) as filename_tmp:
+            with profiling.span("array.write", arr.nbytes):
+                np.save(filename_tmp, arr)
+        return filename_array
+    elif filename_array.suffix == ".chunks":
+        from . import array_chunked
+
+        return array_chunked.save(filename_array, arr, compressed=params.use_npz(profile), mkdir=False)
+    elif filename_array.suffix == ".npz":
+        with atomic.replace_on_success(filename_array) as filename_tmp:
+            with profiling.span("array.encode_write", arr.nbytes):
+                np.savez_compressed(filename_tmp, arr)
         return filename_array
     elif cv2.haveImageWriter(str(filename_array)):
         ext = filename_array.suffix
-        p = params.cv2_imwrite_params.get(ext, [])
-        cv2.imwrite(str(filename_array), arr, p)
+        if profiling.is_enabled():
+            # Encode to memory first so that encoding and writing are timed separately
+            with profiling.span("array.encode", arr.nbytes):
+                data = encode(arr, ext, profile)
+            with atomic.replace_on_success(filename_array) as filename_tmp:
+                with profiling.span("array.write", len(data)), open(filename_tmp, "wb") as f:
+                    f.write(data)
+            return filename_array
+        p = params.get_imwrite_params(ext, profile)
+        with atomic.replace_on_success(filename_array) as filename_tmp:
+            if not cv2.imwrite(str(filename_tmp), arr, p):
+                raise ValueError(f"Failed to write image to '{filename_array}'.")
         return filename_array
     else:
         raise ValueError(f"Cannot save array to '{filename_array}': no suitable writer found.")
 
 
-def load(filename_array: PathLike) -> np.ndarray:
-    """Load an array from a file."""
+def encode(arr: np.ndarray, ext: str, profile: Optional[str] = None) -> bytes:
+    """Encode an array to the bytes of a file with extension `ext` ('.png', '.exr', '.npy' or '.npz')."""
+    if ext in (".npy", ".npz"):
+        buf = io.BytesIO()
+        if ext == ".npy":
+            np.save(buf, arr)
+        else:
+            np.savez_compressed(buf, arr)
+        return buf.getvalue()
+    ok, encoded = cv2.imencode(ext, arr, params.get_imwrite_params(ext, profile))
+    if not ok:
+        raise ValueError(f"Failed to encode array as '{ext}'.")
+    return encoded.tobytes()
+
+
+def decode(data: Union[bytes, memoryview], ext: str) -> np.ndarray:
+    """Decode the bytes of a file with extension `ext`.
+
+    For '.npy', the array is a view of `data` without a copy (read-only if `data` is).
+    """
+    if ext == ".npy":
+        f = io.BytesIO(data[:4096] if len(data) > 4096 else data)
+        shape, fortran_order, dtype = _read_npy_header(f)
+        if dtype.hasobject:
+            return np.load(io.BytesIO(data), allow_pickle=False)
+        arr = np.frombuffer(data, dtype, count=int(np.prod(shape)), offset=f.tell())
+        return arr.reshape(shape[::-1]).T if fortran_order else arr.reshape(shape)
+    elif ext == ".npz":
+        with np.load(io.BytesIO(data)) as npz:
+            return npz[npz.files[0]]
+    arr = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+    if arr is None:
+        raise ValueError(f"Failed to decode '{ext}' data. The data may be corrupted or unsupported.")
+    return arr
+
+
+def _read_npy_header(f) -> Tuple[Tuple[int, ...], bool, np.dtype]:
+    """Read the header of an open .npy file, leaving the file positioned at the data."""
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        return np.lib.format.read_array_header_1_0(f)
+    else:
+        return np.lib.format.read_array_header_2_0(f)
+
+
+def _load_npy_into(filename_array: Path, out: np.ndarray) -> np.ndarray:
+    """Read a .npy file straight into a preallocated array."""
+    with open(filename_array, "rb") as f:
+        shape, fortran_order, dtype = _read_npy_header(f)
+        if shape != out.shape or dtype != out.dtype:
+            raise ValueError(f"Cannot load '{filename_array}' into out: expected {out.shape} {out.dtype}, got {shape} {dtype}.")
+        if fortran_order or dtype.hasobject or not out.flags.c_contiguous:
+            np.copyto(out, np.load(filename_array))
+            return out
+        buf = memoryview(out).cast("B")
+        while len(buf) > 0:
+            n = f.readinto(buf)
+            if not n:
+                raise ValueError(f"Failed to read array from '{filename_array}'. The file is truncated.")
+            buf = buf[n:]
+    return out
+
+
+def _imread_into(filename_array: Path, out: np.ndarray) -> np.ndarray:
+    """Decode an image straight into a preallocated array when OpenCV supports it."""
+    try:
+        ret = cv2.imread(str(filename_array), out, cv2.IMREAD_UNCHANGED)
+    except (TypeError, cv2.error):
+        ret = cv2.imread(str(filename_array), cv2.IMREAD_UNCHANGED)  # OpenCV without the dst overload
+    if ret is None:
+        raise ValueError(f"Failed to read image from '{filename_array}'. The file may be corrupted or unsupported.")
+    if not np.shares_memory(ret, out):
+        # OpenCV reallocated (e.g. non-contiguous or mismatched out), so copy and check
+        if ret.shape != out.shape or ret.dtype != out.dtype:
+            raise ValueError(f"Cannot load '{filename_array}' into out: expected {out.shape} {out.dtype}, got {ret.shape} {ret.dtype}.")
+        np.copyto(out, ret)
+    return out
+
+
+def load(filename_array: PathLike, out: Optional[np.ndarray] = None, mmap: bool = False, roi: Optional[ROI] = None, reduce: int = 1) -> np.ndarray:
+    """Load an array from a file.
+
+    If `out` is given, the array is decoded into it (shape and dtype must match) and `out` is returned.
+    If `mmap` is True, .npy files are memory-mapped read-only instead of read (ignored for other formats).
+    Otherwise, the array comes from the cache if it is enabled (see `cache.enable`) and is then read-only.
+
+    `roi=(y0, y1, x0, x1)` loads only that region (in full-resolution pixels, None for an open end),
+    and `reduce` keeps every `reduce`-th row and column. For .npy files only the region is read;
+    JPEG files use OpenCV's reduced decode for `reduce` of 2, 4 or 8 (which averages instead).
+    Other image formats are decoded whole and cropped, so only the result is kept in memory.
+    Chunked arrays (see `array_chunked`) read only the chunks of the region, and are not cached.
+    """
     filename_array = Path(filename_array)
     if not filename_array.exists():
         raise FileNotFoundError(f"'{filename_array}' does not exist.")
+    if filename_array.suffix == ".chunks":
+        from . import array_chunked
+
+        sy, sx = _region(roi, reduce)
+        key = (sy, sx) if roi is not None or reduce != 1 else Ellipsis
+        if key is not Ellipsis:
+            _check_region_ndim(len(array_chunked.read_header(filename_array)[0]), filename_array)
+        return array_chunked.load(filename_array, out=out, key=key)
+
+    if roi is not None or reduce != 1:
+        return _load_region(filename_array, roi, reduce, out, mmap)
+    if out is None and not mmap:
+        return cache.cached("array", filename_array, functools.partial(_load, filename_array), _cache_nbytes)
+    return _load(filename_array, out, mmap)
+
+
+def _cache_nbytes(arr: np.ndarray, st: os.stat_result) -> int:
+    return arr.nbytes
+
 
+def _load(filename_array: Path, out: Optional[np.ndarray] = None, mmap: bool = False) -> np.ndarray:
     if filename_array.suffix == ".npy":
-        return np.load(filename_array)
+        if out is not None:
+            with profiling.span("array.read", out.nbytes):
+                return _load_npy_into(filename_array, out)
+        with profiling.span("array.read") as span:
+            arr = np.load(filename_array, mmap_mode="r" if mmap else None)
+            span.nbytes = 0 if mmap else arr.nbytes
+        return arr
+    elif filename_array.suffix == ".npz":
+        with profiling.span("array.read_decode") as span, np.load(filename_array) as npz:
+            arr = npz[npz.files[0]]
+            span.nbytes = arr.nbytes
+        if out is not None:
+            if arr.shape != out.shape or arr.dtype != out.dtype:
+                raise ValueError(f"Cannot load '{filename_array}' into out: expected {out.shape} {out.dtype}, got {arr.shape} {arr.dtype}.")
+            np.copyto(out, arr)
+            return out
+        return arr
     elif cv2.haveImageReader(str(filename_array)):
+        if profiling.is_enabled() and out is None:
+            # Read to memory first so that reading and decoding are timed separately
+            with profiling.span("array.read") as span:
+                with open(filename_array, "rb") as f:
+                    data = f.read()
+                span.nbytes = len(data)
+            with profiling.span("array.decode") as span:
+                arr = decode(data, filename_array.suffix)
+                span.nbytes = arr.nbytes
+            return arr
+        if out is not None:
+            with profiling.span("array.read_decode", out.nbytes):
+                return _imread_into(filename_array, out)
         ret = cv2.imread(str(filename_array), cv2.IMREAD_UNCHANGED)
         if ret is None:
             raise ValueError(f"Failed to read image from '{filename_array}'. The file may be corrupted or unsupported.")
         return ret
     else:
         raise ValueError(f"Cannot load array from '{filename_array}': no suitable reader found.")
+
+
+def _imread_reduced_flags(reduce: int, grayscale: bool) -> int:
+    """OpenCV decodes JPEG at 1/2, 1/4 and 1/8 resolution directly.
+
+    EXIF orientation is ignored, like in the full-resolution IMREAD_UNCHANGED path.
+    """
+    if grayscale:
+        flags = {2: cv2.IMREAD_REDUCED_GRAYSCALE_2, 4: cv2.IMREAD_REDUCED_GRAYSCALE_4, 8: cv2.IMREAD_REDUCED_GRAYSCALE_8}[reduce]
+    else:
+        flags = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}[reduce]
+    return flags | cv2.IMREAD_IGNORE_ORIENTATION
+
+
+def _region(roi: Optional[ROI], reduce: int) -> Tuple[slice, slice]:
+    if not isinstance(reduce, int) or reduce < 1:
+        raise ValueError(f"reduce must be a positive integer, got {reduce!r}.")
+    if roi is None:
+        return slice(None, None, reduce), slice(None, None, reduce)
+    if len(roi) != 4:
+        raise ValueError(f"roi must be (y0, y1, x0, x1), got {roi!r}.")
+    y0, y1, x0, x1 = roi
+    return slice(y0, y1, reduce), slice(x0, x1, reduce)
+
+
+def _check_region_ndim(ndim: int, filename: PathLike) -> None:
+    if ndim < 2:
+        raise ValueError(f"Cannot load a region of '{filename}': roi and reduce apply to the (y, x) axes of an image-shaped array, but it has {ndim} dimension(s).")
+
+
+def _jpeg_channels(f) -> Optional[int]:
+    """Return the number of components from the SOF marker of a JPEG file."""
+    if f.read(2) != b"\xff\xd8":
+        return None
+    while True:
+        marker = f.read(4)
+        if len(marker) < 4 or marker[0] != 0xFF:
+            return None
+        code, (length,) = marker[1], struct.unpack(">H", marker[2:])
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            f.read(5)  # Precision, height and width
+            return f.read(1)[0]
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _load_region(filename_array: Path, roi: Optional[ROI], reduce: int, out: Optional[np.ndarray], mmap: bool) -> np.ndarray:
+    """Load a region of an array file, subsampled by `reduce` (see `load`)."""
+    sy, sx = _region(roi, reduce)
+    suffix = filename_array.suffix.lower()
+    if suffix == ".npy":
+        # Slicing the memmap reads only the pages of the region
+        arr = np.load(filename_array, mmap_mode="r")
+        _check_region_ndim(arr.ndim, filename_array)
+        arr = arr[sy, sx]
+        if mmap and out is None:
+            return arr
+    elif suffix in (".jpg", ".jpeg") and reduce in (2, 4, 8):
+        with open(filename_array, "rb") as f:
+            channels = _jpeg_channels(f)
+        arr = cv2.imread(str(filename_array), _imread_reduced_flags(reduce, grayscale=channels == 1))
+        if arr is None:
+            raise ValueError(f"Failed to read image from '{filename_array}'. The file may be corrupted or unsupported.")
+        # The region in reduced pixels
+        ry, rx = (slice(*(None if v is None else -(-v // reduce) for v in (s.start, s.stop))) for s in (sy, sx))
+        arr = arr[ry, rx]
+    else:
+        arr = _load(filename_array)
+        _check_region_ndim(arr.ndim, filename_array)
+        arr = arr[sy, sx]
+
+    if out is not None:
+        if arr.shape != out.shape or arr.dtype != out.dtype:
+            raise ValueError(f"Cannot load '{filename_array}' into out: expected {out.shape} {out.dtype}, got {arr.shape} {arr.dtype}.")
+        np.copyto(out, arr)
+        return out
+    return np.array(arr)  # Copy, so the full frame (or the mapping) is released
+
+
+def _read_png_header(f) -> Optional[Tuple[Tuple[int, ...], np.dtype]]:
+    if f.read(8) != b"\x89PNG\r\n\x1a\n":
+        return None
+    length, chunk_type = struct.unpack(">I4s", f.read(8))
+    if chunk_type != b"IHDR":
+        return None
+    width, height, bit_depth, color_type = struct.unpack(">IIBB", f.read(10))
+    f.seek(length - 10 + 4, os.SEEK_CUR)  # Rest of IHDR and its CRC
+
+    # A tRNS chunk adds an alpha channel when decoded; only trust plain gray/RGB/RGBA
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        length, chunk_type = struct.unpack(">I4s", header)
+        if chunk_type == b"tRNS":
+            return None
+        if chunk_type == b"IDAT":
+            break
+        f.seek(length + 4, os.SEEK_CUR)
+
+    channels = {0: 1, 2: 3, 6: 4}.get(color_type)
+    if channels is None or bit_depth not in (8, 16):
+        return None
+    shape = (height, width) if channels == 1 else (height, width, channels)
+    return shape, np.dtype(np.uint16 if bit_depth == 16 else np.uint8)
+
+
+def _read_exr_header(f) -> Optional[Tuple[Tuple[int, ...], np.dtype]]:
+    if f.read(4) != b"\x76\x2f\x31\x01":
+        return None
+    f.read(4)  # Version and flags
+
+    def _read_cstr() -> bytes:
+        chars = []
+        while True:
+            c = f.read(1)
+            if c in (b"", b"\x00"):
+                return b"".join(chars)
+            chars.append(c)
+
+    channels = None
+    data_window = None
+    while True:
+        name = _read_cstr()
+        if name == b"":
+            break
+        _read_cstr()  # Attribute type
+        (size,) = struct.unpack("<i", f.read(4))
+        value = f.read(size)
+        if name == b"channels":
+            channels = []
+            pos = 0
+            while value[pos : pos + 1] not in (b"", b"\x00"):
+                end = value.index(b"\x00", pos)
+                (pixel_type,) = struct.unpack("<i", value[end + 1 : end + 5])
+                channels.append((value[pos:end], pixel_type))
+                pos = end + 1 + 16
+        elif name == b"dataWindow":
+            data_window = struct.unpack("<iiii", value)
+
+    if channels is None or data_window is None or any(pixel_type == 0 for _, pixel_type in channels):
+        return None  # UINT channels or incomplete header
+    xmin, ymin, xmax, ymax = data_window
+    height, width = ymax - ymin + 1, xmax - xmin + 1
+    names = {name for name, _ in channels}
+    if len(names) == 1:
+        shape = (height, width)
+    elif names == {b"R", b"G", b"B"}:
+        shape = (height, width, 3)
+    else:
+        return None
+    return shape, np.dtype(np.float32)  # HALF and FLOAT are both decoded as float32
+
+
+def read_header(filename_array: PathLike) -> Optional[Tuple[Tuple[int, ...], np.dtype]]:
+    """Read the shape and dtype of an array file without decoding it.
+
+    Supports .npy, chunked arrays, PNG (gray/RGB/RGBA, 8/16-bit) and EXR (single channel or RGB) files.
+    Returns None if the layout cannot be determined from the header alone.
+    """
+    filename_array = Path(filename_array)
+    if filename_array.suffix == ".chunks":
+        from . import array_chunked
+
+        return array_chunked.read_header(filename_array)
+    with open(filename_array, "rb") as f:
+        if filename_array.suffix == ".npy":
+            shape, _, dtype = _read_npy_header(f)
+            return shape, dtype
+        elif filename_array.suffix == ".png":
+            return _read_png_header(f)
+        elif filename_array.suffix == ".exr":
+            return _read_exr_header(f)
+    return None
+
+
+class ArrayHandle:
+    """Lazy handle to an array file.
+
+    `shape` and `dtype` are read from the file header without reading the data (see `read_header`).
+    The array is loaded on first access via `data`, indexing, or `np.asarray(handle)`.
+    With `mmap=True`, .npy files are memory-mapped, so indexing reads only the touched slices.
+    """
+
+    def __init__(self, filename_array: PathLike, mmap: bool = False):
+        self.filename = Path(filename_array)
+        if not self.filename.exists():
+            raise FileNotFoundError(f"'{self.filename}' does not exist.")
+        self.mmap = mmap
+        self._header = read_header(self.filename)
+        self._data: Optional[np.ndarray] = None
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._data is not None else "not loaded"
+        return f"ArrayHandle('{self.filename}', shape={self.shape}, dtype={self.dtype}, {state})"
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        if self._data is None and self._header is not None:
+            return self._header[0]
+        return self.data.shape
+
+    @property
+    def dtype(self) -> np.dtype:
+        if self._data is None and self._header is not None:
+            return self._header[1]
+        return self.data.dtype
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def nbytes(self) -> int:
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    @property
+    def loaded(self) -> bool:
+        return self._data is not None
+
+    @property
+    def data(self) -> np.ndarray:
+        if self._data is None:
+            self._data = load(self.filename, mmap=self.mmap)
+        return self._data
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __array__(self, dtype=None, copy=None):
+        arr = self.data
+        if dtype is not None:
+            arr = arr.astype(dtype, copy=False)
+        return np.array(arr, copy=True) if copy else arr
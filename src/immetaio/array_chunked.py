@@ -0,0 +1,369 @@
+"""
+Chunked store for large N-D arrays.
+
+An array is stored as a directory (extension `EXT`) holding a JSON header with the shape,
+dtype and chunk shape, and a data subdirectory with one .npy file (or compressed .npz file)
+per chunk, named by its chunk coordinates (e.g. 'c0.3.1.npy'). Saving over an existing array
+writes a new data subdirectory next to the current one and then atomically replaces the header
+that points to it, so readers always find a complete array under the same name. Chunks are read and written in parallel on the shared
+I/O scheduler, and indexing a `ChunkedArray` touches only the chunks that overlap the selection,
+so a region of a 100 GB volume can be read or updated without reading the rest.
+
+`array.save` and `array.load` select this format by the extension, and `array.get_filename`
+picks it for arrays that would otherwise be saved as .npy once they exceed `set_threshold`.
+"""
+
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+import itertools
+import math
+import os
+import shutil
+import time
+import numpy as np
+import numpy.typing as npt
+from . import atomic
+from . import executor as executor_
+from . import json
+from . import profiling
+from .typing import PathLike
+
+EXT = ".chunks"
+HEADER_NAME = "header.json"
+DATA_PREFIX = "data-"
+CHUNK_BYTES = 16 * 1024**2  # Target size of the default chunk shape
+
+# Arrays without a suffix that are larger than this (in bytes) are saved chunked instead of as .npy
+_threshold: Optional[int] = None
+
+Index = Union[int, slice, type(Ellipsis), Tuple[Any, ...]]
+
+
+def set_threshold(nbytes: Optional[int]) -> None:
+    """Save arrays larger than `nbytes` in the chunked format when `array.get_filename` would pick .npy (None: never)."""
+    global _threshold
+    if nbytes is not None and nbytes < 0:
+        raise ValueError(f"nbytes must be >= 0 or None, got {nbytes}.")
+    _threshold = nbytes
+
+
+def get_threshold() -> Optional[int]:
+    return _threshold
+
+
+def default_chunks(shape: Sequence[int], dtype: npt.DTypeLike, chunk_bytes: int = CHUNK_BYTES) -> Tuple[int, ...]:
+    """Halve the longest axis of the chunk until it fits into `chunk_bytes`."""
+    chunks = [max(1, n) for n in shape]
+    itemsize = np.dtype(dtype).itemsize
+    while math.prod(chunks) * itemsize > chunk_bytes and max(chunks) > 1:
+        i = chunks.index(max(chunks))
+        chunks[i] = -(-chunks[i] // 2)
+    return tuple(chunks)
+
+
+def _normalize(key: Index, shape: Tuple[int, ...]) -> Tuple[List[range], List[int]]:
+    """Turn an index into one range per axis and the axes indexed by an integer (to be dropped)."""
+    if not isinstance(key, tuple):
+        key = (key,)
+    if any(k is Ellipsis for k in key):
+        i = key.index(Ellipsis)
+        key = key[:i] + (slice(None),) * (len(shape) - len(key) + 1) + key[i + 1 :]
+    if len(key) > len(shape):
+        raise IndexError(f"too many indices for an array with {len(shape)} dimensions")
+    key = key + (slice(None),) * (len(shape) - len(key))
+
+    ranges = []
+    squeeze = []
+    for axis, (k, n) in enumerate(zip(key, shape)):
+        if isinstance(k, (int, np.integer)):
+            i = int(k) + n if k < 0 else int(k)
+            if not 0 <= i < n:
+                raise IndexError(f"index {k} is out of bounds for axis {axis} with size {n}")
+            ranges.append(range(i, i + 1))
+            squeeze.append(axis)
+        elif isinstance(k, slice):
+            r = range(*k.indices(n))
+            if r.step < 0:
+                raise IndexError("negative slice steps are not supported")
+            ranges.append(r)
+        else:
+            raise TypeError(f"only integers, slices and Ellipsis are valid indices, got {type(k).__name__}")
+    return ranges, squeeze
+
+
+def _axis_parts(r: range, chunk: int) -> Iterator[Tuple[int, slice, slice]]:
+    """Yield (chunk index, selection within the chunk, selection within the result) along one axis."""
+    if len(r) == 0:
+        return
+    for ci in range(r[0] // chunk, r[-1] // chunk + 1):
+        c0 = ci * chunk
+        k0 = max(0, -(-(c0 - r.start) // r.step))  # First selected position at or after c0
+        k1 = min(len(r), -(-(c0 + chunk - r.start) // r.step))
+        if k0 >= k1:
+            continue  # The step jumps over this chunk
+        yield ci, slice(r[k0] - c0, r[k1 - 1] - c0 + 1, r.step), slice(k0, k1)
+
+
+class _VersionRemoved(FileNotFoundError):
+    """The data of an opened array was removed because the array was saved over twice since."""
+
+
+class ChunkedArray:
+    """Handle to a chunked array directory.
+
+    Indexing with integers, slices (positive steps) and Ellipsis reads or writes only the
+    chunks involved, in parallel with at most `max_workers` chunks in flight. Chunks that
+    were never written read as zeros. `mode` is 'r' (read-only) or 'r+' (read and write).
+    Writes of overlapping regions from several threads at once are not safe. A handle keeps
+    using the version it was opened on when the array is saved over (see `save`).
+    """
+
+    def __init__(self, dirname: PathLike, mode: str = "r", max_workers: Optional[int] = None, header: Optional[Dict[str, Any]] = None):
+        if mode not in ("r", "r+"):
+            raise ValueError(f"mode must be 'r' or 'r+', got '{mode}'.")
+        self.dirname = Path(dirname)
+        self.mode = mode
+        self.max_workers = max_workers
+        if header is None:
+            filename_header = self.dirname / HEADER_NAME
+            if not filename_header.exists():
+                raise FileNotFoundError(f"'{self.dirname}' is not a chunked array (no {HEADER_NAME}).")
+            header = json.load(filename_header)
+        self.data_dirname = self.dirname / header.get("data", "")  # Arrays without "data" keep their chunks next to the header
+        self.shape: Tuple[int, ...] = tuple(header["shape"])
+        self.dtype = np.dtype(header["dtype"])
+        self.chunks: Tuple[int, ...] = tuple(header["chunks"])
+        self.compressed: bool = header["compressed"]
+
+    def __repr__(self) -> str:
+        return f"ChunkedArray('{self.dirname}', shape={self.shape}, dtype={self.dtype}, chunks={self.chunks})"
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def nbytes(self) -> int:
+        return math.prod(self.shape) * self.dtype.itemsize
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __array__(self, dtype: Optional[npt.DTypeLike] = None, copy: Optional[bool] = None) -> np.ndarray:
+        arr = self[...]
+        return arr.astype(dtype) if dtype is not None else arr
+
+    def chunk_filename(self, index: Tuple[int, ...]) -> Path:
+        return self.data_dirname / ("c" + ".".join(map(str, index)) + (".npz" if self.compressed else ".npy"))
+
+    def _chunk_shape(self, index: Tuple[int, ...]) -> Tuple[int, ...]:
+        return tuple(min(c, n - i * c) for i, c, n in zip(index, self.chunks, self.shape))
+
+    def _parts(self, key: Index) -> Tuple[List[Tuple[Tuple[int, ...], tuple, tuple]], Tuple[int, ...], List[int]]:
+        ranges, squeeze = _normalize(key, self.shape)
+        per_axis = [list(_axis_parts(r, c)) for r, c in zip(ranges, self.chunks)]
+        parts = []
+        for combo in itertools.product(*per_axis):
+            parts.append((tuple(p[0] for p in combo), tuple(p[1] for p in combo), tuple(p[2] for p in combo)))
+        return parts, tuple(len(r) for r in ranges), squeeze
+
+    def _read_chunk(self, index: Tuple[int, ...], mmap: bool = False) -> Optional[np.ndarray]:
+        filename = self.chunk_filename(index)
+        try:
+            with profiling.span("chunked.read") as span:
+                if self.compressed:
+                    with np.load(filename) as npz:
+                        arr = npz[npz.files[0]]
+                else:
+                    arr = np.load(filename, mmap_mode="r" if mmap else None)
+                span.nbytes = arr.nbytes
+            return arr
+        except FileNotFoundError:
+            if not self.data_dirname.is_dir():
+                raise _VersionRemoved(f"'{self.dirname}' was replaced while it was being read.") from None
+            return None
+
+    def _write_chunk(self, index: Tuple[int, ...], arr: np.ndarray) -> None:
+        filename = self.chunk_filename(index)
+        with atomic.replace_on_success(filename) as filename_tmp:
+            with profiling.span("chunked.write", arr.nbytes), open(filename_tmp, "wb") as f:
+                if self.compressed:
+                    np.savez_compressed(f, arr)
+                else:
+                    np.save(f, arr)
+
+    def _map(self, fn: Any, items: List[Any], kind: str) -> None:
+        with executor_.scope("thread", self.max_workers if len(items) > 1 else 1, kind=kind) as pool:
+            if pool is None:
+                for item in items:
+                    fn(item)
+            else:
+                for _ in pool.map(fn, items):
+                    pass
+
+    def read(self, key: Index = Ellipsis, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Read a selection (the whole array by default), optionally into `out`."""
+        parts, out_shape, squeeze = self._parts(key)
+        result_shape = tuple(n for axis, n in enumerate(out_shape) if axis not in squeeze)
+        if out is None:
+            buf = np.empty(out_shape, self.dtype)
+        else:
+            if out.shape != result_shape or out.dtype != self.dtype:
+                raise ValueError(f"Cannot read into out: expected {result_shape} {self.dtype}, got {out.shape} {out.dtype}.")
+            buf = out.reshape(out_shape)  # Only adds the axes of integer indices
+            if buf.size > 0 and not np.shares_memory(buf, out):
+                raise ValueError("out must be a view that can be reshaped without a copy.")
+
+        def _read(part: Tuple[Tuple[int, ...], tuple, tuple]) -> None:
+            index, chunk_sel, out_sel = part
+            chunk = self._read_chunk(index, mmap=True)
+            if chunk is None:
+                buf[out_sel] = 0
+            else:
+                buf[out_sel] = chunk[chunk_sel]
+
+        self._map(_read, parts, "read")
+        return out if out is not None else buf.reshape(result_shape)
+
+    def write(self, key: Index, value: npt.ArrayLike) -> None:
+        """Write `value` (broadcast to the selection) into the selected region."""
+        if self.mode != "r+":
+            raise PermissionError(f"'{self.dirname}' is opened read-only.")
+        parts, out_shape, squeeze = self._parts(key)
+        value = np.asarray(value, self.dtype)
+        selection_shape = tuple(n for axis, n in enumerate(out_shape) if axis not in squeeze)
+        value = np.broadcast_to(value, selection_shape).reshape(out_shape)
+
+        def _write(part: Tuple[Tuple[int, ...], tuple, tuple]) -> None:
+            index, chunk_sel, value_sel = part
+            chunk_shape = self._chunk_shape(index)
+            full = all(s.step == 1 and s.stop - s.start == n for s, n in zip(chunk_sel, chunk_shape))
+            if full:
+                chunk = np.ascontiguousarray(value[value_sel]).reshape(chunk_shape)  # ascontiguousarray makes 0-d arrays 1-d
+            else:
+                # Read-modify-write of a partially covered chunk
+                chunk = self._read_chunk(index)
+                chunk = np.zeros(chunk_shape, self.dtype) if chunk is None else np.array(chunk)
+                chunk[chunk_sel] = value[value_sel]
+            self._write_chunk(index, chunk)
+
+        self._map(_write, parts, "write")
+
+    def __getitem__(self, key: Index) -> np.ndarray:
+        return self.read(key)
+
+    def __setitem__(self, key: Index, value: npt.ArrayLike) -> None:
+        self.write(key, value)
+
+
+def _read_header(dirname: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.load(dirname / HEADER_NAME)
+    except (OSError, ValueError):
+        return None
+
+
+def _commit(dirname: Path, header: Dict[str, Any], arr: Optional[np.ndarray], max_workers: Optional[int]) -> None:
+    """Write a new version of a chunked array (all zeros if `arr` is None) and make it current."""
+    header = {**header, "version": 2, "data": f"{DATA_PREFIX}{os.getpid()}-{time.time_ns():x}"}
+
+    def _fill(dirname_target: Path) -> None:
+        os.mkdir(dirname_target / header["data"])
+        if arr is not None:
+            ChunkedArray(dirname_target, mode="r+", max_workers=max_workers, header=header)[...] = arr
+        json.write(dirname_target / HEADER_NAME, header, mkdir=False)  # Last: switches readers to the new version
+
+    previous = _read_header(dirname) if dirname.is_dir() else None
+    if previous is None or "data" not in previous:
+        # New array (or something else in the way): build it under a temporary name and swap it in
+        with atomic.replace_dir_on_success(dirname) as dirname_tmp:
+            _fill(dirname_tmp)
+        return
+
+    try:
+        _fill(dirname)
+    except BaseException:
+        shutil.rmtree(dirname / header["data"], ignore_errors=True)
+        raise
+    # Keep the previous version for readers that opened it before the switch
+    with os.scandir(dirname) as it:
+        stale = [e.name for e in it if e.name.startswith(DATA_PREFIX) and e.name not in (header["data"], previous["data"])]
+    for name in stale:
+        shutil.rmtree(dirname / name, ignore_errors=True)
+
+
+def _check_chunks(shape: Tuple[int, ...], dtype: np.dtype, chunks: Optional[Sequence[int]]) -> Tuple[int, ...]:
+    if chunks is None:
+        return default_chunks(shape, dtype)
+    chunks = tuple(int(c) for c in chunks)
+    if len(chunks) != len(shape) or any(c < 1 for c in chunks):
+        raise ValueError(f"chunks must have one positive size per axis of {shape}, got {chunks}.")
+    return chunks
+
+
+def create(
+    dirname: PathLike,
+    shape: Sequence[int],
+    dtype: npt.DTypeLike,
+    chunks: Optional[Sequence[int]] = None,
+    compressed: bool = False,
+    max_workers: Optional[int] = None,
+) -> ChunkedArray:
+    """Create an empty (all zeros) chunked array, replacing an existing one, and open it for writing.
+
+    No chunk is written until a region is assigned, so creating a huge array is cheap.
+    """
+    shape = tuple(int(n) for n in shape)
+    dtype = np.dtype(dtype)
+    chunks = _check_chunks(shape, dtype, chunks)
+    dirname = Path(dirname)
+    dirname.parent.mkdir(parents=True, exist_ok=True)
+    _commit(dirname, {"shape": list(shape), "dtype": dtype.str, "chunks": list(chunks), "compressed": compressed}, None, max_workers)
+    return ChunkedArray(dirname, mode="r+", max_workers=max_workers)
+
+
+def save(
+    dirname: PathLike,
+    arr: npt.ArrayLike,
+    chunks: Optional[Sequence[int]] = None,
+    compressed: bool = False,
+    max_workers: Optional[int] = None,
+    mkdir: bool = True,
+) -> Path:
+    """Save an array as a chunked array directory, writing the chunks in parallel.
+
+    A new array is written under a temporary name and renamed when complete. Saving over an
+    existing array writes a new version inside it and switches the header to it atomically; the
+    previous version is kept until the next save, so open handles and concurrent loads continue
+    to work. Concurrent saves to the same path are not supported.
+    `compressed` stores the chunks as compressed .npz files.
+    """
+    arr = np.asarray(arr)
+    if arr.dtype.hasobject:
+        raise ValueError("Arrays of Python objects cannot be saved in the chunked format.")
+    chunks = _check_chunks(arr.shape, arr.dtype, chunks)
+    dirname = Path(dirname)
+    if mkdir:
+        dirname.parent.mkdir(parents=True, exist_ok=True)
+    _commit(dirname, {"shape": list(arr.shape), "dtype": arr.dtype.str, "chunks": list(chunks), "compressed": compressed}, arr, max_workers)
+    return dirname
+
+
+def load(dirname: PathLike, out: Optional[np.ndarray] = None, max_workers: Optional[int] = None, key: Index = Ellipsis) -> np.ndarray:
+    """Load a chunked array (or the selection `key` of it), reading the chunks in parallel."""
+    for _ in range(2):
+        try:
+            return ChunkedArray(dirname, max_workers=max_workers).read(key, out=out)
+        except _VersionRemoved:
+            pass  # Saved over repeatedly while reading; retry on the current version
+    return ChunkedArray(dirname, max_workers=max_workers).read(key, out=out)
+
+
+def read_header(dirname: PathLike) -> Tuple[Tuple[int, ...], np.dtype]:
+    """Return the shape and dtype of a chunked array."""
+    c = ChunkedArray(dirname)
+    return c.shape, c.dtype
+
+
+def is_chunked(filename: PathLike) -> bool:
+    return os.path.splitext(filename)[1] == EXT
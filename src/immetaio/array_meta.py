@@ -6,9 +6,12 @@ from . import array
 from . import meta
 
 
-def save(filename: PathLike, arr: np.ndarray, **metadata: Any) -> Tuple[Path, Optional[Path]]:
-    """Save an array and optional metadata."""
-    filename_array = array.save(filename, arr)
+def save(filename: PathLike, arr: np.ndarray, profile: Optional[str] = None, **metadata: Any) -> Tuple[Path, Optional[Path]]:
+    """Save an array and optional metadata.
+
+    `profile` selects the compression profile (see `params.profiles`).
+    """
+    filename_array = array.save(filename, arr, profile=profile)
 
     if metadata:
         filename_meta = Path(filename_array).with_suffix(meta.ext)
@@ -19,17 +22,22 @@ def save(filename: PathLike, arr: np.ndarray, **metadata: Any) -> Tuple[Path, Op
     return filename_array, filename_meta
 
 
-def load(filename_array: PathLike, filename_meta: Optional[PathLike] = None) -> Tuple[np.ndarray, Dict[str, Any]]:
-    """Load an array and optional metadata."""
-    arr = array.load(filename_array)
+def load(filename_array: PathLike, filename_meta: Optional[PathLike] = None, out: Optional[np.ndarray] = None, mmap: bool = False, roi: Optional[array.ROI] = None, reduce: int = 1) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """Load an array and optional metadata.
+
+    If `out` is given, the array is decoded into it. If `mmap` is True, .npy files (and arrays the
+    metadata stores in external files) are memory-mapped.
+    `roi` and `reduce` load a region or a subsampled array (see `array.load`).
+    """
+    arr = array.load(filename_array, out=out, mmap=mmap, roi=roi, reduce=reduce)
 
     if filename_meta is not None:
         filename_meta = Path(filename_meta)
         if not filename_meta.exists():
             raise FileNotFoundError(f"'{filename_meta}' does not exist.")
-        metadata = meta.load(filename_meta)
+        metadata = meta.load(filename_meta, mmap=mmap)
     else:
         filename_meta = Path(filename_array).with_suffix(meta.ext)
-        metadata = meta.load(filename_meta) if Path(filename_meta).exists() else {}
+        metadata = meta.load(filename_meta, mmap=mmap) if Path(filename_meta).exists() else {}
 
     return arr, metadata
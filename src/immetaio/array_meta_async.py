@@ -0,0 +1,250 @@
+"""
+asyncio variants of the array + metadata I/O functions.
+
+The coroutines run the actual I/O on the library's shared scheduler (see `executor`), so an
+event loop can drive many concurrent saves and loads without a thread per call. Cancelling a
+coroutine cancels the frames that have not started yet; frames already being written finish.
+Arrays passed to a save must not be modified until the coroutine completes.
+"""
+
+from pathlib import Path
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, List, Optional, Tuple, Union
+from concurrent.futures import Executor, Future
+from collections import deque
+import asyncio
+import functools
+import warnings
+import numpy as np
+import numpy.typing as npt
+from . import array_meta
+from . import atomic
+from . import array_meta_dir
+from . import array_meta_multi
+from . import array_meta_pack
+from . import array_meta_stream
+from . import executor as executor_
+from .array import ROI
+from .typing import PathLike
+
+
+def _open(executor: executor_.ExecutorLike, max_workers: Optional[int], kind: str) -> Executor:
+    if isinstance(executor, Executor):
+        return executor
+    return executor_.open_lane(executor, max_workers, kind)
+
+
+async def _gather(futures: List["asyncio.Future[Any]"]) -> List[Any]:
+    """Await all futures in order, cancelling the rest if one fails or the caller is cancelled."""
+    try:
+        return [await future for future in futures]
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+
+
+async def save(filename: PathLike, arr: np.ndarray, profile: Optional[str] = None, **metadata: Any) -> Tuple[Path, Optional[Path]]:
+    """Save an array and optional metadata (see `array_meta.save`)."""
+    job = functools.partial(array_meta.save, filename, arr, profile=profile, **metadata)
+    return await asyncio.wrap_future(executor_.submit("write", job))
+
+
+async def load(
+    filename_array: PathLike,
+    filename_meta: Optional[PathLike] = None,
+    out: Optional[np.ndarray] = None,
+    mmap: bool = False,
+    roi: Optional[ROI] = None,
+    reduce: int = 1,
+) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """Load an array and optional metadata (see `array_meta.load`)."""
+    job = functools.partial(array_meta.load, filename_array, filename_meta, out=out, mmap=mmap, roi=roi, reduce=reduce)
+    return await asyncio.wrap_future(executor_.submit("read", job))
+
+
+async def _save_jobs(
+    jobs: Iterable[Tuple[PathLike, np.ndarray, Dict[str, Any]]],
+    max_workers: Optional[int] = None,
+    profile: Optional[str] = None,
+    executor: executor_.ExecutorLike = "thread",
+) -> List[Tuple[Path, Optional[Path]]]:
+    """Save (filename, array, metadata) jobs, keeping only a bounded window of frames in flight."""
+    pool = _open(executor, max_workers, "write")
+    window = 2 * executor_.num_workers(pool)
+    futures: Deque["asyncio.Future[Tuple[Path, Optional[Path]]]"] = deque()
+    results = []
+    try:
+        for filename, arr, metadata_i in jobs:
+            if len(futures) >= window:
+                results.append(await futures.popleft())
+            futures.append(asyncio.wrap_future(executor_.submit_save(pool, filename, arr, profile, metadata_i)))
+        results.extend(await _gather(list(futures)))
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    if atomic.get_durability() == "dir":
+        await asyncio.wrap_future(executor_.submit("write", atomic.flush))
+    return results
+
+
+async def save_multi(
+    filenames: Iterable[PathLike],
+    arrs: Iterable[npt.ArrayLike],
+    max_workers: Optional[int] = None,
+    profile: Optional[str] = None,
+    executor: executor_.ExecutorLike = "thread",
+    **metadata: List[Any],
+) -> List[Tuple[Path, Optional[Path]]]:
+    """Save multiple arrays and optional metadata (see `array_meta_multi.save`)."""
+    jobs = array_meta_multi._check_save(filenames, arrs, metadata)
+    return await _save_jobs(jobs, max_workers=max_workers, profile=profile, executor=executor)
+
+
+async def save_dir(
+    dirname: PathLike,
+    arrs: Iterable[npt.ArrayLike],
+    max_workers: Optional[int] = None,
+    use_index: bool = True,
+    profile: Optional[str] = None,
+    executor: executor_.ExecutorLike = "thread",
+    **metadata: List[Any],
+) -> List[Tuple[Path, Optional[Path]]]:
+    """Save multiple arrays and optional metadata in a directory (see `array_meta_dir.save`)."""
+    dirname = Path(dirname)
+    layouts: List[Tuple[Tuple[int, ...], str]] = []
+    jobs = array_meta_multi._check_save(array_meta_dir._filenames(dirname, arrs), array_meta_dir._record(arrs, layouts), metadata)
+    results = await _save_jobs(jobs, max_workers=max_workers, profile=profile, executor=executor)
+    if use_index:
+        await asyncio.wrap_future(executor_.submit("write", array_meta_dir._update_index, dirname, results, layouts))
+        if atomic.get_durability() == "dir":
+            await asyncio.wrap_future(executor_.submit("write", atomic.flush))
+    return results
+
+
+async def load_multi(
+    filenames_array: List[PathLike],
+    filenames_meta: Optional[List[Optional[PathLike]]] = None,
+    max_workers: Optional[int] = None,
+    stack: bool = False,
+    out: Optional[Union[np.ndarray, PathLike]] = None,
+    mmap: bool = False,
+    executor: executor_.ExecutorLike = "thread",
+    roi: Optional[ROI] = None,
+    reduce: int = 1,
+) -> Tuple[Union[List[np.ndarray], np.ndarray], Dict[str, List[Any]]]:
+    """Load multiple arrays and optional metadata (see `array_meta_multi.load`)."""
+    filenames_meta = array_meta_multi._check_load(filenames_array, filenames_meta)
+    if len(filenames_array) == 0:
+        warnings.warn("No filenames provided. Returning empty arrays and metadata.")
+        return [], {}
+
+    pool = _open(executor, max_workers, "read")
+    stack = stack or out is not None
+    results = []
+    outs: List[Optional[np.ndarray]] = [None for _ in range(len(filenames_array))]
+    if stack:
+        # Probing the first frame and allocating the buffer (possibly a memmap) run off the loop
+        load_first = functools.partial(array_meta.load, filenames_array[0], filenames_meta[0], roi=roi, reduce=reduce)
+        job = functools.partial(array_meta_multi._prepare_stack, out, len(filenames_array), load_first)
+        out, outs, results = await asyncio.wrap_future(executor_.submit("read", job))
+
+    start = len(results)
+    mmap = mmap and not stack
+    futures = []
+    for i in range(start, len(filenames_array)):
+        future: Future = executor_.submit_load(pool, filenames_array[i], filenames_meta[i], out=outs[i], mmap=mmap, roi=roi, reduce=reduce)
+        futures.append(asyncio.wrap_future(future))
+    results.extend(await _gather(futures))
+
+    return array_meta_multi._collect(results, out if stack else None)
+
+
+async def load_dir(
+    dirname: PathLike,
+    max_workers: Optional[int] = None,
+    stack: bool = False,
+    out: Optional[Union[np.ndarray, PathLike]] = None,
+    use_index: bool = True,
+    mmap: bool = False,
+    executor: executor_.ExecutorLike = "thread",
+    roi: Optional[ROI] = None,
+    reduce: int = 1,
+) -> Tuple[Union[List[np.ndarray], np.ndarray], Dict[str, List[Any]]]:
+    """Load multiple arrays and optional metadata from a directory (see `array_meta_dir.load`)."""
+    dirname = Path(dirname)
+    job = functools.partial(array_meta_dir.retrieve_array_meta_files, dirname, use_index=use_index)
+    filenames_array, filenames_meta = await asyncio.wrap_future(executor_.submit("read", job))
+
+    if len(filenames_array) == 0:
+        warnings.warn(f"No array files found in '{dirname}'. Returning empty list.")
+
+    return await load_multi(filenames_array, filenames_meta, max_workers=max_workers, stack=stack, out=out, mmap=mmap, executor=executor, roi=roi, reduce=reduce)
+
+
+async def save_pack(
+    filename: PathLike,
+    arrs: Iterable[npt.ArrayLike],
+    max_workers: Optional[int] = None,
+    append: bool = False,
+    profile: Optional[str] = None,
+    **metadata: List[Any],
+) -> Path:
+    """Save multiple arrays and optional metadata to a pack file (see `array_meta_pack.save`).
+
+    The pack is written on a thread of the event loop's default executor, which encodes the
+    frames on the shared scheduler. Cancelling the coroutine does not stop the write.
+    """
+    job = functools.partial(array_meta_pack.save, filename, arrs, max_workers=max_workers, append=append, profile=profile, **metadata)
+    return await asyncio.get_running_loop().run_in_executor(None, job)
+
+
+async def load_pack(
+    filename: PathLike,
+    max_workers: Optional[int] = None,
+    stack: bool = False,
+    out: Optional[Union[np.ndarray, PathLike]] = None,
+    mmap: bool = False,
+    roi: Optional[ROI] = None,
+    reduce: int = 1,
+) -> Tuple[Union[List[np.ndarray], np.ndarray], Dict[str, List[Any]]]:
+    """Load all arrays and metadata of a pack file (see `array_meta_pack.load` and `save_pack`)."""
+    job = functools.partial(array_meta_pack.load, filename, max_workers=max_workers, stack=stack, out=out, mmap=mmap, roi=roi, reduce=reduce)
+    return await asyncio.get_running_loop().run_in_executor(None, job)
+
+
+async def iter_load(
+    target: Union[PathLike, List[PathLike]],
+    prefetch: int = 4,
+    max_workers: Optional[int] = None,
+    start: Optional[int] = None,
+    stop: Optional[int] = None,
+    step: Optional[int] = None,
+    mmap: bool = False,
+    roi: Optional[ROI] = None,
+    reduce: int = 1,
+) -> AsyncIterator[Tuple[int, np.ndarray, Dict[str, Any]]]:
+    """Asynchronously iterate over arrays and metadata with bounded read-ahead (see `array_meta_stream.iter_load`).
+
+    Frames read ahead but not consumed are cancelled when the iteration stops early.
+    """
+    if prefetch < 1:
+        raise ValueError(f"prefetch must be >= 1, got {prefetch}.")
+
+    filenames_array, filenames_meta = await asyncio.wrap_future(executor_.submit("read", array_meta_stream._resolve, target))
+    indices = range(len(filenames_array))[start:stop:step]
+    pool = executor_.lane("read", max_workers)
+
+    def _submit(i: int) -> "asyncio.Future[Tuple[np.ndarray, Dict[str, Any]]]":
+        return asyncio.wrap_future(pool.submit(array_meta.load, filenames_array[i], filenames_meta[i], mmap=mmap, roi=roi, reduce=reduce))
+
+    window = array_meta_stream._ReadAhead(_submit, indices, prefetch)
+    try:
+        while window:
+            i, future = window.pop()
+            arr, metadata = await future
+            # Keep the window full before handing the frame over
+            window.refill()
+            yield i, arr, metadata
+    finally:
+        window.cancel()
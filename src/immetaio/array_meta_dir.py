@@ -1,61 +1,230 @@
 from pathlib import Path
-from typing import Any, Tuple, List, Dict, Optional
-import re
+from typing import Any, Tuple, List, Dict, NamedTuple, Optional, Iterable, Iterator, Union
+import itertools
+import os
+import shutil
 import warnings
 import numpy as np
 import numpy.typing as npt
+from . import array
 from . import array_meta_multi
+from . import atomic
+from . import json
 from . import meta
+from . import profiling
+from . import index
+from . import executor as executor_
+from .array import ROI
 from .typing import PathLike
 
 
-def _numerical_sort(string):
-    """Sort the file names numerically."""
-    string = str(string)
-    numbers = re.compile(r"(\d+)")
-    parts = numbers.split(string)
-    parts[1::2] = map(int, parts[1::2])
-    return parts
+_numerical_sort = index.numerical_sort_key
 
 
-def retrieve_array_meta_files(dirname: PathLike) -> Tuple[List[Path], List[Optional[Path]]]:
-    """Get filenames of arrays and metadata in a directory."""
+def retrieve_array_meta_files(dirname: PathLike, use_index: bool = True) -> Tuple[List[Path], List[Optional[Path]]]:
+    """Get filenames of arrays and metadata in a directory.
+
+    If `use_index` is True, a fresh directory index is trusted and a stale one is rebuilt.
+    Otherwise, the directory is scanned once with `os.scandir`.
+    """
     dirname = Path(dirname)
     if not dirname.is_dir():
         raise FileNotFoundError(f"'{dirname}' is not a existing directory.")
 
-    ext_candidates = [".png", ".exr", ".npy"]
-    filenames_array = []
-    for child in dirname.iterdir():
-        if child.suffix in ext_candidates:
-            filenames_array.append(child)
-    filenames_array = sorted(filenames_array, key=_numerical_sort)
+    with profiling.span("dir.discover"):
+        entries = index.discover(dirname) if use_index else index.scan(dirname)
 
+    filenames_array = []
     filenames_meta = []
-    for filename_array in filenames_array:
-        filename_meta = filename_array.with_suffix(meta.ext)
-        if filename_meta.exists():
-            filenames_meta.append(filename_meta)
-        else:
-            filenames_meta.append(None)
+    for entry in entries:
+        filename_array = dirname / entry.filename
+        filenames_array.append(filename_array)
+        filenames_meta.append(filename_array.with_suffix(meta.ext) if entry.meta else None)
 
     return filenames_array, filenames_meta
 
 
-def save(dirname: PathLike, arrs: npt.ArrayLike, max_workers: Optional[int] = None, **metadata: List[Any]) -> List[Tuple[Path, Optional[Path]]]:
-    """Save multiple arrays and optional metadata in a directory."""
+class RecoveryReport(NamedTuple):
+    """Result of `recover`."""
+
+    complete: List[Tuple[Path, Optional[Path]]]
+    incomplete: List[Tuple[Path, str]]
+    removed: List[Path]
+    restored: List[Path]
+
+
+def recover(dirname: PathLike, remove_temp: bool = True, verify: bool = False, min_age: float = 60.0) -> RecoveryReport:
+    """Check a directory for files left behind by an interrupted capture, without raising.
+
+    - `complete`: (array, sidecar or None) pairs that look intact, in load order.
+    - `incomplete`: (path, reason) for unreadable arrays, corrupt sidecars, sidecars without an array,
+      and external metadata arrays (see `json.set_external_threshold`) without a sidecar or
+      no longer referenced by it.
+    - `removed`: temporary files of interrupted writes, deleted if `remove_temp` is True
+      (otherwise they are reported as incomplete). Temporary files younger than `min_age` seconds
+      or whose writing process is still running belong to a write in progress and are kept,
+      so a directory that is still being captured can be checked safely.
+    - `restored`: chunked arrays whose replacement was interrupted, moved back from their backup
+      name (only if `remove_temp` is True).
+
+    Arrays are checked by their header (and fully decoded if `verify` is True); sidecars are parsed.
+    """
+    dirname = Path(dirname)
+    if not dirname.is_dir():
+        raise FileNotFoundError(f"'{dirname}' is not a existing directory.")
+
+    complete = []
+    incomplete = []
+    removed = []
+    restored = []
+    with os.scandir(dirname) as it:
+        names = [entry.name for entry in it]
+    for name in names:
+        if atomic.is_temp(name):
+            if not atomic.is_abandoned(dirname / name, min_age):
+                incomplete.append((dirname / name, "temporary file of a write in progress"))
+            elif remove_temp:
+                try:
+                    if atomic.is_old(name) and not os.path.lexists(dirname / atomic.original_name(name)):
+                        os.rename(dirname / name, dirname / atomic.original_name(name))  # Interrupted between the renames
+                        restored.append(dirname / atomic.original_name(name))
+                        continue
+                    if os.path.isdir(dirname / name):
+                        shutil.rmtree(dirname / name)  # Interrupted save of a chunked array
+                    else:
+                        os.remove(dirname / name)
+                except FileNotFoundError:
+                    continue  # Removed in the meantime
+                removed.append(dirname / name)
+            else:
+                incomplete.append((dirname / name, "temporary file of an interrupted write"))
+
+    entries = index.scan(dirname)
+    stems = {os.path.splitext(entry.filename)[0] for entry in entries}
+    for entry in entries:
+        filename_array = dirname / entry.filename
+        filename_meta = filename_array.with_suffix(meta.ext) if entry.meta else None
+        try:
+            if os.path.getsize(filename_array) == 0:
+                raise ValueError("empty file")
+            if verify:
+                array.load(filename_array)
+            else:
+                array.read_header(filename_array)
+        except Exception as e:
+            incomplete.append((filename_array, f"unreadable array: {e}"))
+            continue
+        if filename_meta is not None:
+            try:
+                json.load(filename_meta, mmap=True)  # Bypasses the cache; external arrays are only opened
+            except Exception as e:
+                incomplete.append((filename_meta, f"corrupt sidecar: {e}"))
+                continue
+        complete.append((filename_array, filename_meta))
+
+    from .array_meta_stream import MANIFEST_NAME  # array_meta_stream depends on this module
+
+    name_set = set(names)
+    for name in sorted(names, key=index.numerical_sort_key):
+        stem, ext = os.path.splitext(name)
+        if ext == meta.ext and stem not in stems and not name.startswith(".") and name != MANIFEST_NAME:
+            incomplete.append((dirname / name, "sidecar without an array"))
+        elif ext == json.EXTERNAL_EXT:
+            owner = json.blob_owner(name) + meta.ext
+            if owner not in name_set:
+                incomplete.append((dirname / name, "external metadata array without a sidecar"))
+            elif name not in json._referenced_blobs(dirname / owner):
+                incomplete.append((dirname / name, "external metadata array not referenced by its sidecar"))
+
+    return RecoveryReport(complete, incomplete, removed, restored)
+
+
+def _filenames(dirname: Path, arrs: Iterable[npt.ArrayLike]) -> Iterable[Path]:
+    """Name the frames of a directory by their index (0, 1, ...)."""
+    if hasattr(arrs, "__len__"):
+        return [dirname / f"{i}" for i in range(len(arrs))]
+    else:
+        return (dirname / f"{i}" for i in itertools.count())
+
+
+def _record(arrs: Iterable[npt.ArrayLike], layouts: List[Tuple[Tuple[int, ...], str]]) -> Iterator[np.ndarray]:
+    """Record shapes and dtypes for the index while the arrays stream through."""
+    for arr in arrs:
+        arr = np.asarray(arr)
+        layouts.append((arr.shape, arr.dtype.str))
+        yield arr
+
+
+def _update_index(dirname: Path, results: List[Tuple[Path, Optional[Path]]], layouts: List[Tuple[Tuple[int, ...], str]]) -> None:
+    if len(results) == 0:
+        return
+    known = {}
+    for (filename_array, filename_meta), (shape, dtype) in zip(results, layouts):
+        known[filename_array.name] = index.IndexEntry(filename_array.name, shape, dtype, filename_array.suffix, filename_meta is not None)
+    with profiling.span("dir.index"):
+        index.update(dirname, known)
+
+
+def save(
+    dirname: PathLike,
+    arrs: Iterable[npt.ArrayLike],
+    max_workers: Optional[int] = None,
+    use_index: bool = True,
+    profile: Optional[str] = None,
+    executor: executor_.ExecutorLike = "thread",
+    incremental: bool = False,
+    **metadata: List[Any],
+) -> array_meta_multi.SaveResults:
+    """Save multiple arrays and optional metadata in a directory.
+
+    `arrs` may be an array, a list, or any iterable (e.g. a generator) of arrays with different shapes.
+    If `use_index` is True, the directory index is updated after saving.
+    `profile` selects the compression profile (see `params.profiles`).
+    `executor` is 'thread', 'process', or an Executor instance to reuse (see `executor.scope`).
+    If `incremental` is True, frames that are unchanged since the last incremental save are skipped
+    (see `array_meta_multi.save`); this requires `use_index`.
+    """
+    if incremental and not use_index:
+        raise ValueError("incremental saves require use_index=True.")
     dirname = Path(dirname)
-    arrs = np.asarray(arrs)
-    filenames_array = [dirname / f"{i}" for i in range(len(arrs))]
-    return array_meta_multi.save(filenames_array, arrs, max_workers=max_workers, **metadata)
+    layouts: List[Tuple[Tuple[int, ...], str]] = []
+    results = array_meta_multi.save(
+        _filenames(dirname, arrs), _record(arrs, layouts), max_workers=max_workers, profile=profile, executor=executor, incremental=incremental, **metadata
+    )
+    if use_index and not incremental:  # Incremental saves update the index with the hashes
+        _update_index(dirname, results, layouts)
+        atomic.flush()
+    return results
+
 
+def load(
+    dirname: PathLike,
+    max_workers: Optional[int] = None,
+    stack: bool = False,
+    out: Optional[Union[np.ndarray, PathLike]] = None,
+    use_index: bool = True,
+    mmap: bool = False,
+    executor: executor_.ExecutorLike = "thread",
+    roi: Optional[ROI] = None,
+    reduce: int = 1,
+    skip_incomplete: bool = False,
+) -> Tuple[Union[List[np.ndarray], np.ndarray], Dict[str, List[Any]]]:
+    """Load multiple arrays and optional metadata from a directory.
 
-def load(dirname: PathLike, max_workers: Optional[int] = None) -> Tuple[List[np.ndarray], Dict[str, List[Any]]]:
-    """Load multiple arrays and optional metadata from a directory."""
+    See `array_meta_multi.load` for `stack`, `out`, `mmap`, `executor`, `roi` and `reduce`, and `retrieve_array_meta_files` for `use_index`.
+    If `skip_incomplete` is True, frames that `recover` reports as incomplete are skipped with a warning instead of raising.
+    """
     dirname = Path(dirname)
-    filenames_array, filenames_meta = retrieve_array_meta_files(dirname)
+    if skip_incomplete:
+        report = recover(dirname, remove_temp=False)
+        if report.incomplete:
+            warnings.warn(f"Skipping {len(report.incomplete)} incomplete file(s) in '{dirname}': {[str(p) for p, _ in report.incomplete]}")
+        filenames_array = [f for f, _ in report.complete]
+        filenames_meta = [f for _, f in report.complete]
+    else:
+        filenames_array, filenames_meta = retrieve_array_meta_files(dirname, use_index=use_index)
 
     if len(filenames_array) == 0:
         warnings.warn(f"No array files found in '{dirname}'. Returning empty list.")
 
-    return array_meta_multi.load(filenames_array, filenames_meta, max_workers=max_workers)
+    return array_meta_multi.load(filenames_array, filenames_meta, max_workers=max_workers, stack=stack, out=out, mmap=mmap, executor=executor, roi=roi, reduce=reduce)
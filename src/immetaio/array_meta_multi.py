@@ -1,55 +1,277 @@
 from pathlib import Path
-from typing import Any, Tuple, Dict, List, Optional, Iterable
-from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Tuple, Dict, List, Optional, Iterable, Iterator, Deque, Union
+from concurrent.futures import Future
+from collections import deque
+import functools
+import os
 import warnings
+import zlib
 import numpy as np
 import numpy.typing as npt
+from . import array
 from . import array_meta
+from . import atomic
+from . import index
+from . import json
+from . import meta
+from . import params
+from . import profiling
+from . import executor as executor_
+from .array import ROI
 from .typing import PathLike
 
+_END = object()
 
-def save(filenames: List[PathLike], arrs: npt.ArrayLike, max_workers: Optional[int] = None, **metadata: List[Any]) -> List[Tuple[Path, Optional[Path]]]:
-    """Save multiple arrays and optional metadata in parallel."""
-    arrs = np.asarray(arrs)
 
+def _iter_jobs(filenames: Iterable[PathLike], arrs: Iterable[npt.ArrayLike], metadata: Dict[str, List[Any]]) -> Iterator[Tuple[PathLike, np.ndarray, Dict[str, Any]]]:
+    """Yield (filename, array, metadata) per frame without materializing the whole batch.
+
+    `filenames` may be longer than `arrs` only if it is unsized (e.g. an endless generator).
+    """
+    keys = list(metadata.keys())
+    filenames_iter = iter(filenames)
+    n = 0
+    for arr in arrs:
+        filename = next(filenames_iter, _END)
+        if filename is _END:
+            raise ValueError(f"filenames and arrays must have the same length (more arrays than the {n} filenames).")
+        metadata_i = {}
+        for key in keys:
+            if n >= len(metadata[key]):
+                raise ValueError(f"The length of metadatas['{key}'] ({len(metadata[key])}) must match the length of arrays (> {n}).")
+            metadata_i[key] = metadata[key][n]
+        yield filename, np.asarray(arr), metadata_i
+        n += 1
+
+    if hasattr(filenames, "__len__") and len(filenames) != n:
+        raise ValueError(f"filenames and arrays must have the same length ({len(filenames)} != {n}).")
+    for key in keys:
+        if len(metadata[key]) != n:
+            raise ValueError(f"The length of metadatas['{key}'] ({len(metadata[key])}) must match the length of arrays ({n}).")
+
+
+def _check_save(filenames: Iterable[PathLike], arrs: Iterable[npt.ArrayLike], metadata: Dict[str, List[Any]]) -> Iterator[Tuple[PathLike, np.ndarray, Dict[str, Any]]]:
+    """Validate the arguments of `save` and return its per-frame jobs."""
     if not isinstance(filenames, Iterable) or isinstance(filenames, (str, bytes)):
         raise TypeError("filenames must be iterable.")
-    if len(filenames) != len(arrs):
+    if hasattr(filenames, "__len__") and hasattr(arrs, "__len__") and len(filenames) != len(arrs):
         raise ValueError(f"filenames and arrays must have the same length ({len(filenames)} != {len(arrs)}).")
 
     # Ensure metadata is a dictionary with lists of the same length as arrays
-    keys = list(metadata.keys())
-    for key in keys:
+    for key in metadata:
         if not hasattr(metadata[key], "__len__") or isinstance(metadata[key], (str, bytes)):
             raise TypeError(f"metadatas['{key}'] must be a list-like object.")
-        if len(metadata[key]) != len(arrs):
+        if hasattr(arrs, "__len__") and len(metadata[key]) != len(arrs):
             raise ValueError(f"The length of metadatas['{key}'] ({len(metadata[key])}) must match the length of arrays ({len(arrs)}).")
 
-    results = []
-    if max_workers == 1:
-        # Naive loop implementation (no parallelism)
-        for i, (filename, arr) in enumerate(zip(filenames, arrs)):
-            metadata_i = {key: metadata[key][i] for key in keys}
-            result = array_meta.save(filename, arr, **metadata_i)
-            results.append(result)
-    else:
-        # Save arrays and metadata in parallel
-        with ThreadPoolExecutor(max_workers) as executor:
-            futures = []
-            for i, (filename, arr) in enumerate(zip(filenames, arrs)):
-                metadata_i = {key: metadata[key][i] for key in keys}
-                future = executor.submit(array_meta.save, filename, arr, **metadata_i)
-                futures.append(future)
+    return _iter_jobs(filenames, arrs, metadata)
 
-            for future in futures:
-                result = future.result()
-                results.append(result)
 
+class SaveResults(list):
+    """List of (array filename, metadata filename or None) per frame, with write/skip counts.
+
+    `written` and `skipped` count the frames that were saved and that were left untouched
+    because they were unchanged (only incremental saves skip frames).
+    """
+
+    def __init__(self, results: Iterable[Tuple[Path, Optional[Path]]] = (), written: int = 0, skipped: int = 0):
+        super().__init__(results)
+        self.written = written
+        self.skipped = skipped
+
+
+def _hash_array(arr: np.ndarray, salt: str = "") -> Optional[str]:
+    """Fast non-cryptographic hash (CRC-32) of the raw buffer, shape and dtype of an array, and `salt`."""
+    if arr.dtype.hasobject:
+        return None
+    crc = zlib.crc32(f"{arr.shape}|{arr.dtype.str}|{salt}".encode())
+    crc = zlib.crc32(np.ascontiguousarray(arr).reshape(-1).view(np.uint8), crc)
+    return f"{crc:08x}"
+
+
+def _hashable_metadata(o: Any) -> Any:
+    if isinstance(o, np.ndarray):
+        return {"ndarray": _hash_array(o) or repr(o.tolist())}
+    elif isinstance(o, dict):
+        return {str(k): _hashable_metadata(v) for k, v in o.items()}
+    elif isinstance(o, (list, tuple)):
+        return [_hashable_metadata(v) for v in o]
+    return o
+
+
+def _hash_metadata(metadata: Dict[str, Any]) -> Optional[str]:
+    """Hash of the metadata of a frame (None if there is none); arrays in it are hashed by content."""
+    if not metadata:
+        return None
+    text = json.dumps(_hashable_metadata(metadata), indent=None)
+    return f"{zlib.crc32(text.encode()):08x}"
+
+
+def _stamp(filename_array: Path, filename_meta: Optional[Path]) -> Optional[Tuple[int, ...]]:
+    try:
+        st = os.stat(filename_array)
+        stamp = (st.st_mtime_ns, st.st_size)
+        if filename_meta is not None:
+            st_meta = os.stat(filename_meta)
+            stamp += (st_meta.st_mtime_ns, st_meta.st_size)
+        return stamp
+    except FileNotFoundError:
+        return None
+
+
+class _Incremental:
+    """Skips frames whose array and metadata match the hashes in the index of their directory."""
+
+    def __init__(self, profile: Optional[str]):
+        self.profile = profile
+        self._indexes: Dict[Path, Dict[str, index.IndexEntry]] = {}
+        self.records: List[Tuple[Tuple[int, ...], str, Optional[str], Optional[str]]] = []
+
+    def _previous(self, dirname: Path) -> Dict[str, index.IndexEntry]:
+        if dirname not in self._indexes:
+            self._indexes[dirname] = {e.filename: e for e in index.load(dirname) or []} if dirname.is_dir() else {}
+        return self._indexes[dirname]
+
+    def check(self, filename: PathLike, arr: np.ndarray, metadata: Dict[str, Any]) -> Tuple[Path, Optional[Tuple[Path, Optional[Path]]]]:
+        """Return the resolved filename and, if the frame is unchanged on disk, its result (None otherwise)."""
+        filename_array = array.get_filename(filename, arr, self.profile)
+        with profiling.span("multi.hash", arr.nbytes):
+            # Salted with the resolved encoder settings, so a change of profile rewrites the frames
+            encoding = f"{filename_array.suffix}|{params.get_imwrite_params(filename_array.suffix, self.profile)}"
+            h = _hash_array(arr, encoding)
+            mh = _hash_metadata(metadata)
+        self.records.append((arr.shape, arr.dtype.str, h, mh))
+
+        filename_meta = filename_array.with_suffix(meta.ext) if metadata else None
+        entry = self._previous(filename_array.parent).get(filename_array.name)
+        if h is None or entry is None or entry.hash != h or entry.meta_hash != mh:
+            return filename_array, None
+        if entry.stamp is None or entry.stamp != _stamp(filename_array, filename_meta):
+            return filename_array, None  # Changed (or removed) since the hashes were recorded
+        return filename_array, (filename_array, filename_meta)
+
+    def known(self, results: List[Tuple[Path, Optional[Path]]]) -> Dict[Path, Dict[str, index.IndexEntry]]:
+        """Index entries with hashes and stamps of the saved frames, by directory."""
+        by_dir: Dict[Path, Dict[str, index.IndexEntry]] = {}
+        for (filename_array, filename_meta), (shape, dtype, h, mh) in zip(results, self.records):
+            stamp = _stamp(filename_array, filename_meta)
+            by_dir.setdefault(filename_array.parent, {})[filename_array.name] = index.IndexEntry(
+                filename_array.name, shape, dtype, filename_array.suffix, filename_meta is not None, h, mh, stamp
+            )
+        return by_dir
+
+
+def _done(result: Any) -> Future:
+    future: Future = Future()
+    future.set_result(result)
+    return future
+
+
+def _save_jobs(
+    jobs: Iterable[Tuple[PathLike, np.ndarray, Dict[str, Any]]],
+    max_workers: Optional[int] = None,
+    profile: Optional[str] = None,
+    executor: executor_.ExecutorLike = "thread",
+    incremental: Optional[_Incremental] = None,
+) -> SaveResults:
+    """Save (filename, array, metadata) jobs, keeping only a bounded window of frames in flight.
+
+    With `incremental`, frames it reports as unchanged are not saved.
+    """
+    results = SaveResults()
+    with profiling.span("multi.save"), executor_.scope(executor, max_workers, kind="write") as pool:
+        window = 2 * executor_.num_workers(pool) if pool is not None else 1
+        futures: Deque[Future] = deque()
+        for filename, arr, metadata_i in jobs:
+            if len(futures) >= window:
+                results.append(futures.popleft().result())
+            if incremental is not None:
+                filename, unchanged = incremental.check(filename, arr, metadata_i)
+                if unchanged is not None:
+                    futures.append(_done(unchanged))
+                    results.skipped += 1
+                    continue
+            if pool is None:
+                # Naive loop implementation (no parallelism)
+                future = _done(array_meta.save(filename, arr, profile=profile, **metadata_i))
+            else:
+                # Save arrays and metadata in parallel
+                future = executor_.submit_save(pool, filename, arr, profile, metadata_i)
+            futures.append(future)
+            results.written += 1
+
+        while futures:
+            results.append(futures.popleft().result())
+
+    atomic.flush()
     return results
 
 
-def load(filenames_array: List[PathLike], filenames_meta: Optional[List[Optional[PathLike]]] = None, max_workers: Optional[int] = None) -> Tuple[List[np.ndarray], Dict[str, List[Any]]]:
-    """Load multiple arrays and optional metadata in parallel."""
+def save(
+    filenames: Iterable[PathLike],
+    arrs: Iterable[npt.ArrayLike],
+    max_workers: Optional[int] = None,
+    profile: Optional[str] = None,
+    executor: executor_.ExecutorLike = "thread",
+    incremental: bool = False,
+    **metadata: List[Any],
+) -> SaveResults:
+    """Save multiple arrays and optional metadata in parallel.
+
+    `arrs` may be an array, a list, or any iterable (e.g. a generator) of arrays with different shapes.
+    The arrays are consumed lazily, so only the frames in flight are held in memory.
+    `profile` selects the compression profile (see `params.profiles`).
+    `executor` is 'thread', 'process', or an Executor instance to reuse (see `executor.scope`).
+
+    If `incremental` is True, a content hash of each array and its metadata is kept in the index
+    of its directory, and frames whose files still match it are skipped. The returned list has
+    `written` and `skipped` counts.
+    """
+    state = _Incremental(profile) if incremental else None
+    results = _save_jobs(_check_save(filenames, arrs, metadata), max_workers=max_workers, profile=profile, executor=executor, incremental=state)
+    if state is not None:
+        with profiling.span("multi.index"):
+            for dirname, known in state.known(results).items():
+                index.update(dirname, known)
+        atomic.flush()
+    return results
+
+
+def _allocate_out(out: Optional[Union[np.ndarray, PathLike]], shape: Tuple[int, ...], dtype: np.dtype) -> np.ndarray:
+    """Return a buffer for stacked loading, creating a .npy memmap if `out` is a path."""
+    if out is None:
+        return np.empty(shape, dtype)
+    elif isinstance(out, np.ndarray):
+        if out.shape != shape or out.dtype != dtype:
+            raise ValueError(f"out must have shape {shape} and dtype {dtype}, got {out.shape} and {out.dtype}.")
+        return out
+    else:
+        Path(out).parent.mkdir(parents=True, exist_ok=True)
+        return np.lib.format.open_memmap(out, mode="w+", dtype=dtype, shape=shape)
+
+
+def _prepare_stack(
+    out: Optional[Union[np.ndarray, PathLike]],
+    n: int,
+    load_first: Callable[[], Tuple[np.ndarray, Dict[str, Any]]],
+) -> Tuple[np.ndarray, List[np.ndarray], List[Tuple[np.ndarray, Dict[str, Any]]]]:
+    """Return the (N, ...) buffer of a stacked load, its slices, and the results loaded so far.
+
+    Unless `out` is a preallocated array, the first frame is loaded with `load_first` to probe
+    the shape and dtype, and is returned as the first result.
+    """
+    if isinstance(out, np.ndarray):
+        if len(out) != n:
+            raise ValueError(f"out must have the same length as filenames_array ({len(out)} != {n}).")
+        return out, list(out), []
+    arr_0, metadata_0 = load_first()
+    out = _allocate_out(out, (n, *arr_0.shape), arr_0.dtype)
+    out[0] = arr_0
+    return out, list(out), [(out[0], metadata_0)]
+
+
+def _check_load(filenames_array: List[PathLike], filenames_meta: Optional[List[Optional[PathLike]]]) -> List[Optional[PathLike]]:
+    """Validate the filenames of `load`, filling in None sidecars if `filenames_meta` is None."""
     # Ensure filenames_array is a list
     if not isinstance(filenames_array, list):
         raise TypeError("filenames_array must be a list of PathLike objects.")
@@ -66,28 +288,11 @@ def load(filenames_array: List[PathLike], filenames_meta: Optional[List[Optional
     if len(filenames_array) != len(filenames_meta):
         raise ValueError(f"filenames_array and filenames_meta must have the same length ({len(filenames_array)} != {len(filenames_meta)}).")
 
-    if len(filenames_array) == 0:
-        warnings.warn("No filenames provided. Returning empty arrays and metadata.")
-        return [], {}
+    return filenames_meta
 
-    results = []
-    if max_workers == 1:
-        # Naive loop implementation (no parallelism)
-        for i, (filename_array, filename_meta) in enumerate(zip(filenames_array, filenames_meta)):
-            result = array_meta.load(filename_array, filename_meta)
-            results.append(result)
-    else:
-        # Load arrays and metadata in parallel
-        with ThreadPoolExecutor(max_workers) as executor:
-            futures = []
-            for i, (filename_array, filename_meta) in enumerate(zip(filenames_array, filenames_meta)):
-                future = executor.submit(array_meta.load, filename_array, filename_meta)
-                futures.append(future)
-
-            results = []
-            for i, future in enumerate(futures):
-                results.append(future.result())
 
+def _collect(results: List[Tuple[np.ndarray, Dict[str, Any]]], out: Optional[np.ndarray] = None) -> Tuple[Union[List[np.ndarray], np.ndarray], Dict[str, List[Any]]]:
+    """Merge per-frame (array, metadata) results into arrays (or the stacked `out`) and metadata lists."""
     # Process the results
     arrays: List[np.ndarray] = []
     metadata = {}
@@ -101,4 +306,60 @@ def load(filenames_array: List[PathLike], filenames_meta: Optional[List[Optional
                 metadata[key] = []
             metadata[key].append(metadata_i[key])
 
+    if out is not None:
+        return out, metadata
     return arrays, metadata
+
+
+def load(
+    filenames_array: List[PathLike],
+    filenames_meta: Optional[List[Optional[PathLike]]] = None,
+    max_workers: Optional[int] = None,
+    stack: bool = False,
+    out: Optional[Union[np.ndarray, PathLike]] = None,
+    mmap: bool = False,
+    executor: executor_.ExecutorLike = "thread",
+    roi: Optional[ROI] = None,
+    reduce: int = 1,
+) -> Tuple[Union[List[np.ndarray], np.ndarray], Dict[str, List[Any]]]:
+    """Load multiple arrays and optional metadata in parallel.
+
+    If `stack` is True or `out` is given, the arrays are decoded straight into the slices of a
+    single (N, ...) array instead of being returned as a list. `out` may be a preallocated array
+    (e.g. np.memmap) or a path, in which case a .npy memmap is created there.
+    If `mmap` is True, .npy files are memory-mapped instead of read (not used when stacking).
+    `executor` is 'thread', 'process', or an Executor instance to reuse (see `executor.scope`).
+    `roi` and `reduce` load the same region of every frame, or subsample them (see `array.load`).
+    """
+    filenames_meta = _check_load(filenames_array, filenames_meta)
+    if len(filenames_array) == 0:
+        warnings.warn("No filenames provided. Returning empty arrays and metadata.")
+        return [], {}
+
+    stack = stack or out is not None
+    results = []
+    outs: List[Optional[np.ndarray]] = [None for _ in range(len(filenames_array))]
+    if stack:
+        # Decode the frames straight into the slices of the stacked buffer
+        load_first = functools.partial(array_meta.load, filenames_array[0], filenames_meta[0], roi=roi, reduce=reduce)
+        out, outs, results = _prepare_stack(out, len(filenames_array), load_first)
+
+    start = len(results)
+    mmap = mmap and not stack
+    with profiling.span("multi.load"), executor_.scope(executor, max_workers, kind="read") as pool:
+        if pool is None:
+            # Naive loop implementation (no parallelism)
+            for i in range(start, len(filenames_array)):
+                result = array_meta.load(filenames_array[i], filenames_meta[i], out=outs[i], mmap=mmap, roi=roi, reduce=reduce)
+                results.append(result)
+        else:
+            # Load arrays and metadata in parallel
+            futures = []
+            for i in range(start, len(filenames_array)):
+                future = executor_.submit_load(pool, filenames_array[i], filenames_meta[i], out=outs[i], mmap=mmap, roi=roi, reduce=reduce)
+                futures.append(future)
+
+            for i, future in enumerate(futures):
+                results.append(future.result())
+
+    return _collect(results, out if stack else None)
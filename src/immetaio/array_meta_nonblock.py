@@ -1,16 +1,40 @@
-from typing import Any, Optional, Tuple
+from typing import Any, Optional, Tuple, Union
 from pathlib import Path
+import copy
+import functools
 import numpy as np
 from . import meta
+from . import array
+from . import array_meta
 from . import array_nonblock
+from . import frame_pool
+from .frame_pool import FrameSlot
 from .typing import PathLike
 
 
-def save(filename: PathLike, arr: np.ndarray, **metadata: Any) -> Tuple[Path, Optional[Path]]:
-    filename_array = array_nonblock.save(filename, arr)
-    if metadata:
-        filename_meta = Path(filename_array).with_suffix(meta.ext)
-        meta.save(filename_meta, **metadata)
-    else:
-        filename_meta = None
+def save(filename: PathLike, arr: Union[np.ndarray, FrameSlot], profile: Optional[str] = None, **metadata: Any) -> Tuple[Optional[Path], Optional[Path]]:
+    """Save an array and optional metadata in a non-blocking way.
+
+    The array and its metadata are written by a single background job. The
+    metadata is deep-copied at call time, so the caller may mutate it afterwards.
+    `arr` may be a slot of a `FramePool`, which is released once the files are written.
+    Returns the resolved filenames, or (None, None) if the save was dropped.
+    """
+    arr, slot = frame_pool.unwrap(arr)
+    try:
+        filename_array = array.get_filename(filename, arr, profile)
+        filename_meta = filename_array.with_suffix(meta.ext) if metadata else None
+
+        metadata = copy.deepcopy(metadata)
+        job = functools.partial(array_meta.save, filename_array, arr, profile=profile, **metadata)
+        fut = array_nonblock.submit(job, nbytes=arr.nbytes)
+    except BaseException:
+        if slot is not None:
+            slot.release_when_done(None)
+        raise
+    if slot is not None:
+        slot.release_when_done(fut)
+    if fut is None:
+        # Dropped by the non-blocking queue policy
+        return None, None
     return filename_array, filename_meta
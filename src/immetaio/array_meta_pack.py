@@ -0,0 +1,416 @@
+"""
+Packed sequence container: many arrays and their metadata in one append-only file.
+
+Layout (little-endian):
+
+- File header: `MAGIC`.
+- One record per frame: a `_RECORD` header (magic, format extension, metadata length,
+  payload length, padding), the metadata as JSON, zero padding, and the payload, which is
+  the frame encoded exactly like a file of `array_meta_dir` (PNG, EXR, npy or npz bytes).
+  Payloads are 64-byte aligned, so .npy frames can be used in place from a memory map.
+- On close, a table with the payload offsets, sizes, formats, shapes, dtypes and metadata of
+  all frames, followed by a `_FOOTER` that points to it.
+
+Random access only reads the table once. Reopening a file for appending adds frames after
+the last one and writes a new table; if the footer is missing (e.g. after a crash), the table
+is rebuilt by walking the records.
+"""
+
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+from collections import deque
+import itertools
+import mmap as mmap_
+import os
+import struct
+import threading
+import numpy as np
+import numpy.typing as npt
+from . import array
+from . import array_chunked
+from . import array_meta_dir
+from . import array_meta_multi
+from . import atomic
+from . import executor as executor_
+from . import index
+from . import json
+from . import meta
+from . import params
+from .array import ROI
+from .typing import PathLike
+
+EXT = ".immpack"
+MAGIC = b"IMMPACK\x01"
+
+_RECORD = struct.Struct("<4s8sIQH")  # magic, ext, metadata length, payload length, padding
+_RECORD_MAGIC = b"IMFR"
+_TABLE_MAGIC = b"IMTB"
+_FOOTER = struct.Struct("<Q8s")  # table offset, magic
+_FOOTER_MAGIC = b"IMPACKND"
+_ALIGN = 64
+
+
+def _frame_ext(arr: np.ndarray, profile: Optional[str]) -> str:
+    """Return the format of a frame like `array.get_filename`, but never the chunked format (a directory)."""
+    ext = array.get_filename("frame", arr, profile).suffix
+    if ext == array_chunked.EXT:
+        ext = ".npz" if params.use_npz(profile) else ".npy"
+    return ext
+
+
+class PackEntry(NamedTuple):
+    """Location and layout of one frame in a pack file."""
+
+    offset: int
+    size: int
+    format: str
+    shape: Optional[Tuple[int, ...]]
+    dtype: Optional[str]
+
+
+def _read_table(f) -> Optional[Tuple[List[PackEntry], List[Dict[str, Any]], int]]:
+    """Read the table through the footer. Returns (entries, metadata, end of the last frame), or None if there is no valid footer."""
+    size = f.seek(0, os.SEEK_END)
+    if size < len(MAGIC) + _FOOTER.size:
+        return None
+    f.seek(size - _FOOTER.size)
+    table_offset, magic = _FOOTER.unpack(f.read(_FOOTER.size))
+    if magic != _FOOTER_MAGIC or not len(MAGIC) <= table_offset < size:
+        return None
+    f.seek(table_offset)
+    if f.read(4) != _TABLE_MAGIC:
+        return None
+    data = json.loads(f.read(size - _FOOTER.size - table_offset - 4).decode())
+    entries = [PackEntry(o, s, e, tuple(sh) if sh is not None else None, d) for o, s, e, sh, d in zip(data["offsets"], data["sizes"], data["formats"], data["shapes"], data["dtypes"])]
+    return entries, data["meta"], table_offset
+
+
+def _scan_records(f) -> Tuple[List[PackEntry], List[Dict[str, Any]], int]:
+    """Rebuild the table by walking the records. Returns the entries, metadata, and end of the last complete record."""
+    size = f.seek(0, os.SEEK_END)
+    pos = len(MAGIC)
+    entries: List[PackEntry] = []
+    metadata: List[Dict[str, Any]] = []
+    while pos + _RECORD.size <= size:
+        f.seek(pos)
+        magic, ext, meta_len, payload_len, pad = _RECORD.unpack(f.read(_RECORD.size))
+        payload_offset = pos + _RECORD.size + meta_len + pad
+        if magic != _RECORD_MAGIC or payload_offset + payload_len > size:
+            break  # A table, or a record cut short by a crash
+        try:
+            metadata_i = json.loads(f.read(meta_len).decode())
+        except ValueError:
+            break
+        entries.append(PackEntry(payload_offset, payload_len, ext.rstrip(b"\x00").decode(), None, None))
+        metadata.append(metadata_i)
+        pos = payload_offset + payload_len
+    return entries, metadata, pos
+
+
+class PackWriter:
+    """Append arrays and metadata to a pack file.
+
+    If `append` is True and the file exists, new frames are added after the existing ones.
+    Otherwise the pack is written to a temporary file that replaces `filename` on `close`, so
+    readers never see a partial pack and a failed write leaves the old file untouched (see
+    `atomic.replace_on_success`). Appending modifies the file in place; a pack interrupted
+    there keeps its complete records, and the table is rebuilt from them on the next open.
+    `ext` fixes the format of all frames (otherwise it is chosen per frame like `array.get_filename`),
+    and `profile` selects the compression profile (see `params.profiles`).
+    """
+
+    def __init__(self, filename: PathLike, append: bool = False, ext: Optional[str] = None, profile: Optional[str] = None):
+        self.filename = Path(filename)
+        self.ext = ext
+        self.profile = profile
+        self._lock = threading.Lock()
+        self._entries: List[PackEntry] = []
+        self._metadata: List[Dict[str, Any]] = []
+        self._commit = None
+
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        if append and self.filename.exists():
+            self._f = open(self.filename, "r+b")
+            if self._f.read(len(MAGIC)) != MAGIC:
+                self._f.close()
+                raise ValueError(f"'{self.filename}' is not a pack file.")
+            table = _read_table(self._f) or _scan_records(self._f)
+            self._entries, self._metadata, end = table
+            self._f.truncate(end)  # Drop the old table; it is rewritten on close
+            self._f.seek(end)
+        else:
+            self._commit = atomic.replace_on_success(self.filename)
+            self._f = open(self._commit.__enter__(), "wb")
+            self._f.write(MAGIC)
+
+    def __enter__(self) -> "PackWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None and self._commit is not None:
+            # Discard the temporary file instead of publishing a partial pack
+            if not self._f.closed:
+                self._f.close()
+            self._commit.__exit__(exc_type, exc_value, traceback)
+            return
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def write(self, arr: npt.ArrayLike, **metadata: Any) -> int:
+        """Encode and append a frame. Returns its index."""
+        arr = np.asarray(arr)
+        ext = self.ext or _frame_ext(arr, self.profile)
+        return self.write_encoded(array.encode(arr, ext, self.profile), ext, arr.shape, arr.dtype.str, metadata)
+
+    def write_encoded(self, data: bytes, ext: str, shape: Optional[Tuple[int, ...]] = None, dtype: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> int:
+        """Append a frame that is already encoded as `ext` (e.g. the bytes of a .png file). Returns its index."""
+        metadata = metadata or {}
+        meta_bytes = json.dumps(metadata, indent=None).encode()
+        with self._lock:
+            pos = self._f.tell()
+            pad = -(pos + _RECORD.size + len(meta_bytes)) % _ALIGN
+            self._f.write(_RECORD.pack(_RECORD_MAGIC, ext.encode(), len(meta_bytes), len(data), pad))
+            self._f.write(meta_bytes)
+            self._f.write(b"\x00" * pad)
+            offset = self._f.tell()
+            self._f.write(data)
+            self._entries.append(PackEntry(offset, len(data), ext, tuple(shape) if shape is not None else None, dtype))
+            self._metadata.append(metadata)
+            return len(self._entries) - 1
+
+    def close(self) -> None:
+        """Write the table and footer, and close the file."""
+        if self._f.closed:
+            return
+        table = {
+            "version": 1,
+            "offsets": [e.offset for e in self._entries],
+            "sizes": [e.size for e in self._entries],
+            "formats": [e.format for e in self._entries],
+            "shapes": [list(e.shape) if e.shape is not None else None for e in self._entries],
+            "dtypes": [e.dtype for e in self._entries],
+            "meta": self._metadata,
+        }
+        table_offset = self._f.tell()
+        self._f.write(_TABLE_MAGIC)
+        self._f.write(json.dumps(table, indent=None).encode())
+        self._f.write(_FOOTER.pack(table_offset, _FOOTER_MAGIC))
+        self._f.flush()
+        if self._commit is not None:
+            self._f.close()
+            self._commit.__exit__(None, None, None)  # Syncs and renames the temporary file
+            return
+        if atomic.get_durability() != "none":
+            os.fsync(self._f.fileno())
+        self._f.close()
+
+
+class PackReader:
+    """Random access to the frames of a pack file.
+
+    `reader[i]` returns (array, metadata) of frame `i` in O(1). With `mmap=True`, the file is
+    memory-mapped and .npy frames are returned as read-only views without a copy; otherwise
+    each frame is read with a single positioned read. Reads are thread-safe.
+    """
+
+    def __init__(self, filename: PathLike, mmap: bool = False):
+        self.filename = Path(filename)
+        self._lock = threading.Lock()  # Guards the file position where positioned reads are not available
+        self._f = open(self.filename, "rb")
+        if self._f.read(len(MAGIC)) != MAGIC:
+            self._f.close()
+            raise ValueError(f"'{self.filename}' is not a pack file.")
+        table = _read_table(self._f)
+        self.complete = table is not None  # False if the file was not closed properly
+        self.entries, self.metadata, _ = table if table is not None else _scan_records(self._f)
+        self._mm = mmap_.mmap(self._f.fileno(), 0, access=mmap_.ACCESS_READ) if mmap else None
+
+    def __enter__(self) -> "PackReader":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __getitem__(self, i: int) -> Tuple[np.ndarray, Dict[str, Any]]:
+        return self.read(i), dict(self.metadata[i])
+
+    def __iter__(self) -> Iterator[Tuple[np.ndarray, Dict[str, Any]]]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def read_bytes(self, i: int) -> Union[bytearray, memoryview]:
+        """Return the encoded payload of frame `i` (a read-only memoryview of the map with `mmap=True`).
+
+        Without `mmap`, the payload is read into a new writable buffer, so decoded .npy frames
+        are writable like those from `array.load`.
+        """
+        entry = self.entries[i]
+        if self._mm is not None:
+            return memoryview(self._mm)[entry.offset : entry.offset + entry.size]
+        buf = bytearray(entry.size)
+        if hasattr(os, "preadv"):
+            size = os.preadv(self._f.fileno(), [buf], entry.offset)
+        else:
+            # Windows has no positioned reads
+            with self._lock:
+                self._f.seek(entry.offset)
+                size = self._f.readinto(buf)
+        if size != entry.size:
+            raise ValueError(f"Frame {i} of '{self.filename}' is truncated.")
+        return buf
+
+    def read(self, i: int, roi: Optional[ROI] = None, reduce: int = 1) -> np.ndarray:
+        """Decode frame `i`, optionally a region of it (see `array.load`)."""
+        arr = array.decode(self.read_bytes(i), self.entries[i].format)
+        if roi is not None or reduce != 1:
+            sy, sx = array._region(roi, reduce)
+            array._check_region_ndim(arr.ndim, f"{self.filename}[{i}]")
+            arr = arr[sy, sx] if self._mm is not None and self.entries[i].format == ".npy" else np.array(arr[sy, sx])
+        return arr
+
+    def close(self) -> None:
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                pass  # Views of frames are still alive; the map is released with them
+        self._f.close()
+
+
+def save(
+    filename: PathLike,
+    arrs: Iterable[npt.ArrayLike],
+    max_workers: Optional[int] = None,
+    append: bool = False,
+    profile: Optional[str] = None,
+    **metadata: List[Any],
+) -> Path:
+    """Save multiple arrays and optional metadata to a pack file.
+
+    Frames are encoded in parallel on the shared scheduler and appended in order.
+    `arrs` may be an array, a list, or any iterable of arrays with different shapes.
+    """
+    filename = Path(filename)
+    jobs = array_meta_multi._check_save(_frame_numbers(arrs), arrs, metadata)
+    with PackWriter(filename, append=append, profile=profile) as writer:
+        with executor_.scope("thread", max_workers, kind="write") as pool:
+
+            def _encode(arr: np.ndarray) -> Tuple[bytes, str]:
+                ext = _frame_ext(arr, profile)
+                return array.encode(arr, ext, profile), ext
+
+            window = 2 * executor_.num_workers(pool) if pool is not None else 1
+            pending: deque = deque()
+            for _, arr, metadata_i in jobs:
+                if len(pending) >= window:
+                    _append(writer, *pending.popleft())
+                encoded = pool.submit(_encode, arr) if pool is not None else _encode(arr)
+                pending.append((encoded, arr.shape, arr.dtype.str, metadata_i))
+            while pending:
+                _append(writer, *pending.popleft())
+    return filename
+
+
+def _frame_numbers(arrs: Iterable[npt.ArrayLike]) -> Iterable[int]:
+    return range(len(arrs)) if hasattr(arrs, "__len__") else itertools.count()
+
+
+def _append(writer: PackWriter, encoded: Any, shape: Tuple[int, ...], dtype: str, metadata: Dict[str, Any]) -> None:
+    data, ext = encoded.result() if hasattr(encoded, "result") else encoded
+    writer.write_encoded(data, ext, shape, dtype, metadata)
+
+
+def load(
+    filename: PathLike,
+    max_workers: Optional[int] = None,
+    stack: bool = False,
+    out: Optional[Union[np.ndarray, PathLike]] = None,
+    mmap: bool = False,
+    roi: Optional[ROI] = None,
+    reduce: int = 1,
+) -> Tuple[Union[List[np.ndarray], np.ndarray], Dict[str, List[Any]]]:
+    """Load all arrays and metadata of a pack file (see `array_meta_multi.load` for the arguments).
+
+    With `mmap=True` (and no stacking), .npy frames are read-only views of the mapped file.
+    """
+    stack = stack or out is not None
+    reader = PackReader(filename, mmap=mmap and not stack)
+    try:
+        n = len(reader)
+        if n == 0:
+            return [], {}
+        results = []
+        if stack:
+            arr_0 = reader.read(0, roi, reduce)
+            if isinstance(out, np.ndarray):
+                if len(out) != n:
+                    raise ValueError(f"out must have the same length as the pack ({len(out)} != {n}).")
+            out = array_meta_multi._allocate_out(out, (n, *arr_0.shape), arr_0.dtype)
+
+        def _load(i: int) -> Tuple[np.ndarray, Dict[str, Any]]:
+            arr = reader.read(i, roi, reduce)
+            if stack:
+                out[i] = arr
+                arr = out[i]
+            return arr, dict(reader.metadata[i])
+
+        with executor_.scope("thread", max_workers, kind="read") as pool:
+            if pool is None:
+                results = [_load(i) for i in range(n)]
+            else:
+                results = list(pool.map(_load, range(n)))
+    finally:
+        reader.close()  # Mapped frames keep the map alive
+    return array_meta_multi._collect(results, out if stack else None)
+
+
+def export_dir(filename: PathLike, dirname: PathLike) -> List[Tuple[Path, Optional[Path]]]:
+    """Write the frames of a pack file as a directory readable by `array_meta_dir.load` (0.png, 0.json, ...).
+
+    The encoded frames are copied as-is, without decoding.
+    """
+    dirname = Path(dirname)
+    dirname.mkdir(parents=True, exist_ok=True)
+    results = []
+    known = {}
+    with PackReader(filename) as reader:
+        for i, entry in enumerate(reader.entries):
+            filename_array = dirname / f"{i}{entry.format}"
+            with atomic.replace_on_success(filename_array) as filename_tmp:
+                with open(filename_tmp, "wb") as f:
+                    f.write(reader.read_bytes(i))
+            filename_meta = None
+            if reader.metadata[i]:
+                filename_meta = meta.write(filename_array.with_suffix(meta.ext), reader.metadata[i], mkdir=False)
+            results.append((filename_array, filename_meta))
+            known[filename_array.name] = index.IndexEntry(filename_array.name, entry.shape, entry.dtype, entry.format, filename_meta is not None)
+    index.update(dirname, known)
+    atomic.flush()
+    return results
+
+
+def import_dir(dirname: PathLike, filename: PathLike, append: bool = False) -> Path:
+    """Pack the arrays and metadata of a directory (as listed by `array_meta_dir.load`) into one file.
+
+    The array files are copied as-is, without re-encoding, except chunked arrays (directories),
+    which are loaded and stored as .npy frames.
+    """
+    filenames_array, filenames_meta = array_meta_dir.retrieve_array_meta_files(dirname)
+    with PackWriter(filename, append=append) as writer:
+        for filename_array, filename_meta in zip(filenames_array, filenames_meta):
+            metadata = meta.load(filename_meta) if filename_meta is not None else {}
+            if array_chunked.is_chunked(filename_array):
+                arr = array_chunked.load(filename_array)
+                writer.write_encoded(array.encode(arr, ".npy"), ".npy", arr.shape, arr.dtype.str, metadata)
+                continue
+            header = array.read_header(filename_array)
+            shape, dtype = (header[0], header[1].str) if header is not None else (None, None)
+            with open(filename_array, "rb") as f:
+                data = f.read()
+            writer.write_encoded(data, filename_array.suffix, shape, dtype, metadata)
+    return Path(filename)
@@ -0,0 +1,282 @@
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+from concurrent.futures import Future
+from collections import deque
+import copy
+import itertools
+import threading
+import time
+import numpy as np
+from . import array
+from . import array_meta
+from . import atomic
+from . import array_meta_dir
+from . import array_nonblock
+from . import frame_pool
+from . import executor as executor_
+from . import index
+from . import meta
+from .frame_pool import FrameSlot
+from .typing import PathLike
+
+MANIFEST_NAME = "sequence.json"
+
+
+def _resolve(target: Union[PathLike, List[PathLike]]) -> Tuple[List[PathLike], List[Optional[Path]]]:
+    """Return the array and sidecar filenames of a directory or of a list of files."""
+    if isinstance(target, list):
+        # Sidecars next to the listed files are picked up by array_meta.load
+        return target, [None for _ in range(len(target))]
+    return array_meta_dir.retrieve_array_meta_files(target)
+
+
+class _ReadAhead:
+    """In-order window of at most `prefetch` submitted frames (shared by the sync and async `iter_load`).
+
+    `submit(i)` starts loading frame `i` and returns a future. The consumer takes the oldest
+    frame with `pop`, waits for it, and then calls `refill` before handing the frame over.
+    """
+
+    def __init__(self, submit: Callable[[int], Any], indices: Iterable[int], prefetch: int):
+        self._submit = submit
+        self._it = iter(indices)
+        self._futures: Deque[Tuple[int, Any]] = deque()
+        for i in itertools.islice(self._it, prefetch):
+            self._futures.append((i, submit(i)))
+
+    def __bool__(self) -> bool:
+        return bool(self._futures)
+
+    def pop(self) -> Tuple[int, Any]:
+        return self._futures.popleft()
+
+    def refill(self) -> None:
+        i_next = next(self._it, None)
+        if i_next is not None:
+            self._futures.append((i_next, self._submit(i_next)))
+
+    def cancel(self) -> None:
+        for _, future in self._futures:
+            future.cancel()
+
+
+def iter_load(
+    target: Union[PathLike, List[PathLike]],
+    prefetch: int = 4,
+    max_workers: Optional[int] = None,
+    start: Optional[int] = None,
+    stop: Optional[int] = None,
+    step: Optional[int] = None,
+    mmap: bool = False,
+    roi: Optional[array.ROI] = None,
+    reduce: int = 1,
+) -> Iterator[Tuple[int, np.ndarray, Dict[str, Any]]]:
+    """Iterate over arrays and metadata of a directory (or a list of files) with bounded read-ahead.
+
+    Yields (index, array, metadata) in the order of `array_meta_dir.load`. At most `prefetch`
+    frames are decoded ahead of the consumer, so memory is O(prefetch) instead of O(N).
+    `start`, `stop` and `step` select frames like slicing; `index` refers to the unsliced sequence.
+    If `mmap` is True, .npy files are memory-mapped instead of read.
+    `roi` and `reduce` load a region of every frame, or subsample them (see `array.load`).
+    """
+    if prefetch < 1:
+        raise ValueError(f"prefetch must be >= 1, got {prefetch}.")
+
+    filenames_array, filenames_meta = _resolve(target)
+    indices = range(len(filenames_array))[start:stop:step]
+
+    def _load(i: int) -> Tuple[np.ndarray, Dict[str, Any]]:
+        return array_meta.load(filenames_array[i], filenames_meta[i], mmap=mmap, roi=roi, reduce=reduce)
+
+    # A lane of the shared scheduler, so read-ahead counts against the global read limit
+    executor = executor_.lane("read", max_workers)
+    try:
+        window = _ReadAhead(lambda i: executor.submit(_load, i), indices, prefetch)
+        while window:
+            i, future = window.pop()
+            arr, metadata = future.result()
+            # Keep the window full before handing the frame over
+            window.refill()
+            yield i, arr, metadata
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+class WriterStats(NamedTuple):
+    """Throughput of a SequenceWriter."""
+
+    frames: int
+    dropped: int
+    late: int
+    bytes: int
+    elapsed: float
+    fps: float
+    mb_per_s: float
+
+
+class SequenceWriter:
+    """Write a sequence of arrays and metadata to a directory in the background.
+
+    Frames are named by their index like `array_meta_dir.save` (0.png, 1.png, ...), so the
+    directory can be read back with `load` or `iter_load`. The directory is created once,
+    the file extension is resolved from the first frame (unless `ext` is given), and all
+    frames share one bounded `array_nonblock.SaveQueue`. On close, a manifest
+    (`sequence.json`) with the frame list and throughput, and the directory index, are written.
+
+    A frame is counted as late if its save finishes more than `late_after` seconds after `write`.
+    `profile` selects the compression profile of the frames (see `params.profiles`).
+
+    ```python
+    with immetaio.SequenceWriter("captured", max_pending=32, policy="drop") as writer:
+        for frame in frames:
+            writer.write(frame, timestamp=time.time())
+    print(writer.stats())
+    ```
+    """
+
+    def __init__(
+        self,
+        dirname: PathLike,
+        ext: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        max_pending_bytes: Optional[int] = None,
+        policy: str = "block",
+        late_after: Optional[float] = None,
+        manifest: bool = True,
+        profile: Optional[str] = None,
+    ):
+        self.dirname = Path(dirname)
+        self.dirname.mkdir(parents=True, exist_ok=True)
+        self.ext = ext
+        self.late_after = late_after
+        self.manifest = manifest
+        self.profile = profile
+        self._queue = array_nonblock.SaveQueue(max_workers, max_pending=max_pending, max_pending_bytes=max_pending_bytes, policy=policy)
+
+        self._index = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._written: Dict[int, index.IndexEntry] = {}
+        self._dropped: List[int] = []
+        self._late = 0
+        self._bytes = 0
+        self._t_start: Optional[float] = None
+        self._t_end: Optional[float] = None
+        self._shape: Optional[Tuple[int, ...]] = None
+        self._dtype: Optional[str] = None
+
+    def __enter__(self) -> "SequenceWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def write(self, arr: Union[np.ndarray, FrameSlot], **metadata: Any) -> Optional[int]:
+        """Queue an array and optional metadata as the next frame.
+
+        The metadata is deep-copied at call time. `arr` may be a slot of a `FramePool`, which is
+        released once the frame is written. Returns the frame index, or None if the frame was
+        dropped (the index is still consumed, so drops show up as gaps).
+        """
+        if self._closed:
+            raise ValueError("I/O operation on closed SequenceWriter.")
+        arr, slot = frame_pool.unwrap(arr)
+        try:
+            frame_index, fut = self._submit(arr, metadata)
+        except BaseException:
+            if slot is not None:
+                slot.release_when_done(None)
+            raise
+        if slot is not None:
+            slot.release_when_done(fut)
+        return frame_index if fut is not None else None
+
+    def _submit(self, arr: np.ndarray, metadata: Dict[str, Any]) -> Tuple[int, Optional[Future]]:
+
+        if self._t_start is None:
+            self._t_start = time.monotonic()
+        if self.ext is None:
+            self.ext = array.get_filename(self.dirname / "0", arr, self.profile).suffix
+        if self._shape is None:
+            self._shape, self._dtype = arr.shape, arr.dtype.str
+
+        frame_index = self._index
+        self._index += 1
+        filename_array = self.dirname / f"{frame_index}{self.ext}"
+        filename_meta = filename_array.with_suffix(meta.ext) if metadata else None
+        metadata = copy.deepcopy(metadata)
+
+        t_submit = time.monotonic()
+        fut = self._queue.submit(self._write_frame, frame_index, filename_array, arr, filename_meta, metadata, t_submit, nbytes=arr.nbytes)
+        if fut is None:
+            with self._lock:
+                self._dropped.append(frame_index)
+        return frame_index, fut
+
+    def _write_frame(self, i: int, filename_array: Path, arr: np.ndarray, filename_meta: Optional[Path], metadata: Dict[str, Any], t_submit: float) -> None:
+        # Runs on the pool; bookkeeping happens here so it is complete once the queue drains
+        array.save(filename_array, arr, mkdir=False, profile=self.profile)
+        if filename_meta is not None:
+            meta.write(filename_meta, metadata, mkdir=False)
+
+        t_done = time.monotonic()
+        index_entry = index.IndexEntry(filename_array.name, arr.shape, arr.dtype.str, filename_array.suffix, filename_meta is not None)
+        with self._lock:
+            self._written[i] = index_entry
+            self._bytes += arr.nbytes
+            if self.late_after is not None and t_done - t_submit > self.late_after:
+                self._late += 1
+
+    def queue_stats(self) -> array_nonblock.QueueStats:
+        """Return the queue depth, bytes pending, and oldest pending age of the writer."""
+        return self._queue.stats()
+
+    def stats(self) -> WriterStats:
+        """Return the sustained throughput so far (or of the whole sequence once closed)."""
+        with self._lock:
+            if self._t_start is None:
+                elapsed = 0.0
+            else:
+                elapsed = (self._t_end if self._t_end is not None else time.monotonic()) - self._t_start
+            frames = len(self._written)
+            return WriterStats(
+                frames=frames,
+                dropped=len(self._dropped),
+                late=self._late,
+                bytes=self._bytes,
+                elapsed=elapsed,
+                fps=frames / elapsed if elapsed > 0 else 0.0,
+                mb_per_s=self._bytes / 1e6 / elapsed if elapsed > 0 else 0.0,
+            )
+
+    def close(self) -> None:
+        """Wait for all pending frames and write the manifest."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._queue.shutdown()
+        finally:
+            self._t_end = time.monotonic()
+            if self.manifest:
+                self._write_manifest()
+            if self._written:
+                index.update(self.dirname, {e.filename: e for e in self._written.values()})
+            atomic.flush()
+
+    def _write_manifest(self) -> None:
+        stats = self.stats()
+        manifest = {
+            "frames": stats.frames,
+            "ext": self.ext,
+            "shape": self._shape,
+            "dtype": self._dtype,
+            "filenames": [self._written[i].filename for i in sorted(self._written)],
+            "dropped": sorted(self._dropped),
+            "late": stats.late,
+            "elapsed": stats.elapsed,
+            "fps": stats.fps,
+            "mb_per_s": stats.mb_per_s,
+        }
+        meta.write(self.dirname / MANIFEST_NAME, manifest, mkdir=False)
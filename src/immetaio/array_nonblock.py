@@ -1,31 +1,207 @@
 import atexit
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import time
+from concurrent.futures import Future
 from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
 import numpy as np
 from .typing import PathLike
 from . import array
+from . import atomic
+from . import frame_pool
+from . import profiling
+from .frame_pool import FrameSlot
+from . import executor as executor_
 
-_executor = ThreadPoolExecutor()
-_futures = []
+_UNSET: Any = object()
+
+
+class QueueStats(NamedTuple):
+    """Snapshot of a non-blocking save queue."""
+
+    pending: int
+    pending_bytes: int
+    oldest_pending_age: float
+    dropped: int
+    max_workers: int
+    max_pending: Optional[int]
+    max_pending_bytes: Optional[int]
+    policy: str
+
+
+class SaveQueue:
+    """Background saves on the shared I/O scheduler with a bounded in-flight budget.
+
+    - `max_workers`: maximum number of saves of this queue running at once (up to the scheduler's threads if None).
+    - `max_pending`: maximum number of saves queued or running (unlimited if None).
+    - `max_pending_bytes`: maximum total array bytes queued or running (unlimited if None).
+    - `policy`: 'block' waits for room in the budget, 'drop' discards the save.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: Optional[int] = None, max_pending_bytes: Optional[int] = None, policy: str = "block"):
+        self._executor = executor_.lane("write", max_workers)
+        self._max_workers = max_workers
+        self._max_pending: Optional[int] = None
+        self._max_pending_bytes: Optional[int] = None
+        self._policy = "block"
+
+        # Pending futures mapped to (submit time, bytes). Completed futures are removed
+        # by a done-callback, so memory stays bounded by the in-flight budget.
+        self._pending: Dict[Future, Tuple[float, int]] = {}
+        self._pending_bytes = 0
+        self._dropped = 0
+        self._errors: List[BaseException] = []
+        self._cond = threading.Condition()
+
+        self.configure(max_pending=max_pending, max_pending_bytes=max_pending_bytes, policy=policy)
+
+    def configure(self, max_workers: Optional[int] = _UNSET, max_pending: Optional[int] = _UNSET, max_pending_bytes: Optional[int] = _UNSET, policy: str = _UNSET) -> None:
+        """Change the pool size and budget. Only the given arguments are changed."""
+        if policy is not _UNSET and policy not in ("block", "drop"):
+            raise ValueError(f"policy must be 'block' or 'drop', got '{policy}'.")
+
+        with self._cond:
+            if max_pending is not _UNSET:
+                self._max_pending = max_pending
+            if max_pending_bytes is not _UNSET:
+                self._max_pending_bytes = max_pending_bytes
+            if policy is not _UNSET:
+                self._policy = policy
+            if max_workers is not _UNSET and max_workers != self._max_workers:
+                self._executor.set_limit(max_workers)
+                self._max_workers = max_workers
+            self._cond.notify_all()
+
+    def stats(self) -> QueueStats:
+        """Return the current queue depth, bytes pending, and oldest pending age."""
+        with self._cond:
+            oldest = next(iter(self._pending.values()), None)
+            age = time.monotonic() - oldest[0] if oldest is not None else 0.0
+            return QueueStats(
+                pending=len(self._pending),
+                pending_bytes=self._pending_bytes,
+                oldest_pending_age=age,
+                dropped=self._dropped,
+                max_workers=executor_.num_workers(self._executor),
+                max_pending=self._max_pending,
+                max_pending_bytes=self._max_pending_bytes,
+                policy=self._policy,
+            )
+
+    def _has_room(self, nbytes: int) -> bool:
+        if not self._pending:
+            return True  # Always admit a single job, even if it exceeds the byte budget
+        if self._max_pending is not None and len(self._pending) >= self._max_pending:
+            return False
+        if self._max_pending_bytes is not None and self._pending_bytes + nbytes > self._max_pending_bytes:
+            return False
+        return True
+
+    def _on_done(self, fut: Future) -> None:
+        with self._cond:
+            _, nbytes = self._pending.pop(fut)
+            self._pending_bytes -= nbytes
+            if not fut.cancelled() and fut.exception() is not None:
+                self._errors.append(fut.exception())
+            self._cond.notify_all()
+
+    def submit(self, fn: Callable[..., Any], *args: Any, nbytes: int = 0, **kwargs: Any) -> Optional[Future]:
+        """Submit a job under the in-flight budget.
+
+        Returns the future, or None if the job was dropped by the 'drop' policy.
+        """
+        with profiling.span("nonblock.submit", nbytes), self._cond:
+            if self._policy == "drop":
+                if not self._has_room(nbytes):
+                    self._dropped += 1
+                    profiling.record("nonblock.drop", time.perf_counter(), 0.0, nbytes)
+                    return None
+            else:
+                self._cond.wait_for(lambda: self._has_room(nbytes))
+            fut = self._executor.submit(profiling.queued("nonblock.queue_wait", fn), *args, **kwargs)
+            self._pending[fut] = (time.monotonic(), nbytes)
+            self._pending_bytes += nbytes
+        fut.add_done_callback(self._on_done)
+        return fut
+
+    def wait(self) -> None:
+        """Wait for all pending jobs, re-raising the first error if any job failed."""
+        with self._cond:
+            self._cond.wait_for(lambda: not self._pending)
+            atomic.flush()
+            if self._errors:
+                error = self._errors[0]
+                self._errors.clear()
+                raise error
+
+    def shutdown(self) -> None:
+        """Wait for all pending jobs. The shared scheduler keeps running."""
+        try:
+            self.wait()
+        finally:
+            self._executor.shutdown(wait=True)
+
+
+_queue = SaveQueue()
+
+
+def configure(max_workers: Optional[int] = _UNSET, max_pending: Optional[int] = _UNSET, max_pending_bytes: Optional[int] = _UNSET, policy: str = _UNSET) -> None:
+    """Configure the background pool and its in-flight budget.
+
+    Only the given arguments are changed. `None` means unlimited (or all threads of
+    the shared scheduler for `max_workers`, see `executor.configure`).
+
+    - `max_pending`: maximum number of saves queued or running.
+    - `max_pending_bytes`: maximum total array bytes queued or running.
+    - `policy`: 'block' waits for room in the budget, 'drop' discards the save.
+    """
+    _queue.configure(max_workers=max_workers, max_pending=max_pending, max_pending_bytes=max_pending_bytes, policy=policy)
+
+
+def stats() -> QueueStats:
+    """Return the current queue depth, bytes pending, and oldest pending age."""
+    return _queue.stats()
+
+
+def submit(fn: Callable[..., Any], *args: Any, nbytes: int = 0, **kwargs: Any) -> Optional[Future]:
+    """Submit a job to the background pool under the in-flight budget.
+
+    Returns the future, or None if the job was dropped by the 'drop' policy.
+    """
+    return _queue.submit(fn, *args, nbytes=nbytes, **kwargs)
 
 
 def wait_saves():
     """Wait for all pending background saves to complete."""
-    for fut in as_completed(_futures):
-        fut.result()
+    _queue.wait()
 
 
 def _shutdown_executor():
-    wait_saves()
-    _executor.shutdown(wait=True)
+    try:
+        _queue.shutdown()
+    finally:
+        executor_.shutdown()
 
 
 atexit.register(_shutdown_executor)
 
 
-def save(filename: PathLike, arr: np.ndarray) -> Path:
-    """Save an array in a non-blocking way."""
-    fut = _executor.submit(array.save, filename, arr)
-    _futures.append(fut)
-    filename_array = array.get_filename(filename, arr)
+def save(filename: PathLike, arr: Union[np.ndarray, FrameSlot], profile: Optional[str] = None) -> Optional[Path]:
+    """Save an array in a non-blocking way.
+
+    `arr` may be a slot of a `FramePool`, which is released once the file is written.
+    Returns the resolved filename, or None if the save was dropped.
+    """
+    arr, slot = frame_pool.unwrap(arr)
+    try:
+        filename_array = array.get_filename(filename, arr, profile)
+        fut = submit(array.save, filename_array, arr, profile=profile, nbytes=arr.nbytes)
+    except BaseException:
+        if slot is not None:
+            slot.release_when_done(None)
+        raise
+    if slot is not None:
+        slot.release_when_done(fut)
+    if fut is None:
+        return None
     return filename_array
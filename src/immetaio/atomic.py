@@ -0,0 +1,198 @@
+"""
+Crash-safe file replacement.
+
+Files are written to a hidden temporary file next to the destination and renamed over it
+only once complete, so a crash never leaves a truncated file under the final name. The
+durability level decides what survives a power loss:
+
+- 'none': no fsync (the rename is atomic, but recent files may be lost on power loss).
+- 'file': the file contents are fsynced before the rename.
+- 'dir': additionally, the directory entries are fsynced. This is batched per directory by
+  `flush`, which batch saves, `wait_saves`, `SequenceWriter.close` and interpreter exit call.
+"""
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Set
+import atexit
+import itertools
+import os
+import re
+import shutil
+import threading
+import time
+from .typing import PathLike
+from . import profiling
+
+DURABILITY_LEVELS = ("none", "file", "dir")
+TEMP_MARKER = ".tmp-"
+OLD_MARKER = ".old-"
+
+_TEMP_NAME = re.compile(r"^\.(?P<stem>.*)(?:\.tmp-|\.old-)(?P<pid>\d+)-\d+(?P<suffix>.*)$")
+
+_durability = "none"
+_dirty_dirs: Set[str] = set()
+_lock = threading.Lock()
+_counter = itertools.count()
+
+
+def set_durability(level: str) -> None:
+    """Set the durability level of all writes ('none', 'file' or 'dir')."""
+    global _durability
+    if level not in DURABILITY_LEVELS:
+        raise ValueError(f"durability must be one of {DURABILITY_LEVELS}, got '{level}'.")
+    _durability = level
+
+
+def get_durability() -> str:
+    return _durability
+
+
+def temp_path(filename: PathLike) -> Path:
+    """Return a unique hidden temporary path next to `filename`, keeping its extension for the encoders."""
+    filename = Path(filename)
+    return filename.with_name(f".{filename.stem}{TEMP_MARKER}{os.getpid()}-{next(_counter)}{filename.suffix}")
+
+
+def old_path(filename: PathLike) -> Path:
+    """Return a unique hidden name that an existing `filename` is moved to while it is being replaced."""
+    filename = Path(filename)
+    return filename.with_name(f".{filename.stem}{OLD_MARKER}{os.getpid()}-{next(_counter)}{filename.suffix}")
+
+
+def is_temp(name: str) -> bool:
+    """Return True if a filename was created by `temp_path` or `old_path`."""
+    return name.startswith(".") and (TEMP_MARKER in name or OLD_MARKER in name)
+
+
+def is_old(name: str) -> bool:
+    """Return True if a filename was created by `old_path`."""
+    m = _TEMP_NAME.match(name)
+    return m is not None and name[m.end("stem") :].startswith(OLD_MARKER)
+
+
+def original_name(name: str) -> str:
+    """Return the name that a `temp_path` or `old_path` name stands in for."""
+    m = _TEMP_NAME.match(name)
+    if m is None:
+        raise ValueError(f"'{name}' is not a temporary name.")
+    return m["stem"] + m["suffix"]
+
+
+def temp_owner(name: str) -> Optional[int]:
+    """Return the PID of the process that created a temporary name (None if it cannot be parsed)."""
+    m = _TEMP_NAME.match(name)
+    return int(m["pid"]) if m is not None else None
+
+
+def _is_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        return True  # os.kill would terminate the process; rely on the age alone
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Exists, but belongs to another user
+    return True
+
+
+def is_abandoned(path: PathLike, min_age: float = 60.0) -> bool:
+    """Return True if a temporary file or directory is left over from an interrupted write.
+
+    It must be older than `min_age` seconds and, where this can be checked, its creating process
+    must no longer be running, so that writes in progress (in this or another process) are kept.
+    """
+    path = Path(path)
+    try:
+        age = time.time() - os.lstat(path).st_mtime
+    except FileNotFoundError:
+        return False
+    if age < min_age:
+        return False
+    pid = temp_owner(path.name)
+    return pid is None or os.name == "nt" or not _is_alive(pid)
+
+
+def _fsync_path(path: PathLike) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def replace_on_success(filename: PathLike, durability: Optional[str] = None) -> Iterator[Path]:
+    """Yield a temporary path to write to; it replaces `filename` if the block succeeds and is removed otherwise."""
+    durability = durability if durability is not None else _durability
+    filename = Path(filename)
+    filename_tmp = temp_path(filename)
+    try:
+        yield filename_tmp
+        with profiling.span("atomic.commit"):
+            if durability != "none":
+                _fsync_path(filename_tmp)
+            os.replace(filename_tmp, filename)
+    except BaseException:
+        try:
+            os.remove(filename_tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+    if durability == "dir":
+        with _lock:
+            _dirty_dirs.add(os.path.abspath(filename.parent))
+
+
+@contextmanager
+def replace_dir_on_success(dirname: PathLike, durability: Optional[str] = None) -> Iterator[Path]:
+    """Directory counterpart of `replace_on_success`: yield a temporary directory that replaces `dirname`.
+
+    Directories cannot be renamed over each other atomically, so an existing `dirname` is first
+    moved to a backup name (see `old_path`) and removed after the swap. Readers never see a
+    partially written directory, but `dirname` is briefly missing in between. If the process
+    dies there, `array_meta_dir.recover` moves the backup back.
+    """
+    durability = durability if durability is not None else _durability
+    dirname = Path(dirname)
+    dirname_tmp = temp_path(dirname)
+    os.mkdir(dirname_tmp)
+    try:
+        yield dirname_tmp
+        with profiling.span("atomic.commit"):
+            if durability != "none":
+                _fsync_path(dirname_tmp)
+            if dirname.exists():
+                dirname_old = old_path(dirname)
+                os.rename(dirname, dirname_old)
+                os.rename(dirname_tmp, dirname)
+                shutil.rmtree(dirname_old)
+            else:
+                os.rename(dirname_tmp, dirname)
+    except BaseException:
+        shutil.rmtree(dirname_tmp, ignore_errors=True)
+        raise
+
+    if durability == "dir":
+        with _lock:
+            _dirty_dirs.add(os.path.abspath(dirname.parent))
+
+
+def flush() -> None:
+    """Fsync every directory that received a file since the last flush (only with durability 'dir')."""
+    with _lock:
+        dirnames = list(_dirty_dirs)
+        _dirty_dirs.clear()
+    for dirname in dirnames:
+        try:
+            with profiling.span("atomic.fsync_dir"):
+                _fsync_path(dirname)
+        except FileNotFoundError:
+            pass  # Removed in the meantime
+
+
+atexit.register(flush)
@@ -0,0 +1,161 @@
+"""
+Opt-in, process-wide LRU cache for decoded arrays and metadata.
+
+Entries are keyed by the absolute path and the file's stat fingerprint (mtime, size, inode),
+so a modified file is reloaded. Cached arrays are read-only because they are shared between
+callers. The cache is disabled by default; call `enable` to turn it on.
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, NamedTuple, Optional, Tuple
+import os
+import threading
+import numpy as np
+from .typing import PathLike
+
+
+class CacheStats(NamedTuple):
+    """Snapshot of the cache counters."""
+
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    bytes: int
+    max_bytes: int
+
+
+class LRUCache:
+    """Thread-safe mapping with a total byte limit and least-recently-used eviction."""
+
+    def __init__(self, max_bytes: int):
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._max_bytes = max_bytes
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value (marking it as recently used), or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, nbytes: int) -> None:
+        """Insert a value, evicting the least recently used entries to stay under the byte limit."""
+        with self._lock:
+            if nbytes > self._max_bytes:
+                return  # Would evict everything else and still not fit
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            self._evict()
+
+    def resize(self, max_bytes: int) -> None:
+        with self._lock:
+            self._max_bytes = max_bytes
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._bytes > self._max_bytes:
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self._bytes -= nbytes
+            self._evictions += 1
+
+    def clear(self) -> None:
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._hits = self._misses = self._evictions = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(self._hits, self._misses, self._evictions, len(self._entries), self._bytes, self._max_bytes)
+
+
+_cache: Optional[LRUCache] = None
+
+
+def enable(max_bytes: int = 1024**3) -> None:
+    """Enable the cache with a byte limit (resizes it if already enabled)."""
+    global _cache
+    if max_bytes < 0:
+        raise ValueError(f"max_bytes must be >= 0, got {max_bytes}.")
+    if _cache is None:
+        _cache = LRUCache(max_bytes)
+    else:
+        _cache.resize(max_bytes)
+
+
+def disable() -> None:
+    """Disable the cache and release its entries."""
+    global _cache
+    _cache = None
+
+
+def is_enabled() -> bool:
+    return _cache is not None
+
+
+def clear() -> None:
+    """Drop all cached entries and reset the statistics."""
+    if _cache is not None:
+        _cache.clear()
+
+
+def stats() -> CacheStats:
+    """Return hit/miss/eviction counts and the current size (all zero if disabled)."""
+    if _cache is None:
+        return CacheStats(0, 0, 0, 0, 0, 0)
+    return _cache.stats()
+
+
+def _readonly(o: Any) -> Any:
+    """Mark arrays (also inside dicts and lists) read-only in place."""
+    if isinstance(o, np.ndarray):
+        o.flags.writeable = False
+    elif isinstance(o, dict):
+        for v in o.values():
+            _readonly(v)
+    elif isinstance(o, list):
+        for v in o:
+            _readonly(v)
+    return o
+
+
+def _copy_containers(o: Any) -> Any:
+    """Copy dicts and lists so callers can modify them; read-only arrays and scalars are shared."""
+    if isinstance(o, dict):
+        return {k: _copy_containers(v) for k, v in o.items()}
+    elif isinstance(o, list):
+        return [_copy_containers(v) for v in o]
+    return o
+
+
+def cached(kind: str, filename: PathLike, loader: Callable[[], Any], sizeof: Callable[[Any, os.stat_result], int]) -> Any:
+    """Return `loader()` for a file through the cache (or directly if the cache is disabled).
+
+    `kind` separates entries of different loaders for the same file. Containers in the cached
+    value are copied on every return and arrays are made read-only.
+    """
+    cache = _cache
+    if cache is None:
+        return loader()
+
+    st = os.stat(filename)
+    key = (kind, os.path.abspath(filename), st.st_mtime_ns, st.st_size, st.st_ino)
+    value = cache.get(key)
+    if value is None:
+        value = _readonly(loader())
+        cache.put(key, value, sizeof(value, st))
+    return _copy_containers(value)
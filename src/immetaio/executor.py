@@ -0,0 +1,510 @@
+from concurrent.futures import CancelledError, Executor, Future, ProcessPoolExecutor
+from concurrent.futures import wait as wait_futures
+from collections import deque
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+import functools
+import multiprocessing
+import os
+import threading
+import numpy as np
+from . import array
+from . import array_meta
+from . import atomic
+from . import json
+from . import params
+from . import profiling
+from .array import ROI
+from .typing import PathLike
+
+ExecutorLike = Union[str, Executor]
+
+
+class SharedArraySpec(NamedTuple):
+    """Reference to an array stored in a shared memory block."""
+
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+def _to_shared(arr: np.ndarray) -> Tuple[shared_memory.SharedMemory, SharedArraySpec]:
+    """Copy an array into a new shared memory block."""
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    view = np.ndarray(arr.shape, arr.dtype, buffer=shm.buf)
+    view[...] = arr
+    del view  # Release the buffer so the block can be closed
+    return shm, SharedArraySpec(shm.name, arr.shape, arr.dtype.str)
+
+
+def _attach(spec: SharedArraySpec) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    shm = shared_memory.SharedMemory(name=spec.name)
+    return shm, np.ndarray(spec.shape, np.dtype(spec.dtype), buffer=shm.buf)
+
+
+class _Settings(NamedTuple):
+    """Global settings of the parent process, applied by a process worker before it saves.
+
+    Workers hold a copy of the module globals from when the pool started (fork) or the
+    defaults (spawn), so settings changed later in the parent would otherwise be ignored.
+    """
+
+    profile: Optional[str]
+    profiles: Dict[str, params.Profile]
+    imwrite_params: Dict[str, List[int]]
+    durability: str
+    external_threshold: Optional[int]
+    chunked_threshold: Optional[int]
+
+
+def _get_settings() -> _Settings:
+    from . import array_chunked  # array_chunked depends on this module
+
+    return _Settings(
+        profile=params.get_profile(),
+        profiles=params.profiles,
+        imwrite_params=params.cv2_imwrite_params,
+        durability=atomic.get_durability(),
+        external_threshold=json.get_external_threshold(),
+        chunked_threshold=array_chunked.get_threshold(),
+    )
+
+
+def _apply_settings(settings: _Settings) -> None:
+    from . import array_chunked
+
+    params.profiles = settings.profiles
+    params.cv2_imwrite_params = settings.imwrite_params
+    params.set_profile(settings.profile)
+    atomic.set_durability(settings.durability)
+    json.set_external_threshold(settings.external_threshold)
+    array_chunked.set_threshold(settings.chunked_threshold)
+
+
+def _save_shared(filename: PathLike, spec: SharedArraySpec, profile: Optional[str], metadata: Dict[str, Any], settings: _Settings) -> Tuple[Path, Optional[Path]]:
+    """Process worker: save an array that the parent placed in shared memory."""
+    _apply_settings(settings)
+    shm, arr = _attach(spec)
+    try:
+        return array_meta.save(filename, arr, profile=profile, **metadata)
+    finally:
+        del arr
+        shm.close()
+
+
+def _load_shared(filename_array: PathLike, filename_meta: Optional[PathLike], roi: Optional[ROI] = None, reduce: int = 1) -> Tuple[SharedArraySpec, Dict[str, Any]]:
+    """Process worker: load an array into a new shared memory block owned by the parent."""
+    arr, metadata = array_meta.load(filename_array, filename_meta, roi=roi, reduce=reduce)
+    shm, spec = _to_shared(arr)
+    shm.close()
+    # The parent unlinks the block, so this worker's resource tracker must not clean it up
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return spec, metadata
+
+
+_UNSET: Any = object()
+KINDS = ("read", "write")
+
+
+class Scheduler:
+    """Shared I/O thread pool with global concurrency limits and read/write priorities.
+
+    - `max_workers`: total number of threads (ThreadPoolExecutor default if None).
+    - `max_reads` / `max_writes`: maximum number of read / write jobs running at once (unlimited if None).
+    - `prefer`: the kind of job ('read' or 'write') that is started first when both are queued.
+
+    Threads are created lazily when jobs are queued.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_reads: Optional[int] = None, max_writes: Optional[int] = None, prefer: str = "read"):
+        self._cond = threading.Condition()
+        self._queues: Dict[str, Deque[Tuple[Future, Callable[..., Any], tuple, dict]]] = {kind: deque() for kind in KINDS}
+        self._running = {kind: 0 for kind in KINDS}
+        self._limits: Dict[str, Optional[int]] = {kind: None for kind in KINDS}
+        self._threads: Set[threading.Thread] = set()
+        self._idle = 0
+        self._shutdown = False
+        self._max_workers = 1
+        self._prefer = "read"
+        self.configure(max_workers=max_workers, max_reads=max_reads, max_writes=max_writes, prefer=prefer)
+
+    @property
+    def max_workers(self) -> int:
+        return self._max_workers
+
+    def configure(self, max_workers: Optional[int] = _UNSET, max_reads: Optional[int] = _UNSET, max_writes: Optional[int] = _UNSET, prefer: str = _UNSET) -> None:
+        """Change the pool size, limits, or priority. Only the given arguments are changed."""
+        if prefer is not _UNSET and prefer not in KINDS:
+            raise ValueError(f"prefer must be 'read' or 'write', got '{prefer}'.")
+        with self._cond:
+            if max_workers is not _UNSET:
+                self._max_workers = max_workers if max_workers is not None else min(32, (os.cpu_count() or 1) + 4)
+            if max_reads is not _UNSET:
+                self._limits["read"] = max_reads
+            if max_writes is not _UNSET:
+                self._limits["write"] = max_writes
+            if prefer is not _UNSET:
+                self._prefer = prefer
+            self._adjust_threads()
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of threads and of queued and running jobs per kind."""
+        with self._cond:
+            stats = {"threads": len(self._threads), "max_workers": self._max_workers}
+            for kind in KINDS:
+                stats[f"{kind}s_queued"] = len(self._queues[kind])
+                stats[f"{kind}s_running"] = self._running[kind]
+            return stats
+
+    def submit(self, kind: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Queue a 'read' or 'write' job."""
+        if kind not in KINDS:
+            raise ValueError(f"kind must be 'read' or 'write', got '{kind}'.")
+        fut: Future = Future()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            self._queues[kind].append((fut, fn, args, kwargs))
+            self._adjust_threads()
+            self._cond.notify()
+        return fut
+
+    def _adjust_threads(self) -> None:
+        pending = sum(len(q) for q in self._queues.values())
+        while self._idle < pending and len(self._threads) < self._max_workers:
+            t = threading.Thread(target=self._worker, name=f"immetaio-io-{len(self._threads)}", daemon=True)
+            self._threads.add(t)
+            self._idle += 1  # Counted as idle until it picks a job
+            pending -= 1
+            t.start()
+
+    def _pick(self) -> Optional[Tuple[str, Tuple[Future, Callable[..., Any], tuple, dict]]]:
+        order = KINDS if self._prefer == "read" else KINDS[::-1]
+        for kind in order:
+            limit = self._limits[kind]
+            if self._queues[kind] and (limit is None or self._running[kind] < limit):
+                return kind, self._queues[kind].popleft()
+        return None
+
+    def _worker(self) -> None:
+        me = threading.current_thread()
+        _local.worker = True
+        while True:
+            with self._cond:
+                while True:
+                    if len(self._threads) > self._max_workers or (self._shutdown and not any(self._queues.values())):
+                        self._idle -= 1
+                        self._threads.discard(me)
+                        self._cond.notify_all()
+                        return
+                    picked = self._pick()
+                    if picked is not None:
+                        break
+                    self._cond.wait()
+                kind, (fut, fn, args, kwargs) = picked
+                self._idle -= 1
+                self._running[kind] += 1
+
+            if fut.set_running_or_notify_cancel():
+                try:
+                    fut.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    fut.set_exception(e)
+            del fut, fn, args, kwargs
+
+            with self._cond:
+                self._running[kind] -= 1
+                self._idle += 1
+                self._cond.notify_all()
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False) -> None:
+        """Stop accepting jobs and let the threads exit once the queues are empty."""
+        with self._cond:
+            self._shutdown = True
+            if cancel_futures:
+                for queue in self._queues.values():
+                    while queue:
+                        queue.popleft()[0].cancel()
+            threads = list(self._threads)
+            self._cond.notify_all()
+        if wait:
+            for t in threads:
+                if t is not threading.current_thread():
+                    t.join()
+
+
+class Lane(Executor):
+    """Executor view of a shared pool that keeps at most `limit` of its own jobs in flight.
+
+    Extra jobs wait in the lane without occupying the pool. `shutdown` waits for (or cancels)
+    only the jobs of this lane; the underlying pool keeps running.
+    """
+
+    def __init__(self, submit: Callable[..., Future], limit: Optional[int] = None, process: bool = False):
+        self._submit = submit
+        self._limit = limit
+        self.process = process
+        self._lock = threading.Lock()
+        self._running = 0
+        self._waiting: Deque[Tuple[Future, Callable[..., Any], tuple, dict]] = deque()
+        self._futures: Set[Future] = set()
+
+    def set_limit(self, limit: Optional[int]) -> None:
+        """Change the number of jobs of this lane allowed in flight."""
+        with self._lock:
+            self._limit = limit
+        self._start_waiting()
+
+    @property
+    def _max_workers(self) -> int:
+        if self._limit is not None:
+            return self._limit
+        return get_process_pool()._max_workers if self.process else get_scheduler().max_workers
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        proxy: Future = Future()
+        with self._lock:
+            self._futures.add(proxy)
+            self._waiting.append((proxy, fn, args, kwargs))
+        self._start_waiting()
+        return proxy
+
+    def _start_waiting(self) -> None:
+        while True:
+            with self._lock:
+                if not self._waiting or (self._limit is not None and self._running >= self._limit):
+                    return
+                proxy, fn, args, kwargs = self._waiting.popleft()
+                if proxy.cancelled():
+                    proxy.set_running_or_notify_cancel()
+                    self._futures.discard(proxy)
+                    continue
+                self._running += 1
+            try:
+                if self.process:
+                    # The job runs in another process, so it is started (and no longer cancellable) here
+                    proxy.set_running_or_notify_cancel()
+                    inner = self._submit(fn, *args, **kwargs)
+                else:
+                    inner = self._submit(self._run, proxy, fn, args, kwargs)
+            except BaseException as e:
+                inner = Future()
+                inner.set_exception(e)
+            inner.add_done_callback(functools.partial(self._on_done, proxy))
+
+    @staticmethod
+    def _run(proxy: Future, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        # The proxy stays cancellable until a worker actually starts the job
+        if not proxy.set_running_or_notify_cancel():
+            return None
+        return fn(*args, **kwargs)
+
+    def _on_done(self, proxy: Future, inner: Future) -> None:
+        with self._lock:
+            self._running -= 1
+            self._futures.discard(proxy)
+        if not proxy.done():
+            if inner.cancelled():
+                if not proxy.cancel():
+                    proxy.set_exception(CancelledError())
+                else:
+                    proxy.set_running_or_notify_cancel()
+            elif inner.exception() is not None:
+                if proxy.running() or proxy.set_running_or_notify_cancel():
+                    proxy.set_exception(inner.exception())
+            else:
+                proxy.set_result(inner.result())
+        self._start_waiting()
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        if cancel_futures:
+            with self._lock:
+                waiting = list(self._waiting)
+                self._waiting.clear()
+                for proxy, _, _, _ in waiting:
+                    self._futures.discard(proxy)
+            for proxy, _, _, _ in waiting:
+                proxy.cancel()
+                proxy.set_running_or_notify_cancel()
+        if wait:
+            with self._lock:
+                futures = [f for f in self._futures if not f.cancelled()]
+            wait_futures(futures)
+
+
+_scheduler: Optional[Scheduler] = None
+_local = threading.local()
+
+
+def in_worker() -> bool:
+    """Return True if the calling thread is a worker of the shared scheduler."""
+    return getattr(_local, "worker", False)
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def get_scheduler() -> Scheduler:
+    """Return the shared I/O scheduler, creating it on first use."""
+    global _scheduler
+    with _lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+        return _scheduler
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Return the shared process pool, creating it on first use with the scheduler's `max_workers`.
+
+    Workers are started with "forkserver" (or "spawn" where it is not available) rather than
+    "fork": the library runs scheduler threads, and forking a threaded process can deadlock
+    the child on a lock held by another thread. The settings a worker needs are sent with
+    each job (see `_get_settings`).
+    """
+    global _process_pool
+    with _lock:
+        if _process_pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            max_workers = _scheduler.max_workers if _scheduler is not None else None
+            _process_pool = ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context(method))
+        return _process_pool
+
+
+def submit(kind: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+    """Queue a 'read' or 'write' job on the shared scheduler."""
+    return get_scheduler().submit(kind, fn, *args, **kwargs)
+
+
+def lane(kind: str, limit: Optional[int] = None) -> Lane:
+    """Return an Executor that queues `kind` jobs on the shared scheduler, at most `limit` of them in flight."""
+    return Lane(functools.partial(submit, kind), limit)
+
+
+def configure(max_workers: Optional[int] = _UNSET, max_reads: Optional[int] = _UNSET, max_writes: Optional[int] = _UNSET, prefer: str = _UNSET) -> None:
+    """Configure the shared I/O scheduler (see `Scheduler`). Only the given arguments are changed."""
+    get_scheduler().configure(max_workers=max_workers, max_reads=max_reads, max_writes=max_writes, prefer=prefer)
+
+
+def shutdown(wait: bool = True) -> None:
+    """Shut down the shared scheduler and process pool. They are recreated on next use."""
+    global _scheduler, _process_pool
+    with _lock:
+        scheduler, process_pool = _scheduler, _process_pool
+        _scheduler, _process_pool = None, None
+    if scheduler is not None:
+        scheduler.shutdown(wait=wait)
+    if process_pool is not None:
+        process_pool.shutdown(wait=wait)
+
+
+def is_process(executor: Executor) -> bool:
+    """Return True if jobs on `executor` run in other processes."""
+    return isinstance(executor, ProcessPoolExecutor) or (isinstance(executor, Lane) and executor.process)
+
+
+def num_workers(executor: Executor) -> int:
+    """Return the number of workers of an executor (CPU count if unknown)."""
+    return getattr(executor, "_max_workers", None) or os.cpu_count() or 1
+
+
+def _submit_process(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+    return get_process_pool().submit(fn, *args, **kwargs)
+
+
+def open_lane(executor: str = "thread", max_workers: Optional[int] = None, kind: str = "read") -> Lane:
+    """Return a lane of the shared scheduler ('thread') or process pool ('process') with at most `max_workers` jobs in flight."""
+    if executor == "thread":
+        return lane(kind, max_workers)
+    elif executor == "process":
+        return Lane(_submit_process, max_workers, process=True)
+    raise ValueError(f"executor must be 'thread', 'process' or an Executor instance, got {executor!r}.")
+
+
+@contextmanager
+def scope(executor: ExecutorLike = "thread", max_workers: Optional[int] = None, kind: str = "read") -> Iterator[Optional[Executor]]:
+    """Provide an executor for one batch call.
+
+    - 'thread': a lane of the shared scheduler for `kind` jobs, with at most `max_workers` of
+      them in flight (None, i.e. run serially, if `max_workers` is 1 or if called from a job
+      on the scheduler, which could otherwise wait for threads held by its own callers).
+    - 'process': a lane of the shared process pool; arrays are passed through shared memory.
+    - an Executor instance: used as is and left running, so it can be reused across calls.
+
+    On exit, the jobs of the lane are awaited (and the queued ones cancelled on error).
+    """
+    if isinstance(executor, Executor):
+        yield executor
+        return
+    if executor == "thread" and (max_workers == 1 or in_worker()):
+        yield None
+        return
+
+    pool = open_lane(executor, max_workers, kind)
+    try:
+        yield pool
+    except BaseException:
+        pool.shutdown(wait=True, cancel_futures=True)
+        raise
+    else:
+        pool.shutdown(wait=True)
+
+
+def submit_save(executor: Executor, filename: PathLike, arr: np.ndarray, profile: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> Future:
+    """Submit `array_meta.save` to an executor, through shared memory for process pools.
+
+    For process pools, the file extension and the global settings (profile, durability,
+    thresholds) are taken from this process and passed to the worker with the job.
+    """
+    metadata = metadata or {}
+    if not is_process(executor) or arr.dtype.hasobject:
+        return executor.submit(profiling.queued("executor.save_wait", array_meta.save), filename, arr, profile=profile, **metadata)
+
+    filename = array.get_filename(filename, arr, profile)
+    settings = _get_settings()
+    shm, spec = _to_shared(arr)
+
+    def _release(fut: Future) -> None:
+        shm.close()
+        shm.unlink()
+
+    fut = executor.submit(_save_shared, filename, spec, profile, metadata, settings)
+    fut.add_done_callback(_release)
+    return fut
+
+
+def submit_load(executor: Executor, filename_array: PathLike, filename_meta: Optional[PathLike] = None, out: Optional[np.ndarray] = None, mmap: bool = False, roi: Optional[ROI] = None, reduce: int = 1) -> Future:
+    """Submit `array_meta.load` to an executor, through shared memory for process pools.
+
+    With a process pool, the array is copied from shared memory into `out` (or a new array),
+    and `mmap` is not used.
+    """
+    if not is_process(executor):
+        return executor.submit(profiling.queued("executor.load_wait", array_meta.load), filename_array, filename_meta, out=out, mmap=mmap, roi=roi, reduce=reduce)
+
+    result: Future = Future()
+
+    def _receive(fut: Future) -> None:
+        try:
+            spec, metadata = fut.result()
+            shm, view = _attach(spec)
+            try:
+                if out is not None:
+                    if view.shape != out.shape or view.dtype != out.dtype:
+                        raise ValueError(f"Cannot load '{filename_array}' into out: expected {out.shape} {out.dtype}, got {view.shape} {view.dtype}.")
+                    arr = out
+                else:
+                    arr = np.empty(view.shape, view.dtype)
+                np.copyto(arr, view)
+            finally:
+                del view
+                shm.close()
+                shm.unlink()
+            result.set_result((arr, metadata))
+        except BaseException as e:
+            result.set_exception(e)
+
+    executor.submit(_load_shared, filename_array, filename_meta, roi, reduce).add_done_callback(_receive)
+    return result
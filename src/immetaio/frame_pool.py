@@ -0,0 +1,156 @@
+"""
+Preallocated frame buffers for non-blocking saves.
+
+A non-blocking save keeps a reference to the caller's array until the background job has
+written it, so a camera buffer that is reused for the next frame would corrupt the saved image.
+`FramePool` owns a fixed set of buffers instead: the caller acquires a slot, fills it, and
+passes the slot to a non-blocking save. The slot returns to the pool when the file is written,
+so a capture loop reuses the same memory without copying or allocating per frame.
+
+```python
+pool = immetaio.FramePool((2160, 3840, 3), np.uint8, size=8, policy="block")
+while capturing:
+    slot = pool.acquire()            # blocks (or returns None with policy='drop') when all slots are in flight
+    camera.read_into(slot.array)
+    immetaio.save(f"capture/{i}.png", slot, nonblock=True, timestamp=t)
+```
+"""
+
+from concurrent.futures import Future
+from collections import deque
+from typing import Deque, NamedTuple, Optional, Tuple, Union
+import threading
+import numpy as np
+import numpy.typing as npt
+
+
+class FramePoolStats(NamedTuple):
+    """Snapshot of a frame pool."""
+
+    size: int
+    free: int
+    in_use: int
+    dropped: int
+
+
+class FrameSlot:
+    """A preallocated buffer of a `FramePool`.
+
+    Write the frame into `array`, then pass the slot (instead of an array) to a non-blocking save,
+    or give it back unused with `release`. After submitting, the slot must not be touched again.
+    """
+
+    def __init__(self, pool: "FramePool", array: np.ndarray):
+        self.array = array
+        self._pool = pool
+        self._state = "free"
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.array.shape
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.array.dtype
+
+    @property
+    def nbytes(self) -> int:
+        return self.array.nbytes
+
+    def release(self) -> None:
+        """Give an acquired slot back to the pool without saving it."""
+        self._pool._release(self, expect="acquired")
+
+    def release_when_done(self, fut: Optional[Future]) -> None:
+        """Give a submitted slot back once `fut` completes (immediately if the save was dropped)."""
+        if fut is None:
+            self._pool._release(self, expect="submitted")
+        else:
+            fut.add_done_callback(lambda _: self._pool._release(self, expect="submitted"))
+
+    def _submit(self) -> np.ndarray:
+        with self._pool._cond:
+            if self._state != "acquired":
+                raise RuntimeError(f"Cannot save a frame slot that is {self._state}; acquire it from the pool first.")
+            self._state = "submitted"
+        return self.array
+
+    def __repr__(self) -> str:
+        return f"FrameSlot(shape={self.shape}, dtype={self.dtype}, state={self._state})"
+
+
+class FramePool:
+    """Fixed set of preallocated frame buffers.
+
+    - `size`: number of slots, i.e. the maximum number of frames being filled or saved at once.
+    - `policy`: when all slots are in use, 'block' waits for one to be released, 'drop' makes `acquire` return None.
+    """
+
+    def __init__(self, shape: Union[int, Tuple[int, ...]], dtype: npt.DTypeLike, size: int = 4, policy: str = "block"):
+        if size < 1:
+            raise ValueError(f"size must be >= 1, got {size}.")
+        if policy not in ("block", "drop"):
+            raise ValueError(f"policy must be 'block' or 'drop', got '{policy}'.")
+        self.policy = policy
+        self._cond = threading.Condition()
+        self._slots = []
+        for _ in range(size):
+            arr = np.empty(shape, dtype)
+            arr.fill(0)  # Fault the pages in now rather than during capture
+            self._slots.append(FrameSlot(self, arr))
+        self._free: Deque[FrameSlot] = deque(self._slots)
+        self._dropped = 0
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self._slots[0].shape
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._slots[0].dtype
+
+    @property
+    def size(self) -> int:
+        return len(self._slots)
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[FrameSlot]:
+        """Take a free slot.
+
+        With policy 'block', waits until a slot is released (raising TimeoutError after `timeout`
+        seconds if given). With policy 'drop', returns None if no slot is free.
+        """
+        with self._cond:
+            if not self._free:
+                if self.policy == "drop":
+                    self._dropped += 1
+                    return None
+                if not self._cond.wait_for(lambda: self._free, timeout):
+                    raise TimeoutError(f"No frame slot was released within {timeout} s.")
+            slot = self._free.popleft()
+            slot._state = "acquired"
+            return slot
+
+    def _release(self, slot: FrameSlot, expect: str) -> None:
+        with self._cond:
+            if slot._state != expect:
+                raise RuntimeError(f"Cannot release a frame slot that is {slot._state}.")
+            slot._state = "free"
+            self._free.append(slot)
+            self._cond.notify_all()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every slot is back in the pool. Returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: len(self._free) == len(self._slots), timeout)
+
+    def stats(self) -> FramePoolStats:
+        with self._cond:
+            free = len(self._free)
+            return FramePoolStats(size=len(self._slots), free=free, in_use=len(self._slots) - free, dropped=self._dropped)
+
+
+def unwrap(arr: Union[np.ndarray, FrameSlot]) -> Tuple[np.ndarray, Optional[FrameSlot]]:
+    """Return the array to save and the slot it belongs to (None for a plain array), marking the slot as submitted."""
+    if isinstance(arr, FrameSlot):
+        return arr._submit(), arr
+    return arr, None
@@ -0,0 +1,179 @@
+"""Directory index for array_meta_dir.
+
+The index is a hidden JSON file that stores the ordered array filenames of a directory,
+with their shapes, dtypes, formats, and sidecar presence. After it is written, the directory
+is scanned again and, if it still holds the same files, the index's modification time is set
+to the directory's (taken before that scan), so any file added, removed or renamed in the
+directory afterwards makes it stale. Because a change within the same timestamp tick would
+not change the directory's mtime on file systems with coarse timestamps, an index pinned less
+than `RACY_NS` before it is checked is verified by a scan and pinned again. Arrays rewritten in place under the
+same name are not detected, except by incremental saves, which also record content hashes
+and file stamps (see `array_meta_multi.save`).
+"""
+
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import os
+import re
+from . import atomic
+from . import json
+from . import meta
+from .typing import PathLike
+
+INDEX_NAME = ".immetaio_index.json"
+RACY_NS = 2_000_000_000  # Coarsest common timestamp granularity (FAT)
+ext_candidates = [".png", ".exr", ".npy", ".npz", ".chunks"]
+
+_NUMBERS = re.compile(r"(\d+)")
+
+
+class IndexEntry(NamedTuple):
+    """One array file of an indexed directory.
+
+    `hash` and `meta_hash` are content hashes of the array and its metadata recorded by incremental
+    saves, and `stamp` is the (mtime_ns, size) of the array file and sidecar when they were recorded.
+    """
+
+    filename: str
+    shape: Optional[Tuple[int, ...]]
+    dtype: Optional[str]
+    format: str
+    meta: bool
+    hash: Optional[str] = None
+    meta_hash: Optional[str] = None
+    stamp: Optional[Tuple[int, ...]] = None
+
+
+def numerical_sort_key(string):
+    """Sort the file names numerically."""
+    parts = _NUMBERS.split(str(string))
+    parts[1::2] = map(int, parts[1::2])
+    return parts
+
+
+def path(dirname: PathLike) -> Path:
+    """Return the path of the index file of a directory."""
+    return Path(dirname) / INDEX_NAME
+
+
+def scan(dirname: PathLike, known: Optional[Dict[str, IndexEntry]] = None) -> List[IndexEntry]:
+    """List the array files of a directory in a single `os.scandir` pass.
+
+    Shapes and dtypes are taken from `known` (by filename) and are None otherwise.
+    """
+    known = known or {}
+    names = []
+    with os.scandir(dirname) as it:
+        for entry in it:
+            names.append(entry.name)
+    name_set = set(names)
+
+    entries = []
+    for name in sorted(names, key=numerical_sort_key):
+        stem, ext = os.path.splitext(name)
+        if ext not in ext_candidates or atomic.is_temp(name):
+            continue
+        has_meta = stem + meta.ext in name_set
+        if name in known:
+            entries.append(known[name]._replace(format=ext, meta=has_meta))
+        else:
+            entries.append(IndexEntry(name, None, None, ext, has_meta))
+    return entries
+
+
+def is_fresh(dirname: PathLike) -> bool:
+    """Return True if the index exists and the directory has not changed since it was pinned."""
+    try:
+        st_index = os.stat(path(dirname))
+        st_dir = os.stat(dirname)
+    except FileNotFoundError:
+        return False
+    if st_index.st_mtime_ns != st_dir.st_mtime_ns:
+        return False
+    # st_ctime_ns is the time of the pinning utime (on Windows it is the creation time, and mtimes are fine-grained)
+    return os.name == "nt" or st_index.st_ctime_ns - st_dir.st_mtime_ns >= RACY_NS
+
+
+def _layout(entries: List[IndexEntry]) -> List[Tuple[str, bool]]:
+    return [(e.filename, e.meta) for e in entries]
+
+
+def _pin(dirname: PathLike, entries: List[IndexEntry]) -> bool:
+    """Tie the index to the directory's mtime if the directory still holds `entries`, and mark it stale otherwise.
+
+    The mtime is taken before the scan, so a change during or after the scan leaves the index stale.
+    """
+    filename_index = path(dirname)
+    mtime = os.stat(dirname).st_mtime_ns
+    fresh = _layout(scan(dirname)) == _layout(entries)
+    st_index = os.stat(filename_index)
+    os.utime(filename_index, ns=(st_index.st_atime_ns, mtime if fresh else 0))
+    return fresh
+
+
+def save(dirname: PathLike, entries: List[IndexEntry]) -> Path:
+    """Write the index of a directory atomically and mark it fresh if the directory still matches `entries`."""
+    dirname = Path(dirname)
+    data = {
+        "version": 1,
+        "filenames": [e.filename for e in entries],
+        "shapes": [list(e.shape) if e.shape is not None else None for e in entries],
+        "dtypes": [e.dtype for e in entries],
+        "formats": [e.format for e in entries],
+        "meta": [e.meta for e in entries],
+    }
+    if any(e.hash is not None for e in entries):
+        data["hashes"] = [e.hash for e in entries]
+        data["meta_hashes"] = [e.meta_hash for e in entries]
+        data["stamps"] = [list(e.stamp) if e.stamp is not None else None for e in entries]
+    filename_index = path(dirname)
+    json.write(filename_index, data, mkdir=False)
+    _pin(dirname, entries)
+    return filename_index
+
+
+def load(dirname: PathLike) -> Optional[List[IndexEntry]]:
+    """Read the index of a directory regardless of freshness. Returns None if it is missing or unreadable."""
+    try:
+        data = json.load(path(dirname))
+        n = len(data["filenames"])
+        hashes = data.get("hashes", [None] * n)
+        meta_hashes = data.get("meta_hashes", [None] * n)
+        stamps = data.get("stamps", [None] * n)
+        return [
+            IndexEntry(filename, tuple(shape) if shape is not None else None, dtype, fmt, has_meta, h, mh, tuple(stamp) if stamp is not None else None)
+            for filename, shape, dtype, fmt, has_meta, h, mh, stamp in zip(data["filenames"], data["shapes"], data["dtypes"], data["formats"], data["meta"], hashes, meta_hashes, stamps)
+        ]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def update(dirname: PathLike, known: Optional[Dict[str, IndexEntry]] = None) -> List[IndexEntry]:
+    """Rescan a directory and rewrite its index, keeping shapes and dtypes from the previous index and `known`."""
+    previous = {e.filename: e for e in load(dirname) or []}
+    previous.update(known or {})
+    entries = scan(dirname, previous)
+    save(dirname, entries)
+    return entries
+
+
+def discover(dirname: PathLike, rebuild: bool = True) -> List[IndexEntry]:
+    """Return the array files of a directory, trusting the index when it is fresh.
+
+    A stale index is rebuilt (if `rebuild` is True and the directory is writable).
+    Without an index, the directory is scanned and no index is created.
+    """
+    if is_fresh(dirname):
+        indexed = load(dirname)
+        if indexed is not None:
+            return indexed
+
+    if rebuild and path(dirname).exists():
+        try:
+            indexed = load(dirname)
+            if indexed is not None and _pin(dirname, indexed):
+                return indexed  # Unchanged (e.g. pinned too recently to be trusted): pinned again without rewriting
+            return update(dirname)
+        except OSError:
+            pass
+    return scan(dirname)
@@ -1,8 +1,12 @@
-from typing import Dict, Any
+from typing import Any, Dict, List, Optional, Set, Tuple
 from pathlib import Path
 import json
+import os
+import re
 import numpy as np
 from .typing import PathLike
+from . import atomic
+from . import profiling
 
 
 class NdarrayEncoder(json.JSONEncoder):
@@ -16,17 +20,96 @@ class NdarrayEncoder(json.JSONEncoder):
             return json.JSONEncoder.default(self, o)
 
 
-def _ndarray_hook(o):
+def _ndarray_hook(o, dirname=None, mmap=False):
     if "type" in o:
         if o["type"] == "ndarray":
+            if "file" in o:
+                return _load_external(o, dirname, mmap)
             dtype = o["dtype"] if "dtype" in o else None
             return np.array(o["values"], dtype)
     return o
 
 
 class NdarrayDecoder(json.JSONDecoder):
-    def __init__(self, *args, **kwargs):
-        json.JSONDecoder.__init__(self, object_hook=_ndarray_hook, *args, **kwargs)
+    """Decoder restoring NumPy arrays; external arrays are resolved relative to `dirname` (or the working directory)."""
+
+    def __init__(self, *args, dirname: Optional[PathLike] = None, mmap: bool = False, **kwargs):
+        json.JSONDecoder.__init__(self, object_hook=lambda o: _ndarray_hook(o, dirname, mmap), *args, **kwargs)
+
+
+# Arrays larger than this (in bytes) are written next to the json file instead of inline
+_external_threshold: Optional[int] = None
+EXTERNAL_EXT = ".npyblob"
+
+
+def set_external_threshold(nbytes: Optional[int]) -> None:
+    """Store arrays larger than `nbytes` in binary files next to the json file (None: always inline).
+
+    The files use the .npy format under the extension '.npyblob', so that directory scans do not
+    mistake them for frames. The json file keeps a reference with the dtype and shape.
+    """
+    global _external_threshold
+    if nbytes is not None and nbytes < 0:
+        raise ValueError(f"nbytes must be >= 0 or None, got {nbytes}.")
+    _external_threshold = nbytes
+
+
+def get_external_threshold() -> Optional[int]:
+    return _external_threshold
+
+
+def _blob_name(stem: str, path: List[str], used: Set[str]) -> str:
+    key = re.sub(r"[^A-Za-z0-9_-]", "_", ".".join(path))
+    name = f"{stem}.{key}{EXTERNAL_EXT}"
+    n = 1
+    while name in used:
+        name = f"{stem}.{key}-{n}{EXTERNAL_EXT}"
+        n += 1
+    used.add(name)
+    return name
+
+
+def blob_owner(name: str) -> str:
+    """Return the stem of the json file that an external array file belongs to."""
+    return name[: -len(EXTERNAL_EXT)].rsplit(".", 1)[0]  # Keys in blob names contain no dots
+
+
+_BLOB_REF = re.compile(r'"file":\s*"([^"\\/]+' + re.escape(EXTERNAL_EXT) + r')"')
+
+
+def _referenced_blobs(filename_json: Path) -> Set[str]:
+    """Return the external array files referenced by an existing json file (empty if there is none)."""
+    try:
+        with open(filename_json) as f:
+            text = f.read()
+    except (FileNotFoundError, UnicodeDecodeError):
+        return set()
+    if EXTERNAL_EXT not in text:
+        return set()
+    return set(_BLOB_REF.findall(text))
+
+
+def _externalize(o: Any, stem: str, path: List[str], threshold: int, blobs: List[Tuple[str, np.ndarray]], used: Set[str]) -> Any:
+    """Replace large arrays in `o` by file references, collecting (filename, array) pairs in `blobs`."""
+    if isinstance(o, np.ndarray):
+        if o.nbytes <= threshold or o.dtype.hasobject:
+            return o
+        name = _blob_name(stem, path, used)
+        blobs.append((name, o))
+        return {"type": "ndarray", "file": name, "dtype": o.dtype.str, "shape": list(o.shape)}
+    elif isinstance(o, dict):
+        return {k: _externalize(v, stem, path + [str(k)], threshold, blobs, used) for k, v in o.items()}
+    elif isinstance(o, (list, tuple)):
+        return [_externalize(v, stem, path + [str(i)], threshold, blobs, used) for i, v in enumerate(o)]
+    return o
+
+
+def _load_external(ref: Dict[str, Any], dirname: Optional[PathLike], mmap: bool) -> np.ndarray:
+    filename = Path(dirname) / ref["file"] if dirname is not None else Path(ref["file"])
+    arr = np.load(filename, mmap_mode="r" if mmap else None, allow_pickle=False)
+    if arr.dtype.str != ref["dtype"] or list(arr.shape) != ref["shape"]:
+        raise ValueError(f"'{filename}' does not match its reference (expected {ref['dtype']} {ref['shape']}, got {arr.dtype.str} {list(arr.shape)}).")
+    return arr
 
 
 def format_json(obj: Any, indent: int = 4, level: int = 0) -> str:
@@ -81,25 +164,152 @@ def format_json(obj: Any, indent: int = 4, level: int = 0) -> str:
         return json.dumps(obj)
 
 
-def save(filename_json: PathLike, **data: Any) -> Path:
-    """Save dictionary to a json file."""
+_PRIMITIVE_TYPES = {str, int, float, bool, type(None)}
+_JSON_TYPES = (dict, list, tuple, str, int, float, type(None))
+
+
+def _key_to_str(key: Any) -> str:
+    """Convert a dict key the same way json.dump does."""
+    if isinstance(key, str):
+        return key
+    elif isinstance(key, (int, float)) or key is None:
+        # bool, int, float and None keys are stringified as their JSON literals
+        return json.dumps(key)
+    raise TypeError(f"keys must be str, int, float, bool or None, not {key.__class__.__name__}")
+
+
+def _to_json_type(o: Any, encoder: json.JSONEncoder) -> Any:
+    """Apply `encoder.default` until `o` is a natively serializable object."""
+    while not isinstance(o, _JSON_TYPES):
+        o = encoder.default(o)
+    return o
+
+
+def _format(obj: Any, encoder: json.JSONEncoder, indent: int, level: int, markers: set) -> str:
+    """Single-pass counterpart of `format_json` working on Python/NumPy objects."""
+    obj = _to_json_type(obj, encoder)
+
+    if type(obj) in _PRIMITIVE_TYPES:
+        return json.dumps(obj)
+
+    space = " " * (indent * level)
+    next_space = " " * (indent * (level + 1))
+
+    if id(obj) in markers:
+        raise ValueError("Circular reference detected")
+
+    # --- dicts ---
+    if isinstance(obj, dict):
+        if not obj:
+            return "{}"
+        markers.add(id(obj))
+        items = []
+        for k, v in obj.items():
+            key = json.dumps(_key_to_str(k))
+            val = _format(v, encoder, indent, level + 1, markers)
+            items.append(f"{next_space}{key}: {val}")
+        markers.discard(id(obj))
+        body = ",\n".join(items)
+        return "{\n" + body + "\n" + space + "}"
+
+    # --- lists ---
+    elif isinstance(obj, (list, tuple)):
+        if not obj:
+            return "[]"
+
+        # Fast path: a flat list of primitives stays on one line
+        if all(type(el) in _PRIMITIVE_TYPES for el in obj):
+            return json.dumps(obj)
+
+        markers.add(id(obj))
+        elems = [_to_json_type(el, encoder) for el in obj]
+        is_2d = all(isinstance(el, (list, tuple)) for el in elems) and all(not any(isinstance(_to_json_type(sub, encoder), (list, tuple)) for sub in el) for el in elems)
+
+        if is_2d:
+            rows = [f"{next_space}{_format(row, encoder, indent, level + 1, markers)}" for row in elems]
+            text = "[\n" + ",\n".join(rows) + "\n" + space + "]"
+        else:
+            text = "[" + ", ".join(_format(el, encoder, indent, level + 1, markers) for el in elems) + "]"
+        markers.discard(id(obj))
+        return text
+
+    # --- primitives (subclasses of str, int, float) ---
+    else:
+        return json.dumps(obj)
+
+
+def dumps(obj: Any, indent: Optional[int] = 4, cls: type = NdarrayEncoder) -> str:
+    """Serialize `obj` to a JSON string with the layout of `format_json`.
+
+    Unlike `format_json`, this works directly on Python/NumPy objects (using
+    `cls.default` for non-JSON types), so no intermediate dump and reload is needed.
+    If `indent` is None, the output is compact (single line, no spaces).
+    """
+    if indent is None:
+        return json.dumps(obj, cls=cls, separators=(",", ":"))
+    return _format(obj, cls(), indent, 0, set())
+
+
+def loads(text: str, dirname: Optional[PathLike] = None, mmap: bool = False) -> Any:
+    """Deserialize a JSON string, restoring NumPy arrays (external ones relative to `dirname`)."""
+    return json.loads(text, cls=NdarrayDecoder, dirname=dirname, mmap=mmap)
+
+
+def write(filename_json: PathLike, data: Dict[str, Any], mkdir: bool = True, external_threshold: Optional[int] = None) -> Path:
+    """Save dictionary to a json file.
+
+    Same as `save`, but takes the dictionary as an argument. If `mkdir` is False,
+    the parent directory is assumed to exist. The file is replaced atomically (see `atomic`).
+    Arrays larger than `external_threshold` bytes (default: `set_external_threshold`) are
+    written to binary files next to it before the json file itself, and the binary files of
+    the replaced json file that it no longer references are removed after it. This cleanup
+    only runs while a threshold is set, so plain saves do not read the old file; blobs left
+    behind after turning the threshold off are reported by `array_meta_dir.recover`.
+    """
     filename_json = Path(filename_json)
-    filename_json.parent.mkdir(parents=True, exist_ok=True)
-    with open(filename_json, "w") as f:
-        json.dump(data, f, cls=NdarrayEncoder, indent=4)
+    threshold = external_threshold if external_threshold is not None else _external_threshold
+    blobs: List[Tuple[str, np.ndarray]] = []
+    with profiling.span("json.format") as span:
+        if threshold is not None:
+            data = _externalize(data, filename_json.stem, [], threshold, blobs, set())
+        text = dumps(data, indent=4)
+        span.nbytes = len(text)
+    if mkdir:
+        with profiling.span("json.mkdir"):
+            filename_json.parent.mkdir(parents=True, exist_ok=True)
+    previous = _referenced_blobs(filename_json) if threshold is not None else set()
+    for name, arr in blobs:
+        with atomic.replace_on_success(filename_json.parent / name) as filename_tmp:
+            with profiling.span("json.write_external", arr.nbytes), open(filename_tmp, "wb") as f:
+                np.save(f, arr, allow_pickle=False)
+    with atomic.replace_on_success(filename_json) as filename_tmp:
+        with profiling.span("json.write", len(text)), open(filename_tmp, "w") as f:
+            f.write(text + "\n")
 
-    # Reformat the JSON file for better readability
-    with open(filename_json, "r") as f:
-        data = json.load(f)
-    formatted_data = format_json(data, indent=4)
-    with open(filename_json, "w") as f:
-        f.write(formatted_data + "\n")
+    # Remove the external files of the previous version that are no longer referenced
+    for name in previous - {name for name, _ in blobs}:
+        if blob_owner(name) == filename_json.stem:
+            try:
+                os.remove(filename_json.parent / name)
+            except FileNotFoundError:
+                pass
 
     return filename_json
 
 
-def load(filename_json: PathLike) -> Dict[str, Any]:
-    """Load dictionary from a json file."""
-    with open(filename_json, "r") as f:
-        data = json.load(f, cls=NdarrayDecoder)
-    return data
+def save(filename_json: PathLike, **data: Any) -> Path:
+    """Save dictionary to a json file."""
+    return write(filename_json, data)
+
+
+def load(filename_json: PathLike, mmap: bool = False) -> Dict[str, Any]:
+    """Load dictionary from a json file.
+
+    Arrays stored in external files are read eagerly, or memory-mapped (read-only) if `mmap` is True.
+    """
+    with profiling.span("json.read") as span:
+        with open(filename_json, "r") as f:
+            text = f.read()
+        span.nbytes = len(text)
+    with profiling.span("json.parse", len(text)):
+        return loads(text, dirname=Path(filename_json).parent, mmap=mmap)
@@ -1,4 +1,4 @@
-from typing import Any, Tuple, Optional, Dict, List, overload
+from typing import Any, Tuple, Optional, Dict, List, Union, overload
 from pathlib import Path
 import numpy as np
 import numpy.typing as npt
@@ -6,56 +6,116 @@ from . import array_meta
 from . import array_meta_nonblock
 from . import array_meta_multi
 from . import array_meta_dir
+from . import array_meta_pack
+from . import array_chunked
+from .array import ROI
+from .executor import ExecutorLike
+from .frame_pool import FrameSlot
 from .typing import PathLike
 
 
 @overload
-def save(target: PathLike, arr: np.ndarray, nonblock: bool = False, **metadata: Any) -> Tuple[Path, Optional[Path]]: ...
+def save(target: PathLike, arr: Union[np.ndarray, FrameSlot], nonblock: bool = False, profile: Optional[str] = None, **metadata: Any) -> Tuple[Path, Optional[Path]]: ...
 @overload
-def save(target: List[PathLike], arr: npt.ArrayLike, max_workers: Optional[int] = None, **metadata: List[Any]) -> List[Tuple[Path, Optional[Path]]]: ...
+def save(target: List[PathLike], arr: npt.ArrayLike, max_workers: Optional[int] = None, profile: Optional[str] = None, executor: ExecutorLike = "thread", incremental: bool = False, **metadata: List[Any]) -> List[Tuple[Path, Optional[Path]]]: ...
 @overload
-def save(target: PathLike, arr: npt.ArrayLike, max_workers: Optional[int] = None, **metadata: List[Any]) -> List[Tuple[Path, Optional[Path]]]: ...
+def save(target: PathLike, arr: npt.ArrayLike, max_workers: Optional[int] = None, profile: Optional[str] = None, executor: ExecutorLike = "thread", incremental: bool = False, **metadata: List[Any]) -> List[Tuple[Path, Optional[Path]]]: ...
 
 
-def save(target, arr, nonblock=False, max_workers=None, **metadata):
-    """Save array(s) and metadata to a file or directory."""
+def save(target, arr, nonblock=False, max_workers=None, profile=None, executor="thread", incremental=False, **metadata):
+    """Save array(s) and metadata to a file, directory, or pack file (see `array_meta_pack`).
+
+    Returns the (array, metadata) filenames per frame, except for pack files, for which the
+    path of the pack file is returned.
+    """
     if isinstance(target, list):
         # If target is a list, save multiple arrays
-        return array_meta_multi.save(target, arr, max_workers=max_workers, **metadata)
+        return array_meta_multi.save(target, arr, max_workers=max_workers, profile=profile, executor=executor, incremental=incremental, **metadata)
     elif isinstance(target, PathLike):
-        if isinstance(arr, np.ndarray):
-            # If arr is a single array, save it to the specified file
+        if Path(target).suffix == array_meta_pack.EXT:
+            # If target is a pack file, save the arrays into it
+            if nonblock or incremental or not (isinstance(executor, str) and executor == "thread"):
+                raise ValueError("nonblock, incremental and executor are not supported for pack files.")
+            return array_meta_pack.save(target, arr, max_workers=max_workers, profile=profile, **metadata)
+        elif isinstance(arr, (np.ndarray, FrameSlot)):
+            # If arr is a single array (or a frame pool slot), save it to the specified file
             if nonblock:
-                return array_meta_nonblock.save(target, arr, **metadata)
+                return array_meta_nonblock.save(target, arr, profile=profile, **metadata)
+            elif isinstance(arr, FrameSlot):
+                try:
+                    return array_meta.save(target, arr.array, profile=profile, **metadata)
+                finally:
+                    arr.release()
             else:
-                return array_meta.save(target, arr, **metadata)
+                return array_meta.save(target, arr, profile=profile, **metadata)
         else:
             # If arr is not a single array, assume it's a list of arrays
-            return array_meta_dir.save(target, arr, max_workers=max_workers, **metadata)
+            return array_meta_dir.save(target, arr, max_workers=max_workers, profile=profile, executor=executor, incremental=incremental, **metadata)
 
     raise TypeError("target must be a PathLike object or a list of PathLike objects.")
 
 
 @overload
-def load(target: PathLike, nonblock: bool = False) -> Tuple[np.ndarray, Dict[str, Any]]: ...
+def load(target: PathLike, out: Optional[np.ndarray] = None, mmap: bool = False, roi: Optional[ROI] = None, reduce: int = 1) -> Tuple[np.ndarray, Dict[str, Any]]: ...
 @overload
-def load(target: List[PathLike], max_workers: Optional[int] = None) -> Tuple[List[np.ndarray], Dict[str, List[Any]]]: ...
+def load(target: List[PathLike], max_workers: Optional[int] = None, stack: bool = False, out: Optional[Union[np.ndarray, PathLike]] = None, mmap: bool = False, executor: ExecutorLike = "thread", roi: Optional[ROI] = None, reduce: int = 1) -> Tuple[Union[List[np.ndarray], np.ndarray], Dict[str, List[Any]]]: ...
 @overload
-def load(target: PathLike, max_workers: Optional[int] = None) -> Tuple[List[np.ndarray], Dict[str, List[Any]]]: ...
+def load(target: PathLike, max_workers: Optional[int] = None, stack: bool = False, out: Optional[Union[np.ndarray, PathLike]] = None, mmap: bool = False, executor: ExecutorLike = "thread", roi: Optional[ROI] = None, reduce: int = 1) -> Tuple[Union[List[np.ndarray], np.ndarray], Dict[str, List[Any]]]: ...
 
 
-def load(target, max_workers=None):
-    """Load array(s) and metadata from a file or directory."""
+def load(target, max_workers=None, stack=False, out=None, mmap=False, executor="thread", roi=None, reduce=1):
+    """Load array(s) and metadata from a file, directory, or pack file (see `array_meta_pack`)."""
     if isinstance(target, list):
         # If target is a list, load multiple arrays
-        return array_meta_multi.load(target, max_workers=max_workers)
+        return array_meta_multi.load(target, max_workers=max_workers, stack=stack, out=out, mmap=mmap, executor=executor, roi=roi, reduce=reduce)
     elif isinstance(target, PathLike):
-        is_dir = Path(target).is_dir()
-        if is_dir:
+        is_dir = Path(target).is_dir() and Path(target).suffix != array_chunked.EXT  # A chunked array is a single array
+        if Path(target).suffix == array_meta_pack.EXT:
+            # If target is a pack file, load all arrays in it
+            return array_meta_pack.load(target, max_workers=max_workers, stack=stack, out=out, mmap=mmap, roi=roi, reduce=reduce)
+        elif is_dir:
             # If target is a directory, load arrays from the directory
-            return array_meta_dir.load(target, max_workers=max_workers)
+            return array_meta_dir.load(target, max_workers=max_workers, stack=stack, out=out, mmap=mmap, executor=executor, roi=roi, reduce=reduce)
         else:
             # If target is a single file, load the array and metadata
-            return array_meta.load(target)
+            if out is not None and not isinstance(out, np.ndarray):
+                raise TypeError(f"out must be a NumPy array when loading a single file, got {type(out).__name__} (paths are supported for lists, directories and pack files).")
+            return array_meta.load(target, out=out, mmap=mmap, roi=roi, reduce=reduce)
+
+    raise TypeError("target must be a PathLike object or a list of PathLike objects.")
+
+
+async def asave(target, arr, max_workers=None, profile=None, executor="thread", **metadata):
+    """Save array(s) and metadata to a file, directory, or pack file without blocking the event loop (see `save`)."""
+    from . import array_meta_async  # Keeps asyncio out of `import immetaio`
+
+    if isinstance(target, list):
+        return await array_meta_async.save_multi(target, arr, max_workers=max_workers, profile=profile, executor=executor, **metadata)
+    elif isinstance(target, PathLike):
+        if Path(target).suffix == array_meta_pack.EXT:
+            if not (isinstance(executor, str) and executor == "thread"):
+                raise ValueError("executor is not supported for pack files.")
+            return await array_meta_async.save_pack(target, arr, max_workers=max_workers, profile=profile, **metadata)
+        elif isinstance(arr, np.ndarray):
+            return await array_meta_async.save(target, arr, profile=profile, **metadata)
+        else:
+            return await array_meta_async.save_dir(target, arr, max_workers=max_workers, profile=profile, executor=executor, **metadata)
+
+    raise TypeError("target must be a PathLike object or a list of PathLike objects.")
+
+
+async def aload(target, max_workers=None, stack=False, out=None, mmap=False, executor="thread", roi=None, reduce=1):
+    """Load array(s) and metadata from a file, directory, or pack file without blocking the event loop (see `load`)."""
+    from . import array_meta_async
+
+    if isinstance(target, list):
+        return await array_meta_async.load_multi(target, max_workers=max_workers, stack=stack, out=out, mmap=mmap, executor=executor, roi=roi, reduce=reduce)
+    elif isinstance(target, PathLike):
+        if Path(target).suffix == array_meta_pack.EXT:
+            return await array_meta_async.load_pack(target, max_workers=max_workers, stack=stack, out=out, mmap=mmap, roi=roi, reduce=reduce)
+        elif Path(target).is_dir() and Path(target).suffix != array_chunked.EXT:
+            return await array_meta_async.load_dir(target, max_workers=max_workers, stack=stack, out=out, mmap=mmap, executor=executor, roi=roi, reduce=reduce)
+        else:
+            return await array_meta_async.load(target, out=out, mmap=mmap, roi=roi, reduce=reduce)
 
     raise TypeError("target must be a PathLike object or a list of PathLike objects.")
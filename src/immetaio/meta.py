@@ -1,6 +1,89 @@
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import functools
+import numbers
+import os
+import numpy as np
 from . import json
+from . import cache
+from .typing import PathLike
 
 # json-based metadata handling
 save = json.save
-load = json.load
+write = json.write
 ext = ".json"
+
+
+def load(filename_json: PathLike, mmap: bool = False) -> Dict[str, Any]:
+    """Load metadata from a json file, through the cache if it is enabled (see `cache.enable`).
+
+    If `mmap` is True, arrays stored in external files (see `json.set_external_threshold`) are memory-mapped.
+    """
+    kind = "meta-mmap" if mmap else "meta"
+    return cache.cached(kind, filename_json, functools.partial(json.load, filename_json, mmap=mmap), _cache_nbytes)
+
+
+def _external_nbytes(o: Any) -> int:
+    if isinstance(o, np.ndarray):
+        return o.nbytes if not isinstance(o, np.memmap) else 0
+    elif isinstance(o, dict):
+        return sum(_external_nbytes(v) for v in o.values())
+    elif isinstance(o, list):
+        return sum(_external_nbytes(v) for v in o)
+    return 0
+
+
+def _cache_nbytes(metadata: Dict[str, Any], st: os.stat_result) -> int:
+    # The parsed dict is roughly as large as the file, plus arrays loaded from external files
+    return st.st_size + _external_nbytes(metadata)
+
+
+def _is_numeric_column(values: List[Any]) -> bool:
+    return len(values) > 0 and all(isinstance(v, (numbers.Number, np.generic)) and not isinstance(v, complex) for v in values)
+
+
+def load_dir(
+    dirname: PathLike,
+    keys: Optional[Sequence[str]] = None,
+    where: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    as_numpy: bool = False,
+    max_workers: Optional[int] = None,
+) -> Tuple[List[Path], Dict[str, Any]]:
+    """Load the metadata of all arrays in a directory without decoding the arrays.
+
+    Only the sidecars are read (in parallel), and the directory index is used for discovery
+    when it is fresh. Returns the array filenames and the metadata as columns, so that
+    `array_meta_multi.load(filenames)` can load just the selected frames.
+
+    - `keys`: columns to return (all keys found if None). Missing values are None.
+    - `where`: predicate on the full metadata dict of a frame; frames for which it returns False are skipped.
+    - `as_numpy`: convert columns whose values are all numeric to NumPy arrays.
+    """
+    from . import array_meta_dir  # array_meta_dir depends on this module
+    from . import executor as executor_
+
+    filenames_array, filenames_meta = array_meta_dir.retrieve_array_meta_files(dirname)
+
+    def _load(filename_meta: Optional[Path]) -> Dict[str, Any]:
+        return load(filename_meta) if filename_meta is not None else {}
+
+    with executor_.scope("thread", max_workers, kind="read") as pool:
+        if pool is None:
+            metadatas = [_load(f) for f in filenames_meta]
+        else:
+            metadatas = list(pool.map(_load, filenames_meta))
+
+    if where is not None:
+        selected = [(f, m) for f, m in zip(filenames_array, metadatas) if where(m)]
+        filenames_array = [f for f, _ in selected]
+        metadatas = [m for _, m in selected]
+
+    if keys is None:
+        keys = list(dict.fromkeys(key for m in metadatas for key in m))
+
+    columns: Dict[str, Any] = {}
+    for key in keys:
+        values = [m.get(key) for m in metadatas]
+        columns[key] = np.asarray(values) if as_numpy and _is_numeric_column(values) else values
+
+    return filenames_array, columns
@@ -0,0 +1,49 @@
+"""
+Lazy OpenCV import.
+
+Importing OpenCV takes a few hundred milliseconds, so `cv2` here is a stand-in that imports the
+real module (with OpenEXR support enabled) on first attribute access, i.e. on the first PNG/EXR
+encode or decode. Code that only touches metadata or .npy files never loads it.
+"""
+
+from types import ModuleType
+from typing import Any, Optional
+import importlib
+import os
+import sys
+import threading
+
+_lock = threading.Lock()
+
+
+class LazyModule:
+    """Module stand-in that imports `name` on first attribute access."""
+
+    def __init__(self, name: str, environ: Optional[dict] = None):
+        self._name = name
+        self._environ = environ or {}
+        self._module: Optional[ModuleType] = None
+
+    def _load(self) -> ModuleType:
+        with _lock:
+            if self._module is None:
+                # Must be set before the first import of the module
+                os.environ.update(self._environ)
+                self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        module = self._module if self._module is not None else self._load()
+        return getattr(module, attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+cv2 = LazyModule("cv2", environ={"OPENCV_IO_ENABLE_OPENEXR": "1"})
+
+
+def is_loaded() -> bool:
+    """Return True if OpenCV has been imported (by immetaio or anything else)."""
+    return "cv2" in sys.modules
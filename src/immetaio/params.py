@@ -1,5 +1,161 @@
-import cv2
+from typing import Any, Dict, List, NamedTuple, Optional
+import io
+import time
+import numpy as np
+from .opencv import cv2
 
-cv2_imwrite_params = {}
-cv2_imwrite_params[".png"] = [cv2.IMWRITE_PNG_COMPRESSION, 9]
-cv2_imwrite_params[".exr"] = [cv2.IMWRITE_EXR_COMPRESSION, cv2.IMWRITE_EXR_COMPRESSION_PIZ]
+
+class Profile(NamedTuple):
+    """Compression settings for saving arrays.
+
+    - `imwrite_params`: cv2.imwrite parameters per file extension.
+    - `npz`: save arrays that fall back to NumPy format as compressed '.npz' instead of '.npy'.
+    """
+
+    imwrite_params: Dict[str, List[int]]
+    npz: bool = False
+
+
+def _default_imwrite_params() -> Dict[str, List[int]]:
+    return {
+        ".png": [cv2.IMWRITE_PNG_COMPRESSION, 9],
+        ".exr": [cv2.IMWRITE_EXR_COMPRESSION, cv2.IMWRITE_EXR_COMPRESSION_PIZ],
+    }
+
+
+def _default_profiles() -> Dict[str, Profile]:
+    # Built-in profiles, from the fastest encode to the smallest files. All of them are lossless;
+    # add your own (e.g. with cv2.IMWRITE_EXR_TYPE_HALF or IMWRITE_EXR_COMPRESSION_DWAA) to `profiles`.
+    return {
+        "fast": Profile(
+            {
+                ".png": [cv2.IMWRITE_PNG_COMPRESSION, 1, cv2.IMWRITE_PNG_STRATEGY, cv2.IMWRITE_PNG_STRATEGY_RLE],
+                ".exr": [cv2.IMWRITE_EXR_COMPRESSION, cv2.IMWRITE_EXR_COMPRESSION_NO],
+            }
+        ),
+        "balanced": Profile(
+            {
+                ".png": [cv2.IMWRITE_PNG_COMPRESSION, 3],
+                ".exr": [cv2.IMWRITE_EXR_COMPRESSION, cv2.IMWRITE_EXR_COMPRESSION_ZIP],
+            }
+        ),
+        "smallest": Profile(
+            {
+                ".png": [cv2.IMWRITE_PNG_COMPRESSION, 9],
+                ".exr": [cv2.IMWRITE_EXR_COMPRESSION, cv2.IMWRITE_EXR_COMPRESSION_PIZ],
+            },
+            npz=True,
+        ),
+    }
+
+
+# `cv2_imwrite_params` (the defaults without a profile) and `profiles` need OpenCV constants,
+# so they are created on first access (PEP 562) instead of at import.
+_lazy_globals = {"cv2_imwrite_params": _default_imwrite_params, "profiles": _default_profiles}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _lazy_globals:
+        return globals().setdefault(name, _lazy_globals[name]())  # Concurrent first accesses agree on one object
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _get(name: str) -> Any:
+    return globals()[name] if name in globals() else __getattr__(name)
+
+
+# Global profile. None uses `cv2_imwrite_params` and '.npy'.
+_profile: Optional[str] = None
+
+
+def _get_profile(profile: Optional[str]) -> Optional[Profile]:
+    name = profile if profile is not None else _profile
+    if name is None:
+        return None
+    profiles = _get("profiles")
+    if name not in profiles:
+        raise ValueError(f"Unknown profile '{name}'. Available profiles: {list(profiles)}.")
+    return profiles[name]
+
+
+def set_profile(profile: Optional[str]) -> None:
+    """Set the global compression profile ('fast', 'balanced', 'smallest', or None for the defaults)."""
+    global _profile
+    _get_profile(profile)  # Validate the name
+    _profile = profile
+
+
+def get_profile() -> Optional[str]:
+    """Return the name of the global compression profile."""
+    return _profile
+
+
+def get_imwrite_params(ext: str, profile: Optional[str] = None) -> List[int]:
+    """Return the cv2.imwrite parameters for an extension under a profile (the global one if None)."""
+    p = _get_profile(profile)
+    if p is None:
+        return _get("cv2_imwrite_params").get(ext, [])
+    return p.imwrite_params.get(ext, [])
+
+
+def use_npz(profile: Optional[str] = None) -> bool:
+    """Return True if arrays in NumPy format are saved as compressed '.npz' under a profile."""
+    p = _get_profile(profile)
+    return p is not None and p.npz
+
+
+class ProfileBenchmark(NamedTuple):
+    """Encode throughput and output size of a profile on a sample array."""
+
+    encode_time: float
+    mb_per_s: float
+    size: int
+    ratio: float
+
+
+def benchmark_profiles(sample: np.ndarray, ext: str, repeat: int = 3) -> Dict[str, ProfileBenchmark]:
+    """Measure the encode time and size of every profile on a sample array, without touching the disk."""
+    results = {}
+    for name, p in _get("profiles").items():
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            if ext in (".npy", ".npz"):
+                buf = io.BytesIO()
+                if p.npz:
+                    np.savez_compressed(buf, sample)
+                else:
+                    np.save(buf, sample)
+                size = buf.tell()
+            else:
+                ok, encoded = cv2.imencode(ext, sample, p.imwrite_params.get(ext, []))
+                if not ok:
+                    raise ValueError(f"Failed to encode the sample as '{ext}'.")
+                size = encoded.nbytes
+            times.append(time.perf_counter() - t0)
+        t = min(times)
+        results[name] = ProfileBenchmark(t, sample.nbytes / 1e6 / t, size, sample.nbytes / size)
+    return results
+
+
+def autotune(sample: np.ndarray, target_fps: float, ext: Optional[str] = None, max_workers: int = 1, apply: bool = False) -> str:
+    """Pick the profile with the smallest output that still encodes `sample` at `target_fps`.
+
+    The achievable frame rate is estimated as `max_workers / encode_time`. If no profile is
+    fast enough, the fastest one is returned. With `apply=True`, it also becomes the global profile.
+    """
+    from . import array  # array depends on this module
+
+    if ext is None:
+        ext = array.get_filename("sample", sample).suffix
+    results = benchmark_profiles(sample, ext)
+
+    candidates = [name for name, r in results.items() if max_workers / r.encode_time >= target_fps]
+    if candidates:
+        best = min(candidates, key=lambda name: results[name].size)
+    else:
+        best = min(results, key=lambda name: results[name].encode_time)
+
+    if apply:
+        set_profile(best)
+    return best
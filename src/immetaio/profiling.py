@@ -0,0 +1,239 @@
+"""
+Opt-in instrumentation of the I/O stages.
+
+When enabled, the library records the duration and bytes of each stage (encode, write, rename,
+mkdir, JSON formatting, parsing, queue wait, ...) into per-stage histograms. Stages are named
+'<module>.<step>', e.g. 'array.encode', 'array.write', 'json.format' or 'nonblock.queue_wait'.
+
+```python
+immetaio.profiling.enable(trace=True)
+...
+for stage, s in immetaio.profiling.stats().items():
+    print(stage, s.count, s.p50, s.p99, s.bytes)
+immetaio.profiling.export_chrome_trace("trace.json")  # open in chrome://tracing or Perfetto
+```
+
+While enabled, image files are encoded to memory and then written (and read, then decoded),
+so that encoding and disk time are reported separately; the files are identical. Disabled,
+instrumentation costs one flag check per stage. Saves and loads that run in worker processes
+are not recorded.
+"""
+
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+import json
+import os
+import threading
+import time
+from .typing import PathLike
+
+# Duration histogram buckets: bucket k counts durations in [2^(k-1), 2^k) microseconds (bucket 0: < 1 us)
+NUM_BUCKETS = 32
+
+Callback = Callable[[str, float, float, int], None]
+
+_enabled = False
+_lock = threading.Lock()
+_stages: Dict[str, "_Stage"] = {}
+_callbacks: List[Callback] = []
+_trace: Optional[Deque[Tuple[str, float, float, int, int]]] = None
+
+
+class StageStats(NamedTuple):
+    """Aggregated measurements of one stage. Times are in seconds; percentiles are histogram upper bounds."""
+
+    count: int
+    total: float
+    mean: float
+    min: float
+    max: float
+    p50: float
+    p99: float
+    bytes: int
+    histogram: List[int]
+
+
+class _Stage:
+    __slots__ = ("count", "total", "min", "max", "bytes", "buckets")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.bytes = 0
+        self.buckets = [0] * NUM_BUCKETS
+
+    def add(self, duration: float, nbytes: int) -> None:
+        self.count += 1
+        self.total += duration
+        self.min = min(self.min, duration)
+        self.max = max(self.max, duration)
+        self.bytes += nbytes
+        self.buckets[min(int(duration * 1e6).bit_length(), NUM_BUCKETS - 1)] += 1
+
+    def percentile(self, q: float) -> float:
+        target = q * self.count
+        seen = 0
+        for k, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target and n > 0:
+                return min(2**k * 1e-6, self.max)
+        return self.max
+
+    def snapshot(self) -> StageStats:
+        return StageStats(
+            count=self.count,
+            total=self.total,
+            mean=self.total / self.count if self.count else 0.0,
+            min=self.min if self.count else 0.0,
+            max=self.max,
+            p50=self.percentile(0.5),
+            p99=self.percentile(0.99),
+            bytes=self.bytes,
+            histogram=list(self.buckets),
+        )
+
+
+def enable(trace: bool = False, max_events: int = 1_000_000) -> None:
+    """Start recording. If `trace` is True, the last `max_events` events are kept for `export_chrome_trace`."""
+    global _enabled, _trace
+    with _lock:
+        if trace:
+            _trace = deque(_trace or (), maxlen=max_events)
+        else:
+            _trace = None
+        _enabled = True
+
+
+def disable() -> None:
+    """Stop recording. The statistics and trace collected so far are kept until `reset`."""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    """Drop all statistics and trace events."""
+    with _lock:
+        _stages.clear()
+        if _trace is not None:
+            _trace.clear()
+
+
+def add_callback(callback: Callback) -> None:
+    """Call `callback(stage, start, duration, nbytes)` for every recorded event.
+
+    `start` is a `time.perf_counter` timestamp. The callback runs on the thread doing the I/O
+    (including the background save threads), so it should return quickly.
+    """
+    with _lock:
+        _callbacks.append(callback)
+
+
+def remove_callback(callback: Callback) -> None:
+    with _lock:
+        _callbacks.remove(callback)
+
+
+def record(stage: str, start: float, duration: float, nbytes: int = 0) -> None:
+    """Record one event of `stage` (no-op if disabled)."""
+    if not _enabled:
+        return
+    with _lock:
+        s = _stages.get(stage)
+        if s is None:
+            s = _stages[stage] = _Stage()
+        s.add(duration, nbytes)
+        if _trace is not None:
+            _trace.append((stage, start, duration, threading.get_ident(), nbytes))
+        callbacks = _callbacks[:] if _callbacks else None
+    if callbacks is not None:
+        for callback in callbacks:
+            callback(stage, start, duration, nbytes)
+
+
+class _Span:
+    __slots__ = ("stage", "nbytes", "start")
+
+    def __init__(self, stage: str, nbytes: int):
+        self.stage = stage
+        self.nbytes = nbytes
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, *exc: Any) -> None:
+        if exc_type is None:  # Failed stages are not recorded
+            record(self.stage, self.start, time.perf_counter() - self.start, self.nbytes)
+
+
+class _NullSpan:
+    __slots__ = ()
+    nbytes = 0
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        pass
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        pass  # Setting nbytes inside a disabled span is a no-op
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(stage: str, nbytes: int = 0) -> Any:
+    """Context manager timing a stage; `nbytes` can also be set on the returned object inside the block."""
+    return _Span(stage, nbytes) if _enabled else _NULL_SPAN
+
+
+def queued(stage: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap a job so that the time from now until a worker starts it is recorded as `stage`."""
+    if not _enabled:
+        return fn
+    t_submit = time.perf_counter()
+
+    def _job(*args: Any, **kwargs: Any) -> Any:
+        t_start = time.perf_counter()
+        record(stage, t_submit, t_start - t_submit)
+        return fn(*args, **kwargs)
+
+    return _job
+
+
+def stats() -> Dict[str, StageStats]:
+    """Return the statistics of every stage recorded so far, by stage name."""
+    with _lock:
+        return {stage: s.snapshot() for stage, s in sorted(_stages.items())}
+
+
+def export_chrome_trace(filename: PathLike) -> None:
+    """Write the recorded events in Chrome trace-event format (requires `enable(trace=True)`)."""
+    with _lock:
+        if _trace is None:
+            raise RuntimeError("Tracing is not enabled. Call enable(trace=True) first.")
+        events = list(_trace)
+
+    pid = os.getpid()
+    trace_events = [
+        {
+            "name": stage,
+            "cat": stage.split(".", 1)[0],
+            "ph": "X",
+            "ts": start * 1e6,
+            "dur": duration * 1e6,
+            "pid": pid,
+            "tid": tid,
+            "args": {"bytes": nbytes},
+        }
+        for stage, start, duration, tid, nbytes in events
+    ]
+    with open(filename, "w") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,26 @@
+import struct
+import cv2
+import numpy as np
+from immetaio import array
+
+
+def _jpeg_with_orientation(arr, orientation):
+    """Encode a JPEG and insert an EXIF segment with the given Orientation tag."""
+    ok, encoded = cv2.imencode(".jpg", arr)
+    assert ok
+    data = encoded.tobytes()
+    ifd = struct.pack("<H", 1) + struct.pack("<HHIHH", 0x0112, 3, 1, orientation, 0) + struct.pack("<I", 0)
+    exif = b"Exif\x00\x00" + b"II*\x00" + struct.pack("<I", 8) + ifd
+    app1 = b"\xff\xe1" + struct.pack(">H", len(exif) + 2) + exif
+    return data[:2] + app1 + data[2:]
+
+
+def test_reduced_jpeg_ignores_orientation(tmp_path):
+    filename = tmp_path / "oriented.jpg"
+    arr = np.random.default_rng(0).integers(0, 255, (64, 128, 3), dtype=np.uint8)
+    filename.write_bytes(_jpeg_with_orientation(arr, 6))  # Rotate 90 degrees clockwise
+
+    assert array.load(filename).shape == (64, 128, 3)
+    for reduce in (2, 4, 8):
+        assert array.load(filename, reduce=reduce).shape == (64 // reduce, 128 // reduce, 3)
+    assert array.load(filename, roi=(0, 32, 0, 96), reduce=2).shape == (16, 48, 3)
@@ -0,0 +1,14 @@
+import numpy as np
+import immetaio
+from immetaio import executor
+
+
+def test_process_pool_does_not_fork(tmp_path):
+    assert executor.get_process_pool()._mp_context.get_start_method() != "fork"
+
+    images = [np.full((8, 8, 3), i, np.uint8) for i in range(4)]
+    immetaio.save(tmp_path / "d", images, executor="process", k=list(range(4)))
+    arrs, metadata = immetaio.load(tmp_path / "d", executor="process", stack=True)
+    np.testing.assert_array_equal(arrs, np.stack(images))
+    assert metadata == {"k": [0, 1, 2, 3]}
+    executor.shutdown()
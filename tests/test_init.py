@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+import immetaio
+
+# Attributes of the package before submodules became lazy (PEP 562)
+BASELINE = [
+    "array",
+    "array_meta",
+    "array_meta_dir",
+    "array_meta_multi",
+    "array_meta_nonblock",
+    "array_nonblock",
+    "json",
+    "load",
+    "master",
+    "meta",
+    "params",
+    "save",
+    "typing",
+    "wait_saves",
+]
+
+
+def test_baseline_attributes():
+    for name in BASELINE:
+        assert getattr(immetaio, name) is not None
+        assert name in dir(immetaio)
+
+
+def test_all_attributes():
+    for name in immetaio.__all__:
+        assert getattr(immetaio, name) is not None
+
+
+def test_import_is_lazy():
+    code = "import sys, immetaio; assert 'cv2' not in sys.modules; immetaio.master; immetaio.typing"
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    subprocess.run([sys.executable, "-c", code], check=True, env=env)
@@ -0,0 +1,25 @@
+import numpy as np
+from immetaio import array_meta_dir, json
+
+
+def test_write_reads_old_file_only_with_threshold(tmp_path, monkeypatch):
+    calls = []
+    referenced_blobs = json._referenced_blobs
+    monkeypatch.setattr(json, "_referenced_blobs", lambda f: calls.append(f) or referenced_blobs(f))
+    json.save(tmp_path / "0.json", a=1)
+    json.save(tmp_path / "0.json", a=2)
+    assert calls == []
+
+    json.write(tmp_path / "0.json", {"a": np.zeros(100)}, external_threshold=10)
+    json.write(tmp_path / "0.json", {"b": np.zeros(100)}, external_threshold=10)
+    assert len(calls) == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["0.b.npyblob", "0.json"]
+
+
+def test_recover_reports_unreferenced_blobs(tmp_path):
+    np.save(tmp_path / "0.npy", np.zeros(3))
+    json.write(tmp_path / "0.json", {"a": np.zeros(100)}, external_threshold=10)
+    json.save(tmp_path / "0.json", a=1)  # No threshold: the old blob is left behind
+
+    report = array_meta_dir.recover(tmp_path)
+    assert [(p.name, reason) for p, reason in report.incomplete] == [("0.a.npyblob", "external metadata array not referenced by its sidecar")]
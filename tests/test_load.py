@@ -0,0 +1,54 @@
+import asyncio
+import numpy as np
+import pytest
+import immetaio
+from immetaio import array_meta_async, array_meta_multi, array_meta_stream
+
+
+@pytest.fixture
+def frames(tmp_path):
+    images = [np.full((4, 6), i, np.uint8) for i in range(5)]
+    immetaio.save(tmp_path / "d", images, k=list(range(5)))
+    return tmp_path / "d", images
+
+
+def _load_multi(filenames, asynchronous, **kwargs):
+    if asynchronous:
+        return asyncio.run(array_meta_async.load_multi(filenames, **kwargs))
+    return array_meta_multi.load(filenames, **kwargs)
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_load_multi_stacked(frames, tmp_path, asynchronous):
+    dirname, images = frames
+    filenames = sorted(dirname.glob("*.png"), key=lambda p: int(p.stem))
+
+    arrs, metadata = _load_multi(filenames, asynchronous, stack=True)
+    np.testing.assert_array_equal(arrs, np.stack(images))
+    assert metadata == {"k": [0, 1, 2, 3, 4]}
+
+    out = np.zeros((5, 4, 6), np.uint8)
+    assert _load_multi(filenames, asynchronous, out=out)[0] is out
+    np.testing.assert_array_equal(out, np.stack(images))
+
+    arrs, _ = _load_multi(filenames, asynchronous, out=tmp_path / "stacked.npy")
+    np.testing.assert_array_equal(np.load(tmp_path / "stacked.npy"), np.stack(images))
+
+    with pytest.raises(ValueError):
+        _load_multi(filenames, asynchronous, out=np.zeros((4, 4, 6), np.uint8))
+
+
+def test_iter_load(frames):
+    dirname, images = frames
+    assert [i for i, _, _ in array_meta_stream.iter_load(dirname, prefetch=2, start=1, step=2)] == [1, 3]
+
+    async def _collect():
+        return [(i, arr, metadata) async for i, arr, metadata in array_meta_async.iter_load(dirname, prefetch=2)]
+
+    for i, arr, metadata in asyncio.run(_collect()):
+        np.testing.assert_array_equal(arr, images[i])
+        assert metadata == {"k": i}
+
+    it = array_meta_stream.iter_load(dirname, prefetch=2)
+    assert next(it)[0] == 0
+    it.close()  # Stops early and cancels the frames read ahead
@@ -0,0 +1,83 @@
+import asyncio
+import os
+import numpy as np
+import pytest
+import immetaio
+from immetaio import array_chunked, array_meta_dir, array_meta_pack
+
+
+def test_save_large_frame_with_chunked_threshold(tmp_path):
+    # Arrays above the chunked threshold are stored as .npy frames in a pack, not as .chunks
+    arr = np.arange(1000, dtype=np.float64).reshape(10, 10, 10)
+    threshold = array_chunked.get_threshold()
+    array_chunked.set_threshold(100)
+    try:
+        immetaio.save(tmp_path / "p.immpack", [arr], k=[1])
+        with array_meta_pack.PackWriter(tmp_path / "q.immpack") as writer:
+            writer.write(arr)
+    finally:
+        array_chunked.set_threshold(threshold)
+
+    arrs, metadata = immetaio.load(tmp_path / "p.immpack")
+    np.testing.assert_array_equal(arrs[0], arr)
+    assert metadata == {"k": [1]}
+    with array_meta_pack.PackReader(tmp_path / "q.immpack") as reader:
+        assert reader.entries[0].format == ".npy"
+        np.testing.assert_array_equal(reader.read(0), arr)
+
+
+def test_import_dir_with_chunked_array(tmp_path):
+    arr = np.arange(24, dtype=np.float64).reshape(2, 3, 4)
+    image = np.zeros((4, 4), np.uint8)
+    array_meta_dir.save(tmp_path / "d", [image], k=[0])
+    array_chunked.save(tmp_path / "d" / "1.chunks", arr)
+
+    array_meta_pack.import_dir(tmp_path / "d", tmp_path / "d.immpack")
+    arrs, _ = immetaio.load(tmp_path / "d.immpack")
+    np.testing.assert_array_equal(arrs[0], image)
+    np.testing.assert_array_equal(arrs[1], arr)
+
+
+def test_asave_aload_pack(tmp_path):
+    arrs = [np.zeros((4, 4), np.uint8), np.arange(3, dtype=np.float64)]
+    filename = tmp_path / "a.immpack"
+    asyncio.run(immetaio.asave(filename, arrs, k=[1, 2]))
+    assert filename.is_file()
+
+    loaded, metadata = asyncio.run(immetaio.aload(filename))
+    for a, b in zip(loaded, arrs):
+        np.testing.assert_array_equal(a, b)
+    assert metadata == {"k": [1, 2]}
+
+
+def test_failed_save_keeps_existing_pack(tmp_path):
+    filename = tmp_path / "p.immpack"
+    immetaio.save(filename, [np.zeros((4, 4), np.uint8)], k=[0])
+
+    def _frames():
+        yield np.ones((4, 4), np.uint8)
+        raise RuntimeError("interrupted")
+
+    with pytest.raises(RuntimeError):
+        with array_meta_pack.PackWriter(filename) as writer:
+            for arr in _frames():
+                writer.write(arr)
+                assert immetaio.load(filename)[1] == {"k": [0]}  # The old pack is still readable
+
+    arrs, metadata = immetaio.load(filename)
+    np.testing.assert_array_equal(arrs[0], np.zeros((4, 4), np.uint8))
+    assert metadata == {"k": [0]}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["p.immpack"]
+
+
+@pytest.mark.parametrize("preadv", [True, False])
+def test_read_bytes(tmp_path, monkeypatch, preadv):
+    if not preadv:
+        monkeypatch.delattr(os, "preadv", raising=False)
+    arrs = [np.full((4, 4), i, np.uint8) for i in range(3)]
+    immetaio.save(tmp_path / "p.immpack", arrs)
+
+    with array_meta_pack.PackReader(tmp_path / "p.immpack") as reader:
+        for i in (2, 0, 1):
+            np.testing.assert_array_equal(reader.read(i), arrs[i])
+            assert reader.read(i).flags.writeable